@@ -0,0 +1,157 @@
+import hashlib
+import itertools
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+
+import numpy as np
+
+from .response_cache import ResponseCache, cached_run
+from .structural_diff import code_tokens, structural_diff, comparison_prompts, reduce_prompt
+
+SHINGLE_SIZE = 5  # Tokens por shingle
+MINHASH_PERMUTATIONS = 128
+NEAR_DUPLICATE = 0.9  # Similitud de Jaccard estimada a partir de la cual dos scripts se agrupan
+BATCH_WORKERS = 8  # Llamadas simultáneas al modelo
+MAX_BATCH_PAIRS = 500  # Tope de comparaciones con el modelo por lote
+
+_PRIME = (1 << 31) - 1
+
+
+class MinHasher:
+    """
+    Firmas MinHash de los shingles de tokens de un script: la fracción de
+    posiciones iguales entre dos firmas estima la similitud de Jaccard de sus
+    conjuntos de shingles, sin comparar los scripts entre sí.
+    """
+
+    def __init__(self, permutations: int = MINHASH_PERMUTATIONS, shingle_size: int = SHINGLE_SIZE, seed: int = 1):
+        generator = np.random.default_rng(seed)
+        self.a = generator.integers(1, _PRIME, permutations, dtype=np.uint64)
+        self.b = generator.integers(0, _PRIME, permutations, dtype=np.uint64)
+        self.shingle_size = shingle_size
+
+    def shingles(self, tokens: list) -> np.ndarray:
+        size = min(self.shingle_size, len(tokens)) or 1
+        hashes = {zlib.crc32('\x00'.join(tokens[i:i + size]).encode()) % _PRIME
+                  for i in range(max(len(tokens) - size + 1, 1))}
+        return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+    def signature(self, tokens: list) -> np.ndarray:
+        hashes = self.shingles(tokens)
+        # a < 2^31 y hash < 2^31: el producto cabe en uint64
+        return ((self.a[:, None] * hashes[None, :] + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+def similarity_matrix(signatures: np.ndarray) -> np.ndarray:
+    """Jaccard estimada entre todas las firmas (filas de ``signatures``)."""
+    return (signatures[:, None, :] == signatures[None, :, :]).mean(axis=2)
+
+
+def clusters(names: list, fingerprints: list, matrix: np.ndarray, threshold: float = NEAR_DUPLICATE) -> list:
+    """
+    Agrupa los scripts idénticos (mismos tokens) y los casi duplicados
+    (similitud >= ``threshold``) con union-find. Retorna listas de índices; el
+    primero de cada grupo es su representante.
+    """
+    parent = list(range(len(names)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in itertools.combinations(range(len(names)), 2):
+        if fingerprints[i] == fingerprints[j] or matrix[i, j] >= threshold:
+            parent[max(find(i), find(j))] = min(find(i), find(j))
+    groups = {}
+    for i in range(len(names)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def plan_pairs(groups: list, fingerprints: list, representatives: bool = True) -> tuple:
+    """
+    Pares que se envían al modelo y pares omitidos con su motivo. Con
+    ``representatives`` solo se comparan los representantes de cada grupo;
+    si no, todos los pares salvo los del mismo grupo.
+    """
+    group_of = {index: number for number, group in enumerate(groups) for index in group}
+    indices = sorted(group[0] for group in groups) if representatives else sorted(group_of)
+    pairs = [(i, j) for i, j in itertools.combinations(indices, 2) if group_of[i] != group_of[j]]
+    skipped = []
+    for group in groups:
+        for i, j in itertools.combinations(group, 2):
+            skipped.append((i, j, 'idénticos' if fingerprints[i] == fingerprints[j] else 'casi duplicados'))
+    return pairs, skipped
+
+
+def compare_pair(make_agent: Callable, first: str, second: str, cache: ResponseCache, bypass: bool = False) -> dict:
+    """
+    Compara dos scripts con un agente propio (los agentes no se comparten entre
+    hilos): diff estructural local y prompts reducidos, con map-reduce si hace falta.
+    """
+    diff = structural_diff(first, second)
+    report = {'summary': diff.summary(), 'content': '', 'cached': True, 'latency': 0.0,
+              'stats': {'hits': 0, 'misses': 0, 'saved': 0.0}}
+    if not diff.entries:
+        report['content'] = "Sin diferencias estructurales."
+        return report
+    agent = make_agent()
+    prompts = comparison_prompts(diff)
+    if len(prompts) > 1:
+        partials = [cached_run(agent, prompt, cache, bypass=bypass, stats=report['stats']) for prompt in prompts]
+        report['latency'] += sum(partial['latency'] for partial in partials if not partial['cached'])
+        prompts = [reduce_prompt(diff, [partial['content'] or '' for partial in partials])]
+    result = cached_run(agent, prompts[0], cache, bypass=bypass, stats=report['stats'])
+    report['content'] = result['content'] or ''
+    report['cached'] = report['stats']['misses'] == 0
+    if not result['cached']:
+        report['latency'] += result['latency']
+    return report
+
+
+def compare_batch(files: dict, make_agent: Callable, cache: ResponseCache, workers: int = BATCH_WORKERS,
+                  representatives: bool = True, threshold: float = NEAR_DUPLICATE, bypass: bool = False,
+                  max_pairs: int = MAX_BATCH_PAIRS, on_report: Callable = None) -> dict:
+    """
+    Compara muchos scripts {nombre: código}. Las firmas MinHash dan la matriz de
+    similitud y los grupos de casi duplicados al instante; las comparaciones
+    restantes se ejecutan en un pool de ``workers`` hilos. ``on_report`` se
+    llama desde el hilo que invoca con (primero, segundo, informe, hechos, total)
+    a medida que terminan. Retorna nombres, matriz, grupos, omitidos, informes
+    (por par de nombres) y tiempos.
+    """
+    names = list(files)
+    hasher = MinHasher()
+    tokens = [code_tokens(files[name].splitlines()) for name in names]
+    fingerprints = [hashlib.sha256('\x00'.join(script_tokens).encode()).hexdigest() for script_tokens in tokens]
+    matrix = similarity_matrix(np.stack([hasher.signature(script_tokens) for script_tokens in tokens]))
+    groups = clusters(names, fingerprints, matrix, threshold)
+    pairs, skipped = plan_pairs(groups, fingerprints, representatives)
+    truncated = len(pairs) > max_pairs
+    # Primero los pares más parecidos: sus diffs son más pequeños y responden antes
+    pairs = sorted(pairs, key=lambda pair: -matrix[pair])[:max_pairs]
+
+    reports = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='batch-compare') as pool:
+        futures = {pool.submit(compare_pair, make_agent, files[names[i]], files[names[j]], cache, bypass): (i, j)
+                   for i, j in pairs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            i, j = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                report = {'summary': '', 'content': '', 'cached': False, 'latency': 0.0, 'error': str(e),
+                          'stats': {'hits': 0, 'misses': 0, 'saved': 0.0}}
+            report['similarity'] = float(matrix[i, j])
+            reports[(names[i], names[j])] = report
+            if on_report is not None:
+                on_report(names[i], names[j], report, done, len(pairs))
+    return {'names': names, 'matrix': matrix, 'groups': [[names[i] for i in group] for group in groups],
+            'skipped': [(names[i], names[j], reason) for i, j, reason in skipped], 'reports': reports,
+            'truncated': truncated, 'elapsed': time.perf_counter() - start,
+            'model_time': sum(report['latency'] for report in reports.values())}
@@ -0,0 +1,278 @@
+import ast
+import hashlib
+import json
+import re
+
+import numpy as np
+
+from .response_cache import normalize_prompt
+
+# Tamaños de entrada crecientes (16 .. 131072); por encima los efectos de cache de la CPU deforman la curva
+BENCHMARK_SIZES = [2 ** k for k in range(4, 18)]
+BENCHMARK_REPEATS = 5  # Mediciones por tamaño (se usa la mínima)
+BENCHMARK_RUN_LIMIT = 2.0  # Segundos máximos por llamada; al superarlos se deja de crecer
+BENCHMARK_BUDGET = 15.0  # Segundos totales de medición por solución
+MIN_FIT_POINTS = 4
+FIT_TOLERANCE = 1.5  # Una clase más simple gana si su error no supera este factor del mejor
+CONSTANT_GROWTH = 3.0  # Crecimiento máximo (últimos/primeros puntos) que se considera O(1)
+CONSTANT_EXPONENT = 0.1  # Pendiente log-log máxima de O(1); O(log n) ronda 0.15 en BENCHMARK_SIZES
+
+# Clases de complejidad de mejor a peor
+COMPLEXITY_CLASSES = [
+    ('O(1)', lambda n: np.ones_like(n)),
+    ('O(log n)', lambda n: np.log2(n)),
+    ('O(n)', lambda n: n),
+    ('O(n log n)', lambda n: n * np.log2(n)),
+    ('O(n^2)', lambda n: n ** 2),
+    ('O(n^3)', lambda n: n ** 3),
+]
+_RANKS = {label: rank for rank, (label, _) in enumerate(COMPLEXITY_CLASSES)}
+
+_ARGUMENTS = {
+    'int': "n",
+    'float': "float(n)",
+    'bool': "True",
+    'str': "''.join(random.choice(string.ascii_lowercase) for _ in range(n))",
+    'List[str]': "[random.choice(string.ascii_lowercase) for _ in range(n)]",
+    'List[List[int]]': "[[random.randint(0, n), random.randint(0, n)] for _ in range(n)]",
+    'Dict[int, int]': "{i: random.randint(-n, n) for i in range(n)}",
+}
+_DEFAULT_ARGUMENT = "[random.randint(-n, n) for _ in range(n)]"
+
+_STOP_REASONS = {'limit': "límite por llamada", 'memory': "sin memoria", 'budget': "presupuesto de tiempo"}
+# Etiquetas que acompañan a una cota en la respuesta del modelo
+_TIME_WORDS = ('time', 'tiempo', 'temporal')
+_OTHER_BOUND_WORDS = ('fuerza bruta', 'brute force', 'brute-force', 'espacio', 'espacial', 'space', 'memory',
+                      'memoria')
+
+_MARKER = '__BENCHMARK__'
+
+_HARNESS = '''
+import copy, json, random, signal, string, sys, time, tracemalloc
+random.seed(0)
+_namespace = {{'__name__': 'solucion'}}
+exec(compile({source!r}, '<solucion>', 'exec'), _namespace)
+_owner, _, _method = {entry!r}.rpartition('.')
+target = getattr(_namespace[_owner](), _method) if _owner else _namespace[_method]
+
+class _RunLimit(Exception):
+    pass
+
+def _alarm(*_):
+    raise _RunLimit()
+
+signal.signal(signal.SIGALRM, _alarm)
+
+def _call(args):
+    signal.setitimer(signal.ITIMER_REAL, {run_limit})
+    try:
+        start = time.perf_counter()
+        target(*args)
+        return time.perf_counter() - start
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+points, stop, started = [], None, time.perf_counter()
+for n in {sizes!r}:
+    size_started = time.perf_counter()
+    try:
+        args = tuple(eval({arguments!r}, {{'random': random, 'string': string, 'n': n}}))
+        copy_started = time.perf_counter()
+        copied = copy.deepcopy(args)
+        copy_time = time.perf_counter() - copy_started
+        first = _call(copied)
+        try:
+            mutates = bool(copied != args)
+        except Exception:
+            mutates = True
+        # Llamadas rápidas se agrupan para medir al menos ~2 ms; si la solución modifica su
+        # entrada (p. ej. ordena en el sitio) cada llamada recibe una copia, sin que copiar domine
+        number = max(1, min(1000, int(0.002 / max(first, 1e-9))))
+        if mutates:
+            number = max(1, min(number, int(0.02 / max(copy_time, 1e-9))))
+        times = []
+        for _ in range({repeats}):
+            copies = [copy.deepcopy(args) for _ in range(number)] if mutates else [args] * number
+            times.append(sum(_call(copied) for copied in copies) / number)
+        copied = copy.deepcopy(args)
+        tracemalloc.start()
+        _call(copied)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    except _RunLimit:
+        stop = {{'n': n, 'reason': 'limit'}}
+        break
+    except MemoryError:
+        stop = {{'n': n, 'reason': 'memory'}}
+        break
+    except Exception as e:
+        stop = {{'n': n, 'reason': 'error', 'detail': f'{{type(e).__name__}}: {{e}}'}}
+        break
+    times.sort()
+    points.append({{'n': n, 'time': times[0], 'median': times[len(times) // 2], 'peak': peak}})
+    # El siguiente tamaño cuesta al menos el doble: se para si no cabe en el presupuesto
+    now = time.perf_counter()
+    if now - started + 2.5 * (now - size_started) > {budget} or first > {run_limit} / 4:
+        stop = {{'n': n, 'reason': 'budget'}}
+        break
+print({marker!r} + json.dumps({{'points': points, 'stop': stop}}))
+'''
+
+
+def entry_points(source: str) -> list:
+    """
+    Funciones que se pueden medir: las funciones públicas de nivel superior y
+    los métodos públicos de clases sin argumentos en ``__init__`` (estilo
+    LeetCode, ``Solution.metodo``). Retorna [(nombre, [(parámetro, anotación)])].
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return []
+
+    def parameters(function, skip: int) -> list:
+        args = function.args.posonlyargs + function.args.args
+        return [(arg.arg, ast.unparse(arg.annotation) if arg.annotation else None) for arg in args[skip:]]
+
+    found = []
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and not node.name.startswith('_'):
+            found.append((node.name, parameters(node, 0)))
+        elif isinstance(node, ast.ClassDef):
+            methods = [child for child in node.body if isinstance(child, ast.FunctionDef)]
+            init = next((method for method in methods if method.name == '__init__'), None)
+            if init is not None and len(init.args.args) > 1:
+                continue
+            found.extend((f"{node.name}.{method.name}", parameters(method, 1))
+                         for method in methods if not method.name.startswith('_'))
+    # Las que reciben datos primero; main y similares sin parámetros al final
+    return sorted(found, key=lambda entry: not entry[1])
+
+
+def default_arguments(parameters: list) -> str:
+    """Expresión Python (en función de ``n``) que genera los argumentos a partir de las anotaciones."""
+    values = []
+    for _, annotation in parameters:
+        normalized = (annotation or '').replace('typing.', '').replace(' ', '').replace(',', ', ')
+        normalized = re.sub(r'^(list|Sequence|Iterable)\[', 'List[', normalized)
+        normalized = re.sub(r'^(dict|Mapping)\[', 'Dict[', normalized)
+        values.append(_ARGUMENTS.get(normalized, _DEFAULT_ARGUMENT))
+    return f"({', '.join(values)},)" if values else "()"
+
+
+def history_key(prompt: str, entry: str) -> str:
+    """
+    Clave del historial de complejidad: hash del prompt normalizado y de la
+    función medida. Sólo se comparan regeneraciones del mismo problema; una
+    función homónima de otro problema no cuenta como regresión.
+    """
+    payload = json.dumps([normalize_prompt(prompt), entry])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def harness(source: str, entry: str, arguments: str, sizes: list = BENCHMARK_SIZES,
+            repeats: int = BENCHMARK_REPEATS, run_limit: float = BENCHMARK_RUN_LIMIT,
+            budget: float = BENCHMARK_BUDGET) -> str:
+    """Script autocontenido que mide ``entry`` con entradas crecientes e imprime los puntos en JSON."""
+    return _HARNESS.format(source=source, entry=entry, arguments=arguments, sizes=list(sizes), repeats=repeats,
+                           run_limit=run_limit, budget=budget, marker=_MARKER)
+
+
+def fit_complexity(sizes, values) -> dict:
+    """
+    Ajusta ``valor = a·f(n) + b`` (a >= 0) para cada clase por mínimos cuadrados
+    relativos y elige la de menor error; ante errores parecidos gana la clase
+    más simple. Incluye el exponente de la pendiente log-log. Si el ruido
+    domina (crecimiento total pequeño, pendiente ~0 y error de O(1) cercano
+    al mejor) se elige O(1).
+    """
+    n = np.asarray(sizes, dtype=float)
+    y = np.asarray(values, dtype=float)
+    if len(n) < MIN_FIT_POINTS:
+        return {'label': None, 'rank': None, 'error': None, 'exponent': None}
+    scale = np.maximum(y, max(y.max() * 1e-3, 1e-12))  # error relativo, sin dividir por ~0
+    fits = []
+    for label, function in COMPLEXITY_CLASSES:
+        feature = function(n)
+        design = np.column_stack([feature, np.ones_like(n)]) / scale[:, None]
+        (a, b), *_ = np.linalg.lstsq(design, y / scale, rcond=None)
+        if a < 0:
+            a, b = 0.0, float(np.average(y, weights=1 / scale ** 2))
+        error = float(np.sqrt(np.mean(((a * feature + b - y) / scale) ** 2)))
+        fits.append((error, label))
+    best = min(error for error, _ in fits)
+    label = next(label for error, label in fits if error <= best * FIT_TOLERANCE + 0.02)
+    positive = y > 0
+    exponent = float(np.polyfit(np.log(n[positive]), np.log(y[positive]), 1)[0]) if positive.sum() >= 2 else None
+    # Operaciones de pocos ns: el ruido domina el ajuste, se miran el crecimiento total y la pendiente
+    flat = exponent is not None and abs(exponent) < CONSTANT_EXPONENT
+    if (flat and fits[0][0] <= CONSTANT_GROWTH * best + 0.05
+            and y[-3:].mean() < CONSTANT_GROWTH * max(y[:3].mean(), 1e-12)):
+        label = 'O(1)'
+    return {'label': label, 'rank': _RANKS[label], 'error': best, 'exponent': exponent}
+
+
+def claimed_complexity(text: str):
+    """
+    Complejidad temporal declarada en la respuesta, o None. Se prefiere la cota
+    O(...) etiquetada como tiempo ("time", "tiempo", "temporal") y se descartan
+    las de espacio o memoria y las de la solución de fuerza bruta; si ninguna
+    está etiquetada se toma la primera que corresponde a una clase conocida.
+    """
+    text = text or ''
+    candidates = []
+    previous_end = 0
+    for match in re.finditer(r'O\(([^()]*(?:\([^()]*\))?[^()]*)\)', text):
+        term = match.group(1).lower().replace(' ', '').replace('*', '').replace('²', '^2').replace('³', '^3')
+        term = term.replace('log(n)', 'logn').replace('lgn', 'logn')
+        label = {'1': 'O(1)', 'logn': 'O(log n)', 'n': 'O(n)', 'nlogn': 'O(n log n)', 'n^2': 'O(n^2)',
+                 'nn': 'O(n^2)', 'n^3': 'O(n^3)'}.get(term)
+        # La etiqueta va en la misma frase antes de la cota ("tiempo: O(n)") o justo después ("O(1) space")
+        before = re.split(r'[.;,]|\n\s*\n', text[previous_end:match.start()])[-1].lower()
+        after = re.split(r'[.;,\n]|O\(', text[match.end():match.end() + 25])[0].lower()
+        previous_end = match.end()
+        if not label or any(word in before or word in after for word in _OTHER_BOUND_WORDS):
+            continue
+        if any(word in before or word in after for word in _TIME_WORDS):
+            return label
+        candidates.append(label)
+    return candidates[0] if candidates else None
+
+
+def is_worse(label, reference) -> bool:
+    """True si ``label`` es una clase peor que ``reference``."""
+    if label is None or reference is None:
+        return False
+    return _RANKS[label] > _RANKS[reference]
+
+
+def benchmark(pool, source: str, entry: str, arguments: str, **options) -> dict:
+    """
+    Ejecuta el benchmark en el sandbox (proceso aislado con límites) y ajusta
+    las curvas de tiempo y memoria. Retorna ``points``, ``stop``, ``time_fit``,
+    ``memory_fit`` y ``error``.
+    """
+    result = pool.run(harness(source, entry, arguments, **options))
+    output = next((line for line in result['stdout'].splitlines() if line.startswith(_MARKER)), None)
+    if output is None:
+        detail = "límite de tiempo del sandbox" if result.get('timed_out') else result['stderr'].strip()[-500:]
+        return {'points': [], 'stop': None, 'time_fit': None, 'memory_fit': None,
+                'error': detail or "El benchmark no produjo resultados"}
+    data = json.loads(output[len(_MARKER):])
+    points = data['points']
+    if len(points) < MIN_FIT_POINTS:
+        # Sin puntos suficientes no hay ajuste: p. ej. los argumentos generados no valen para la función
+        stop = data['stop'] or {}
+        detail = stop.get('detail') or "sin mediciones"
+        if stop and not stop.get('detail'):
+            detail = f"se detuvo en n={stop['n']} ({_STOP_REASONS.get(stop['reason'], stop['reason'])})"
+        return {'points': points, 'stop': data['stop'], 'time_fit': None, 'memory_fit': None,
+                'error': f"Sólo se midieron {len(points)} tamaños: {detail}"}
+    sizes = [point['n'] for point in points]
+    peaks = [point['peak'] for point in points]
+    memory_fit = fit_complexity(sizes, peaks)
+    if points and max(peaks) < 1024:
+        # Menos de 1 KB en el peor caso: memoria auxiliar constante
+        memory_fit = {'label': 'O(1)', 'rank': 0, 'error': 0.0, 'exponent': 0.0}
+    return {'points': points, 'stop': data['stop'], 'time_fit': fit_complexity(sizes, [p['time'] for p in points]),
+            'memory_fit': memory_fit, 'error': None}
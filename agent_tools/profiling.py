@@ -0,0 +1,134 @@
+import json
+import os
+
+PROFILE_TOP = 10  # Funciones más costosas que se reportan por script
+PROFILE_SIZE = 10000  # n por defecto al llamar a una función de entrada con argumentos generados
+
+_MARKER = '__PROFILE__'
+
+_HARNESS = '''
+import contextlib, cProfile, io, json, pstats, random, string, sys, time, tracemalloc
+random.seed(0)
+_SOURCE = {source!r}
+_ENTRY = {entry!r}
+_output = io.StringIO()
+
+def _prepare():
+    # Sin función de entrada se ejecuta el script completo como __main__
+    if not _ENTRY:
+        code = compile(_SOURCE, '<script>', 'exec')
+        return lambda: exec(code, {{'__name__': '__main__'}})
+    namespace = {{'__name__': 'perfilado'}}
+    exec(compile(_SOURCE, '<script>', 'exec'), namespace)
+    owner, _, method = _ENTRY.rpartition('.')
+    target = getattr(namespace[owner](), method) if owner else namespace[method]
+    args = tuple(eval({arguments!r}, {{'random': random, 'string': string, 'n': {size}}}))
+    return lambda: target(*args)
+
+def _run(wrapper=None, run=None):
+    run = run or _prepare()
+    with contextlib.redirect_stdout(_output), contextlib.redirect_stderr(_output):
+        start = time.perf_counter()
+        try:
+            if wrapper is None:
+                run()
+            else:
+                wrapper(run)
+        except SystemExit:
+            pass
+        return time.perf_counter() - start
+
+_HARNESS_CALLS = ("<built-in method builtins.exec>", "<method 'disable' of '_lsprof.Profiler' objects>")
+
+def _emit(phase, data):
+    print({marker!r} + json.dumps({{'phase': phase, **data}}), flush=True)
+
+try:
+    # Tres pasadas para que la instrumentación de una no infle las otras mediciones
+    _emit('wall', {{'wall': _run()}})
+    profile = cProfile.Profile()
+    _emit('profile_wall', {{'wall': _run(profile.runcall)}})
+    stats = pstats.Stats(profile).stats
+    functions = []
+    for (filename, line, name), (primitive, calls, own, cumulative, _) in stats.items():
+        # Se omiten el propio harness (compilado por el sandbox como <bloque>) y sus llamadas
+        if filename == '<bloque>' or name in _HARNESS_CALLS:
+            continue
+        if filename == '~':
+            location = 'builtin'
+        elif filename == '<script>':
+            location = f'script:{{line}}'
+        else:
+            location = f'{{filename.rsplit("/", 1)[-1]}}:{{line}}'
+        functions.append({{'function': name, 'location': location, 'calls': calls, 'primitive_calls': primitive,
+                           'own': own, 'cumulative': cumulative}})
+    own_code = [f for f in functions if f['location'].startswith('script:')]
+    _emit('profile', {{'total_calls': sum(f['calls'] for f in functions),
+                       'script_calls': sum(f['calls'] for f in own_code),
+                       'hot': sorted(functions, key=lambda f: f['own'], reverse=True)[:{top}],
+                       'cumulative': sorted(own_code, key=lambda f: f['cumulative'], reverse=True)[:{top}]}})
+    # Cargar el script y generar los argumentos queda fuera de la medición de memoria
+    run = _prepare()
+    tracemalloc.start()
+    _run(run=run)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    _emit('memory', {{'peak': peak, 'retained': current}})
+except Exception as e:
+    _emit('error', {{'error': f'{{type(e).__name__}}: {{e}}'}})
+_emit('output', {{'output': _output.getvalue()[:2000]}})
+'''
+
+
+def harness(source: str, entry: str = '', arguments: str = '()', size: int = PROFILE_SIZE,
+            top: int = PROFILE_TOP) -> str:
+    """Script autocontenido que perfila ``source`` (o su función ``entry``) e imprime cada fase en JSON."""
+    return _HARNESS.format(source=source, entry=entry, arguments=arguments or '()', size=size, top=top,
+                           marker=_MARKER)
+
+
+def parse_profile(result: dict) -> dict:
+    """Une las fases impresas por el harness con el resultado del sandbox."""
+    profile = {'wall': None, 'profile_wall': None, 'total_calls': None, 'script_calls': None, 'hot': [],
+               'cumulative': [], 'peak': None, 'retained': None, 'output': '', 'error': None}
+    for line in result['stdout'].splitlines():
+        if line.startswith(_MARKER):
+            data = json.loads(line[len(_MARKER):])
+            data.pop('phase')
+            profile.update(data)
+    if profile['wall'] is None and profile['error'] is None:
+        profile['error'] = ("Superó el límite de tiempo del sandbox" if result.get('timed_out')
+                            else result['stderr'].strip()[-500:] or "El perfilado no produjo resultados")
+    elif result.get('timed_out'):
+        profile['error'] = "Superó el límite de tiempo del sandbox (resultados parciales)"
+    return profile
+
+
+def profile_scripts(pool, scripts: list, entry: str = '', arguments: str = '()', size: int = PROFILE_SIZE) -> list:
+    """Perfila todos los scripts a la vez, cada uno en su proceso del sandbox."""
+    results = pool.run_many([harness(script, entry, arguments, size) for script in scripts])
+    return [parse_profile(result) for result in results]
+
+
+def profile_summary(profiles: list, top: int = 5) -> str:
+    """Mediciones en JSON compacto para el prompt del modelo."""
+    summary = {}
+    for index, profile in enumerate(profiles, start=1):
+        summary[f"script{index}"] = {
+            'error': profile['error'],
+            'wall_seconds': None if profile['wall'] is None else round(profile['wall'], 6),
+            'total_function_calls': profile['total_calls'],
+            'script_function_calls': profile['script_calls'],
+            'peak_memory_kb': None if profile['peak'] is None else round(profile['peak'] / 1024, 1),
+            'hot_functions': [{'function': f['function'], 'location': f['location'], 'calls': f['calls'],
+                               'own_seconds': round(f['own'], 6), 'cumulative_seconds': round(f['cumulative'], 6)}
+                              for f in profile['hot'][:top]],
+        }
+    return json.dumps(summary, ensure_ascii=False, separators=(',', ':'))
+
+
+def cpu_note(pool, scripts: int = 2) -> str:
+    """Aviso cuando los scripts corren a la vez en menos CPUs que scripts y los tiempos de pared se influyen."""
+    if min(pool.size, scripts) > (os.cpu_count() or 1):
+        return "Los scripts compartieron CPU al ejecutarse a la vez: compara los tiempos con cautela."
+    return ''
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import sqlite3
+import textwrap
+import threading
+import time
+from typing import Optional
+
+CACHE_PATH = "agent_cache.db"
+CACHE_MAX_BYTES = 50 * 1024 * 1024  # Tamaño máximo de las respuestas guardadas
+CACHE_TTL = 7 * 24 * 3600  # Segundos que una respuesta sigue siendo válida
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    latency REAL NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed);
+"""
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normaliza el prompt para que variaciones irrelevantes (sangría común,
+    espacios al final de línea, saltos de línea de Windows) den la misma clave.
+    """
+    lines = textwrap.dedent(prompt.replace('\r\n', '\n')).split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip()
+
+def cache_key(model_id: str, system_prompt: Optional[str], prompt: str, base_url=None) -> str:
+    """
+    Hash SHA-256 del modelo, el endpoint del proveedor (``base_url``), el system
+    prompt y el prompt normalizado: el mismo id servido por otro endpoint (p. ej.
+    el stand-in local) no comparte respuestas.
+    """
+    endpoint = str(base_url or '').rstrip('/')
+    payload = json.dumps([model_id, endpoint, normalize_prompt(system_prompt or ''), normalize_prompt(prompt)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    Cache en disco (SQLite) de respuestas de agentes direccionada por contenido.
+    Las entradas caducan tras ``ttl`` segundos y, si el total supera ``max_bytes``,
+    se descartan las menos usadas recientemente (LRU).
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = CACHE_MAX_BYTES, ttl: float = CACHE_TTL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Streamlit atiende cada sesión en su propio hilo
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Respuesta guardada (``content``, ``latency`` original, ``hits``) o None si no existe o caducó."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT content, latency, created, hits FROM responses WHERE key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                return None
+            content, latency, created, hits = row
+            if now - created > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return {'content': content, 'latency': latency, 'hits': hits + 1}
+
+    def put(self, key: str, model_id: str, content: str, latency: float) -> None:
+        """Guarda una respuesta y aplica la expiración y el límite de tamaño."""
+        now = time.time()
+        size = len(content.encode('utf-8'))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, model, content, size, latency, created, accessed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)", (key, model_id, content, size, latency, now, now))
+                self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                self._evict()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self) -> None:
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {'entries': entries, 'bytes': size}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def cached_run(agent, prompt: str, cache: ResponseCache, bypass: bool = False, stats: dict = None) -> dict:
+    """
+    Ejecuta ``agent.run(prompt)`` salvo que haya una respuesta guardada para el
+    mismo modelo y endpoint, system prompt y prompt. Con ``bypass`` siempre se
+    llama al modelo (y se actualiza la cache). ``stats`` acumula aciertos,
+    fallos y segundos ahorrados. Retorna ``content``, ``cached`` y ``latency``.
+    """
+    key = cache_key(agent.model.id, agent.model.system_prompt, prompt, getattr(agent.model, 'base_url', None))
+    if not bypass:
+        hit = cache.get(key)
+        if hit is not None:
+            if stats is not None:
+                stats['hits'] = stats.get('hits', 0) + 1
+                stats['saved'] = stats.get('saved', 0.0) + hit['latency']
+            return {'content': hit['content'], 'cached': True, 'latency': hit['latency']}
+    start = time.perf_counter()
+    content = agent.run(prompt).content
+    latency = time.perf_counter() - start
+    if stats is not None:
+        stats['misses'] = stats.get('misses', 0) + 1
+    if content:
+        cache.put(key, agent.model.id, content, latency)
+    return {'content': content, 'cached': False, 'latency': latency}
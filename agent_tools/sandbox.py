@@ -0,0 +1,142 @@
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable
+
+SANDBOX_WORKERS = min(4, os.cpu_count() or 1)  # Procesos de trabajo precalentados
+SANDBOX_TIMEOUT = 30  # Segundos de reloj por bloque
+SANDBOX_CPU_SECONDS = 30
+SANDBOX_MEMORY_MB = 512
+SANDBOX_OUTPUT_BYTES = 64 * 1024  # Máximo de stdout/stderr que se devuelve
+SANDBOX_REQUIRE_ISOLATION = True  # Sin namespaces de red y montaje no se ejecuta (el bloqueo de socket es sólo parcial)
+
+_WORKER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_worker.py')
+
+
+class _Worker:
+    """Proceso ``sandbox_worker`` arrancado con ``python -I``; atiende un trabajo a la vez."""
+
+    def __init__(self):
+        self.process = subprocess.Popen([sys.executable, '-I', _WORKER], stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+        self.ready = threading.Event()
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read, name='sandbox-reader', daemon=True).start()
+
+    def _read(self) -> None:
+        for line in self.process.stdout:
+            reply = json.loads(line)
+            if 'ready' in reply:
+                self.ready.set()
+            else:
+                self._replies.put(reply)
+        self._replies.put(None)
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def run(self, job: dict, timeout: float) -> dict:
+        self.process.stdin.write(json.dumps(job) + '\n')
+        self.process.stdin.flush()
+        reply = self._replies.get(timeout=timeout)
+        if reply is None:
+            raise RuntimeError("El proceso de trabajo del sandbox terminó inesperadamente")
+        return reply
+
+    def close(self) -> None:
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=2)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+
+
+class SandboxPool:
+    """
+    Pool de procesos Python precalentados para ejecutar bloques de código.
+    Cada bloque corre en un hijo recién bifurcado del proceso de trabajo (los
+    imports ya están hechos) con límites de CPU, memoria y tiempo, un directorio
+    temporal propio que se borra al terminar, sin red y sobre una raíz mínima:
+    sólo ve ese directorio y, en sólo lectura, /usr y la instalación de Python
+    (ni el repositorio, ni keys.env, ni las cachés). Con ``require_isolation``
+    el bloque no se ejecuta si el kernel no permite los namespaces de usuario,
+    red y montaje; sin él se ejecuta igualmente con ``network`` 'socket' y
+    ``filesystem`` 'shared' (lee lo mismo que el usuario que arranca la app).
+    """
+
+    def __init__(self, size: int = SANDBOX_WORKERS, timeout: float = SANDBOX_TIMEOUT,
+                 cpu_seconds: int = SANDBOX_CPU_SECONDS, memory_mb: int = SANDBOX_MEMORY_MB,
+                 output_bytes: int = SANDBOX_OUTPUT_BYTES, require_isolation: bool = SANDBOX_REQUIRE_ISOLATION):
+        self.size = size
+        self.limits = {'timeout': timeout, 'cpu_seconds': cpu_seconds, 'memory_mb': memory_mb,
+                       'output_bytes': output_bytes, 'require_isolation': require_isolation}
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        for _ in range(size):
+            self._spawn()
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker()
+        with self._lock:
+            self._workers.append(worker)
+        self._idle.put(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> None:
+        worker.close()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        self._spawn()
+
+    def run(self, code: str) -> dict:
+        """
+        Ejecuta un bloque y retorna ``stdout``, ``stderr``, ``returncode``,
+        ``timed_out``, ``duration``, ``network`` ('namespace', 'socket' o 'none'
+        si se rechazó por falta de aislamiento), ``filesystem`` ('isolated' o
+        'shared') y ``max_rss_kb``. Si el proceso
+        de trabajo falla se reemplaza por uno nuevo.
+        """
+        worker = self._idle.get()
+        try:
+            worker.ready.wait(timeout=self.limits['timeout'])
+            result = worker.run({'code': code, **self.limits}, timeout=self.limits['timeout'] + 5)
+        except (queue.Empty, RuntimeError, OSError) as e:
+            self._replace(worker)
+            return {'stdout': '', 'stderr': str(e) or "Sin respuesta del sandbox", 'returncode': None,
+                    'timed_out': False, 'duration': None, 'error': True}
+        if 'error' in result:
+            self._replace(worker)
+            return {'stdout': '', 'stderr': result['error'], 'returncode': None, 'timed_out': False,
+                    'duration': None, 'error': True}
+        if worker.alive():
+            self._idle.put(worker)
+        else:
+            self._replace(worker)
+        return result
+
+    def run_many(self, blocks: list, on_result: Callable[[int, dict], None] = None) -> list:
+        """
+        Ejecuta varios bloques en paralelo repartidos por el pool. ``on_result``
+        se llama desde el hilo que invoca con (índice, resultado) según terminan.
+        """
+        results = [None] * len(blocks)
+        with ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='sandbox') as pool:
+            futures = {pool.submit(self.run, code): index for index, code in enumerate(blocks)}
+            for future in as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                if on_result is not None:
+                    on_result(index, results[index])
+        return results
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
@@ -0,0 +1,252 @@
+"""
+Proceso de trabajo del sandbox local. Se arranca una vez con ``python -I``,
+importa los módulos habituales y queda esperando trabajos (una línea JSON por
+trabajo en stdin). Cada bloque se ejecuta en un hijo creado con fork, que
+hereda los imports ya hechos, aplica los límites y se descarta al terminar.
+El hijo ve una raíz mínima: el directorio del trabajo y, en sólo lectura,
+/usr y la instalación de Python. Solo usa la biblioteca estándar.
+"""
+import ctypes
+import json
+import os
+import platform
+import resource
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+# Pre-importados: los hijos los heredan ya cargados
+import bisect, collections, dataclasses, functools, heapq, itertools, math, random, re, string, typing  # noqa: F401
+
+_CLONE_NEWNS = 0x00020000
+_CLONE_NEWUSER = 0x10000000
+_CLONE_NEWNET = 0x40000000
+_MS_RDONLY, _MS_NOSUID, _MS_NODEV, _MS_NOEXEC = 0x1, 0x2, 0x4, 0x8
+_MS_REMOUNT, _MS_BIND, _MS_REC, _MS_PRIVATE = 0x20, 0x1000, 0x4000, 0x40000
+_MNT_DETACH = 0x2
+# Flags que el kernel bloquea en los montajes heredados: el remontaje en sólo lectura debe repetirlos
+_LOCKED_FLAGS = ((os.ST_NOSUID, _MS_NOSUID), (os.ST_NODEV, _MS_NODEV), (os.ST_NOEXEC, _MS_NOEXEC),
+                 (os.ST_NOATIME, 0x400), (os.ST_NODIRATIME, 0x800), (os.ST_RELATIME, 0x200000))
+_SYS_PIVOT_ROOT = {'x86_64': 155, 'aarch64': 41, 'riscv64': 41, 'ppc64le': 203, 's390x': 217}
+_DEVICES = ('null', 'zero', 'random', 'urandom')
+
+_libc = ctypes.CDLL(None, use_errno=True)
+_libc.mount.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p, ctypes.c_ulong, ctypes.c_char_p]
+
+
+def _check(result: int, operation: str) -> None:
+    if result != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, f"{operation}: {os.strerror(error)}")
+
+def _mount(source, target, fstype=None, flags=0, data=None) -> None:
+    encode = lambda value: value.encode() if isinstance(value, str) else value
+    _check(_libc.mount(encode(source), encode(target), encode(fstype), flags, encode(data)), f"mount {target}")
+
+def _bind(source: str, target: str, writable: bool = False) -> None:
+    if os.path.isdir(source):
+        os.makedirs(target, exist_ok=True)
+    else:
+        open(target, 'w').close()
+    _mount(source, target, flags=_MS_BIND | _MS_REC)
+    if not writable:
+        locked = sum(flag for st_flag, flag in _LOCKED_FLAGS if os.statvfs(target).f_flag & st_flag)
+        _mount(None, target, flags=_MS_REMOUNT | _MS_BIND | _MS_REC | _MS_RDONLY | locked)
+
+def _map_ids(uid: int, gid: int, proc: int) -> None:
+    """Mapea uid y gid a sí mismos en el namespace de usuario actual (``proc`` es un descriptor de /proc)."""
+    for name, content in (('setgroups', 'deny'), ('uid_map', f'{uid} {uid} 1'), ('gid_map', f'{gid} {gid} 1')):
+        with open(f'self/{name}', 'w', opener=lambda path, flags: os.open(path, flags, dir_fd=proc)) as f:
+            f.write(content)
+
+def _isolate_filesystem(directory: str, uid: int, gid: int) -> None:
+    """
+    Sustituye la raíz del hijo por un tmpfs de sólo lectura con lo justo para
+    Python: /usr, la instalación del intérprete y los dispositivos básicos en
+    sólo lectura y ``directory`` con escritura. El resto (el repositorio,
+    keys.env, las cachés, /etc, /home) no existe dentro del sandbox. ``uid`` y
+    ``gid`` son los del proceso antes de entrar en el namespace de usuario.
+    Al final se entra en un namespace de usuario anidado: el bloque no tiene
+    capacidades sobre los montajes y no puede remontarlos con escritura.
+    """
+    # /proc no existe en la raíz nueva; el descriptor sirve para mapear ids en el namespace anidado
+    proc = os.open('/proc', os.O_RDONLY | os.O_DIRECTORY)
+    _map_ids(uid, gid, proc)
+    _mount('none', '/', flags=_MS_REC | _MS_PRIVATE)
+    root = os.path.join(directory, '.root')
+    os.mkdir(root, 0o700)
+    _mount('tmpfs', root, 'tmpfs', _MS_NOSUID | _MS_NODEV, 'mode=0755,size=1m')
+    for tree in sorted({'/usr', sys.base_prefix, sys.prefix, sys.exec_prefix}):
+        if os.path.isdir(tree):
+            _bind(tree, root + tree)
+    for link in ('bin', 'sbin', 'lib', 'lib32', 'lib64'):
+        if os.path.islink('/' + link):
+            os.symlink(os.readlink('/' + link), os.path.join(root, link))
+        elif os.path.isdir('/' + link):
+            _bind('/' + link, os.path.join(root, link))
+    os.mkdir(os.path.join(root, 'dev'))
+    for device in _DEVICES:
+        _bind('/dev/' + device, os.path.join(root, 'dev', device), writable=True)
+    # Sin _MS_REC: la raíz nueva está montada dentro de directory
+    os.makedirs(root + directory)
+    _mount(directory, root + directory, flags=_MS_BIND)
+    old_root = os.path.join(root, '.old')
+    os.mkdir(old_root)
+    _check(_libc.syscall(_SYS_PIVOT_ROOT[platform.machine()], root.encode(), old_root.encode()), "pivot_root")
+    os.chdir('/')
+    _check(_libc.umount2(b'/.old', _MNT_DETACH), "umount old root")
+    os.rmdir('/.old')
+    _mount(None, '/', flags=_MS_REMOUNT | _MS_BIND | _MS_RDONLY | _MS_NOSUID | _MS_NODEV)
+    _check(_libc.unshare(_CLONE_NEWUSER), "unshare nested user namespace")
+    _map_ids(uid, gid, proc)
+    os.close(proc)
+
+def _isolate(directory: str, required: bool) -> tuple:
+    """
+    Nuevos namespaces de usuario, red (sin interfaces) y montaje con la raíz
+    mínima de _isolate_filesystem. Retorna (red, sistema de archivos). Si el
+    kernel no lo permite y el aislamiento es obligatorio, la red vale 'none'
+    (o el sistema de archivos 'shared') y el bloque no se ejecuta; si no es
+    obligatorio se bloquea el módulo socket ('socket'), un aislamiento parcial
+    (_socket, subprocess o ctypes siguen llegando a la red), y el sistema de
+    archivos queda compartido.
+    """
+    uid, gid = os.getuid(), os.getgid()
+    try:
+        if _libc.unshare(_CLONE_NEWUSER | _CLONE_NEWNET | _CLONE_NEWNS) == 0:
+            try:
+                _isolate_filesystem(directory, uid, gid)
+                return 'namespace', 'isolated'
+            except (OSError, KeyError):
+                os.chdir(directory)
+                return 'namespace', 'shared'
+    except AttributeError:
+        pass
+    if required:
+        return 'none', 'shared'
+    import socket
+
+    def blocked(*args, **kwargs):
+        raise PermissionError("Network access is disabled in the sandbox")
+
+    socket.socket = socket.create_connection = socket.getaddrinfo = socket.socketpair = blocked
+    return 'socket', 'shared'
+
+def _limit(cpu_seconds: int, memory_mb: int, output_bytes: int) -> None:
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024,) * 2)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (output_bytes * 4,) * 2)
+    resource.setrlimit(resource.RLIMIT_NPROC, (256, 256))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+
+def _child(job: dict, directory: str, stdout_path: str, stderr_path: str, network_fd: int) -> None:
+    os.setsid()
+    os.chdir(directory)
+    os.environ.clear()
+    os.environ.update({'HOME': directory, 'TMPDIR': directory, 'PYTHONHASHSEED': '0', 'PATH': '/usr/bin:/bin'})
+    tempfile.tempdir = directory
+    required = job.get('require_isolation', True)
+    network, filesystem = _isolate(directory, required)
+    os.chdir(directory)
+    os.write(network_fd, f"{network} {filesystem}".encode())
+    os.close(network_fd)
+    stdin = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(stdin, 0)
+    os.dup2(os.open(stdout_path, os.O_WRONLY | os.O_CREAT, 0o600), 1)
+    os.dup2(os.open(stderr_path, os.O_WRONLY | os.O_CREAT, 0o600), 2)
+    # Sin acceso al canal de respuestas ni a los pipes del proceso de trabajo
+    os.closerange(3, resource.getrlimit(resource.RLIMIT_NOFILE)[0])
+    sys.stdin = open(0, closefd=False)
+    sys.stdout = open(1, 'w', closefd=False)
+    sys.stderr = open(2, 'w', closefd=False)
+    if required and (network == 'none' or filesystem == 'shared'):
+        sys.stderr.write("Sandbox refused to run the code: user, network and mount namespaces "
+                         "are not available on this system\n")
+        sys.stderr.flush()
+        os._exit(126)
+    _limit(job['cpu_seconds'], job['memory_mb'], job['output_bytes'])
+    code = 0
+    try:
+        exec(compile(job['code'], '<bloque>', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    os._exit(code)
+
+
+def _read(path: str, limit: int) -> tuple:
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(limit + 1)
+    except OSError:
+        return '', False
+    return data[:limit].decode('utf-8', 'replace'), len(data) > limit
+
+
+def run(job: dict) -> dict:
+    directory = tempfile.mkdtemp(prefix='sandbox-')
+    stdout_path, stderr_path = os.path.join(directory, '.stdout'), os.path.join(directory, '.stderr')
+    network_read, network_write = os.pipe()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(network_read)
+        try:
+            _child(job, directory, stdout_path, stderr_path, network_write)
+        finally:
+            os._exit(1)
+    os.close(network_write)
+    timed_out = False
+    deadline = start + job['timeout']
+    while True:
+        finished, status, usage = os.wait4(pid, os.WNOHANG)
+        if finished:
+            break
+        if time.perf_counter() > deadline:
+            timed_out = True
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                os.kill(pid, signal.SIGKILL)
+            _, status, usage = os.wait4(pid, 0)
+            break
+        time.sleep(0.002)
+    duration = time.perf_counter() - start
+    network, _, filesystem = os.read(network_read, 32).decode().partition(' ')
+    os.close(network_read)
+    stdout, stdout_truncated = _read(stdout_path, job['output_bytes'])
+    stderr, stderr_truncated = _read(stderr_path, job['output_bytes'])
+    shutil.rmtree(directory, ignore_errors=True)
+    killed = os.WTERMSIG(status) if os.WIFSIGNALED(status) else None
+    return {'stdout': stdout, 'stderr': stderr, 'truncated': stdout_truncated or stderr_truncated,
+            'returncode': os.WEXITSTATUS(status) if os.WIFEXITED(status) else -killed,
+            'signal': signal.Signals(killed).name if killed else None, 'timed_out': timed_out,
+            'cpu_limit': killed == signal.SIGXCPU, 'duration': duration, 'network': network or None,
+            'filesystem': filesystem or None, 'max_rss_kb': usage.ru_maxrss}
+
+
+def main() -> None:
+    # El canal de respuestas es una copia de stdout; el stdout del proceso no se usa para nada más
+    replies = os.fdopen(os.dup(1), 'w', buffering=1)
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    replies.write(json.dumps({'ready': os.getpid()}) + '\n')
+    for line in sys.stdin:
+        job = json.loads(line)
+        try:
+            result = run(job)
+        except Exception:
+            result = {'error': traceback.format_exc()}
+        replies.write(json.dumps(result) + '\n')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_SOLUTION = """Analizando el problema: {task}
+
+La idea es recorrer la entrada una sola vez guardando lo ya visto, con tiempo O(n) y espacio O(n).
+
+```python
+from typing import List
+
+
+def solve(values: List[int]) -> int:
+    \"\"\"Suma los valores distintos de la lista.\"\"\"
+    seen = set()
+    total = 0
+    for value in values:
+        if value not in seen:
+            seen.add(value)
+            total += value
+    return total
+
+
+if __name__ == "__main__":
+    print(solve([1, 2, 2, 3]))
+```
+
+Casos borde: lista vacía (retorna 0) y valores repetidos.
+"""
+
+_COMPARISON = """```python
+# Script 1 differences:
+# - {first}
+# Script 2 differences:
+# - {second}
+```
+
+Ambos scripts resuelven la misma tarea; el análisis detallado se basa en las diferencias anteriores.
+"""
+
+
+def stand_in_reply(messages: list) -> str:
+    """Respuesta determinista según el último mensaje del usuario (comparación o solución)."""
+    prompt = next((m.get('content') for m in reversed(messages) if m.get('role') == 'user'), '') or ''
+    if isinstance(prompt, list):
+        prompt = ' '.join(part.get('text', '') for part in prompt if isinstance(part, dict))
+    first_line = next((line.strip() for line in prompt.splitlines() if line.strip()), '')
+    if 'compara' in prompt.lower():
+        return _COMPARISON.format(first="estructura según el diff local", second="ver resumen estructural")
+    return _SOLUTION.format(task=first_line[:120])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    delay = 0.01
+    first_token_delay = 0.2
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            self._json(200, {'object': 'list', 'data': [{'id': 'stand-in', 'object': 'model'}]})
+        else:
+            self._json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._json(404, {'error': {'message': 'not found'}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        reply = stand_in_reply(request.get('messages', []))
+        model = request.get('model', 'stand-in')
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {'prompt_tokens': sum(len(str(m.get('content', '')).split()) for m in request.get('messages', [])),
+                 'completion_tokens': len(reply.split())}
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+        if not request.get('stream'):
+            time.sleep(self.first_token_delay + self.delay * len(reply.split()))
+            self._json(200, {'id': completion_id, 'object': 'chat.completion', 'created': int(time.time()),
+                             'model': model, 'usage': usage,
+                             'choices': [{'index': 0, 'finish_reason': 'stop',
+                                          'message': {'role': 'assistant', 'content': reply}}]})
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        def send(choices: list, **extra) -> None:
+            chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': choices, **extra}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+
+        time.sleep(self.first_token_delay)
+        send([{'index': 0, 'delta': {'role': 'assistant', 'content': ''}, 'finish_reason': None}])
+        # Un token por palabra, conservando espacios y saltos de línea
+        tokens = reply.replace('\n', '\n\x00').replace(' ', ' \x00').split('\x00')
+        for token in tokens:
+            if token:
+                send([{'index': 0, 'delta': {'content': token}, 'finish_reason': None}])
+                time.sleep(self.delay)
+        send([{'index': 0, 'delta': {}, 'finish_reason': 'stop'}])
+        if (request.get('stream_options') or {}).get('include_usage'):
+            send([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+def serve(host: str = '127.0.0.1', port: int = 8001, delay: float = 0.01,
+          first_token_delay: float = 0.2) -> ThreadingHTTPServer:
+    """
+    Arranca en un hilo un servidor compatible con ``/v1/chat/completions`` de
+    OpenAI (con y sin streaming SSE) que responde sin red ni claves. Usar
+    ``http://host:port/v1`` como URL base del modelo.
+    """
+    handler = type('StandInHandler', (_Handler,), {'delay': delay, 'first_token_delay': first_token_delay})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='stand-in-model', daemon=True).start()
+    return server
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Modelo local compatible con la API de OpenAI para pruebas sin red")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--delay', type=float, default=0.01, help="Segundos entre tokens")
+    parser.add_argument('--first-token-delay', type=float, default=0.2, help="Segundos hasta el primer token")
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.delay, args.first_token_delay)
+    print(f"Stand-in model on http://{args.host}:{server.server_address[1]}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import time
+from typing import Callable, Iterator
+from .response_cache import cache_key
+
+
+class CodeBlockParser:
+    """
+    Detecta bloques de código markdown (```lenguaje ... ```) en un texto que
+    llega por fragmentos. Cada bloque se entrega en cuanto se cierra su fence,
+    sin esperar al resto de la respuesta.
+    """
+
+    def __init__(self):
+        self.blocks = []  # (lenguaje, código) de los bloques cerrados
+        self._partial = ''
+        self._language = None
+        self._lines = None
+
+    def feed(self, text: str) -> list:
+        """Procesa un fragmento. Retorna los bloques que se cerraron con él."""
+        closed = []
+        self._partial += text
+        *lines, self._partial = self._partial.split('\n')
+        for line in lines:
+            block = self._line(line)
+            if block is not None:
+                closed.append(block)
+        return closed
+
+    def close(self) -> list:
+        """Procesa la última línea pendiente al terminar la respuesta."""
+        closed = []
+        if self._partial:
+            block = self._line(self._partial)
+            self._partial = ''
+            if block is not None:
+                closed.append(block)
+        return closed
+
+    def _line(self, line: str):
+        stripped = line.strip()
+        if self._lines is None:
+            if stripped.startswith('```'):
+                self._language = stripped[3:].strip().lower()
+                self._lines = []
+            return None
+        if stripped == '```':
+            block = (self._language, '\n'.join(self._lines).strip())
+            self._lines = None
+            self.blocks.append(block)
+            return block
+        self._lines.append(line)
+        return None
+
+
+def python_blocks(blocks: list) -> list:
+    """Código de los bloques ``python``; si no hay ninguno, de los bloques sin lenguaje (como extract_code_blocks)."""
+    tagged = [code for language, code in blocks if language == 'python']
+    return tagged or [code for language, code in blocks if not language]
+
+
+def stream_deltas(agent, prompt: str) -> Iterator[str]:
+    """Fragmentos de texto de ``agent.run(prompt, stream=True)``."""
+    for chunk in agent.run(prompt, stream=True):
+        content = getattr(chunk, 'content', None)
+        if isinstance(content, str) and content:
+            yield content
+
+
+class StreamResult:
+    """Respuesta acumulada de un streaming con sus tiempos y bloques de código."""
+
+    def __init__(self):
+        self.content = ''
+        self.blocks = []
+        self.ttft = None  # segundos hasta el primer token
+        self.total = None  # segundos hasta el final de la generación
+
+
+def consume_stream(deltas: Iterator[str], on_text: Callable[[str], None] = None,
+                   on_block: Callable[[str, str], None] = None, min_interval: float = 0.05) -> StreamResult:
+    """
+    Acumula los fragmentos de ``deltas``. ``on_text`` recibe el texto completo
+    como mucho cada ``min_interval`` segundos (volver a renderizar markdown en
+    cada token es cuadrático) y una vez al final; ``on_block`` recibe cada
+    bloque de código en cuanto se cierra.
+    """
+    result = StreamResult()
+    parser = CodeBlockParser()
+    parts = []
+    start = time.perf_counter()
+    last_render = 0.0
+    for delta in deltas:
+        now = time.perf_counter()
+        if result.ttft is None:
+            result.ttft = now - start
+        parts.append(delta)
+        for language, code in parser.feed(delta):
+            if on_block is not None:
+                on_block(language, code)
+        if on_text is not None and now - last_render >= min_interval:
+            on_text(''.join(parts))
+            last_render = now
+    for language, code in parser.close():
+        if on_block is not None:
+            on_block(language, code)
+    result.total = time.perf_counter() - start
+    result.content = ''.join(parts)
+    result.blocks = parser.blocks
+    if on_text is not None:
+        on_text(result.content)
+    return result
+
+
+def cached_stream(agent, prompt: str, cache, bypass: bool = False, stats: dict = None,
+                  on_text: Callable[[str], None] = None, on_block: Callable[[str, str], None] = None) -> dict:
+    """
+    Versión en streaming de ``cached_run``: un acierto de cache se entrega
+    entero de una vez; si no, la respuesta se va entregando a ``on_text`` y
+    ``on_block`` mientras se genera y se guarda al terminar. Retorna
+    ``content``, ``cached``, ``latency``, ``ttft`` y ``blocks``.
+    """
+    key = cache_key(agent.model.id, agent.model.system_prompt, prompt, getattr(agent.model, 'base_url', None))
+    if not bypass:
+        hit = cache.get(key)
+        if hit is not None:
+            if stats is not None:
+                stats['hits'] = stats.get('hits', 0) + 1
+                stats['saved'] = stats.get('saved', 0.0) + hit['latency']
+            parser = CodeBlockParser()
+            for language, code in parser.feed(hit['content']) + parser.close():
+                if on_block is not None:
+                    on_block(language, code)
+            if on_text is not None:
+                on_text(hit['content'])
+            return {'content': hit['content'], 'cached': True, 'latency': hit['latency'], 'ttft': None,
+                    'blocks': parser.blocks}
+    result = consume_stream(stream_deltas(agent, prompt), on_text=on_text, on_block=on_block)
+    if stats is not None:
+        stats['misses'] = stats.get('misses', 0) + 1
+    if result.content:
+        cache.put(key, agent.model.id, result.content, result.total)
+    return {'content': result.content, 'cached': False, 'latency': result.total, 'ttft': result.ttft,
+            'blocks': result.blocks}
@@ -0,0 +1,279 @@
+import ast
+import copy
+import difflib
+import io
+import textwrap
+import tokenize
+
+COMPARE_CHUNK_CHARS = 12000  # Tamaño máximo de las regiones cambiadas por prompt
+DIFF_CONTEXT = 2  # Líneas de contexto en los diffs de cada región
+SUMMARY_NAMES = 40  # Regiones cambiadas y sin cambios que se listan en el resumen
+
+KIND_LABELS = {'import': 'Imports', 'class': 'Clases', 'function': 'Funciones', 'method': 'Métodos',
+               'module': 'Código de módulo'}
+STATUS_MARKS = {'added': '+', 'removed': '-', 'changed': '~'}
+
+
+def _import_names(node) -> list:
+    if isinstance(node, ast.Import):
+        return [f"import {alias.name}" + (f" as {alias.asname}" if alias.asname else '') for alias in node.names]
+    module = '.' * node.level + (node.module or '')
+    return [f"from {module} import {alias.name}" + (f" as {alias.asname}" if alias.asname else '')
+            for alias in node.names]
+
+def _span(node) -> tuple:
+    # Los decoradores forman parte de la definición
+    start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+    return start, node.end_lineno
+
+def _lines(source_lines: list, spans: list) -> list:
+    return [line for start, end in spans for line in source_lines[start - 1:end]]
+
+
+class _Definition:
+    """Región del script: su firma estructural (AST sin posiciones) y sus líneas de código."""
+
+    def __init__(self, kind: str, name: str, signature: str, lines: list):
+        self.kind = kind
+        self.name = name
+        self.signature = signature
+        self.lines = lines
+
+
+def definitions(source: str) -> dict:
+    """
+    Divide un script en imports, clases (cabecera y atributos), métodos,
+    funciones y el resto del código de módulo. Retorna {(tipo, nombre): _Definition}.
+    Lanza SyntaxError si el script no es Python válido.
+    """
+    tree = ast.parse(source)
+    source_lines = source.splitlines()
+    found = {}
+    module_nodes = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            found[('function', node.name)] = _Definition('function', node.name, ast.dump(node),
+                                                         _lines(source_lines, [_span(node)]))
+        elif isinstance(node, ast.ClassDef):
+            methods = [child for child in node.body if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            for method in methods:
+                name = f"{node.name}.{method.name}"
+                found[('method', name)] = _Definition('method', name, ast.dump(method),
+                                                      _lines(source_lines, [_span(method)]))
+            # La clase en sí: cabecera, bases y atributos, sin los métodos
+            header = copy.copy(node)
+            header.body = [child for child in node.body if child not in methods]
+            start, end = _span(node)
+            spans, cursor = [], start
+            for method in methods:
+                method_start, method_end = _span(method)
+                if method_start > cursor:
+                    spans.append((cursor, method_start - 1))
+                cursor = method_end + 1
+            if cursor <= end:
+                spans.append((cursor, end))
+            found[('class', node.name)] = _Definition('class', node.name, ast.dump(header),
+                                                      _lines(source_lines, spans))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            line = source_lines[node.lineno - 1:node.end_lineno]
+            for name in _import_names(node):
+                found[('import', name)] = _Definition('import', name, name, line)
+        else:
+            module_nodes.append(node)
+    if module_nodes:
+        found[('module', '<module>')] = _Definition(
+            'module', '<module>', '\n'.join(ast.dump(node) for node in module_nodes),
+            _lines(source_lines, [_span(node) for node in module_nodes]))
+    return found
+
+
+def code_tokens(lines: list) -> list:
+    """Tokens significativos del código (sin comentarios ni saltos de línea)."""
+    text = textwrap.dedent('\n'.join(lines)) + '\n'
+    ignored = (tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT,
+               tokenize.ENDMARKER)
+    try:
+        return [token.string for token in tokenize.generate_tokens(io.StringIO(text).readline)
+                if token.type not in ignored]
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return text.split()
+
+def token_similarity(first: list, second: list) -> float:
+    return difflib.SequenceMatcher(None, code_tokens(first), code_tokens(second), autojunk=False).ratio()
+
+def _unified(first: list, second: list, name: str) -> str:
+    return '\n'.join(difflib.unified_diff(first, second, f"script1:{name}", f"script2:{name}",
+                                          n=DIFF_CONTEXT, lineterm=''))
+
+
+class StructuralDiff:
+    """
+    Diferencias estructurales entre dos scripts: ``entries`` con las regiones
+    añadidas, eliminadas o cambiadas (con su diff y similitud de tokens) y
+    ``unchanged`` con las que son idénticas salvo formato y comentarios.
+    """
+
+    def __init__(self, entries: list, unchanged: list, identical: bool, error: str = None):
+        self.entries = entries
+        self.unchanged = unchanged
+        self.identical = identical  # mismo texto exacto
+        self.error = error  # alguno de los scripts no se pudo analizar
+
+    def counts(self) -> dict:
+        """{tipo: {'added', 'removed', 'changed', 'unchanged'}} para el resumen."""
+        counts = {}
+        for entry in self.entries:
+            kind = counts.setdefault(entry['kind'], dict.fromkeys(('added', 'removed', 'changed', 'unchanged'), 0))
+            kind[entry['status']] += 1
+        for kind_name, _ in self.unchanged:
+            kind = counts.setdefault(kind_name, dict.fromkeys(('added', 'removed', 'changed', 'unchanged'), 0))
+            kind['unchanged'] += 1
+        return counts
+
+    def summary(self, names: bool = True) -> str:
+        """Resumen compacto en texto para el prompt del modelo; sin ``names`` solo los totales por tipo."""
+        if self.error:
+            return f"No se pudo analizar la estructura ({self.error}); se compara el texto completo."
+        lines = []
+        for kind, count in self.counts().items():
+            lines.append(f"{KIND_LABELS[kind]}: +{count['added']} -{count['removed']} ~{count['changed']} "
+                         f"={count['unchanged']}")
+        if not names:
+            return '\n'.join(lines)
+        for entry in self.entries[:SUMMARY_NAMES]:
+            similarity = f" (similitud {entry['similarity']:.0%})" if entry['similarity'] is not None else ''
+            label = entry['name'] if entry['kind'] == 'import' else f"{entry['kind']} {entry['name']}"
+            lines.append(f"{STATUS_MARKS[entry['status']]} {label}{similarity}")
+        if len(self.entries) > SUMMARY_NAMES:
+            lines.append(f"... y {len(self.entries) - SUMMARY_NAMES} regiones cambiadas más")
+        if self.unchanged:
+            unchanged = [name for _, name in self.unchanged]
+            more = f" y {len(unchanged) - SUMMARY_NAMES} más" if len(unchanged) > SUMMARY_NAMES else ''
+            lines.append("Sin cambios: " + ', '.join(unchanged[:SUMMARY_NAMES]) + more)
+        return '\n'.join(lines)
+
+    def rows(self) -> list:
+        """Filas para mostrar en una tabla."""
+        return [{'tipo': entry['kind'], 'nombre': entry['name'], 'estado': entry['status'],
+                 'similitud': None if entry['similarity'] is None else round(entry['similarity'], 2),
+                 'líneas': entry['size']} for entry in self.entries]
+
+    def regions(self) -> list:
+        """Texto de cada región cambiada (diff o código completo) para el modelo."""
+        regions = []
+        for entry in self.entries:
+            language = 'diff' if entry['status'] == 'changed' else 'python'
+            regions.append(f"### {entry['status']} {entry['kind']} {entry['name']}\n```{language}\n{entry['diff']}\n```")
+        return regions
+
+
+def structural_diff(first: str, second: str) -> StructuralDiff:
+    """Compara dos scripts por su AST; si alguno no compila, cae a un diff de texto completo."""
+    if first == second:
+        return StructuralDiff([], [], identical=True)
+    try:
+        before, after = definitions(first), definitions(second)
+    except SyntaxError as e:
+        first_lines, second_lines = first.splitlines(), second.splitlines()
+        entry = {'kind': 'module', 'name': '<script>', 'status': 'changed',
+                 'similarity': token_similarity(first_lines, second_lines),
+                 'diff': _unified(first_lines, second_lines, '<script>'), 'size': len(second_lines)}
+        return StructuralDiff([entry], [], identical=False, error=f"línea {e.lineno}: {e.msg}")
+
+    entries, unchanged = [], []
+    order = list(before) + [key for key in after if key not in before]
+    for key in sorted(order, key=lambda key: list(KIND_LABELS).index(key[0])):
+        old, new = before.get(key), after.get(key)
+        if old is not None and new is not None and old.signature == new.signature:
+            unchanged.append(key)
+        elif new is None:
+            entries.append({'kind': key[0], 'name': key[1], 'status': 'removed', 'similarity': None,
+                            'diff': '\n'.join(old.lines), 'size': len(old.lines)})
+        elif old is None:
+            entries.append({'kind': key[0], 'name': key[1], 'status': 'added', 'similarity': None,
+                            'diff': '\n'.join(new.lines), 'size': len(new.lines)})
+        else:
+            entries.append({'kind': key[0], 'name': key[1], 'status': 'changed',
+                            'similarity': token_similarity(old.lines, new.lines),
+                            'diff': _unified(old.lines, new.lines, key[1]), 'size': len(new.lines)})
+    return StructuralDiff(entries, unchanged, identical=False)
+
+
+def _split_region(region: str, max_chars: int) -> list:
+    pieces, current = [], []
+    for line in region.split('\n'):
+        if current and sum(len(part) + 1 for part in current) + len(line) > max_chars:
+            pieces.append('\n'.join(current) + "\n```")
+            current = ["```"]
+        current.append(line)
+    pieces.append('\n'.join(current))
+    return pieces
+
+def chunk_regions(regions: list, max_chars: int = COMPARE_CHUNK_CHARS) -> list:
+    """Agrupa las regiones en bloques de como mucho ``max_chars`` (partiendo las que no caben solas)."""
+    chunks, current, size = [], [], 0
+    for region in regions:
+        for piece in (_split_region(region, max_chars) if len(region) > max_chars else [region]):
+            if current and size + len(piece) > max_chars:
+                chunks.append(current)
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece)
+    if current:
+        chunks.append(current)
+    return ['\n\n'.join(chunk) for chunk in chunks]
+
+
+def _measurements_section(measurements: str) -> str:
+    if not measurements:
+        return ''
+    return f"""
+Mediciones reales de ambos scripts (cProfile y tracemalloc, JSON):
+{measurements}
+Basa el análisis de eficiencia en estas mediciones: tiempos, llamadas, funciones más costosas y memoria pico.
+"""
+
+def comparison_prompts(diff: StructuralDiff, max_chars: int = COMPARE_CHUNK_CHARS, measurements: str = None) -> list:
+    """
+    Prompts para comparar los scripts enviando solo el resumen estructural y
+    las regiones cambiadas. Si no caben en un prompt, retorna uno por bloque
+    (fase map) y la respuesta final se pide con ``reduce_prompt``, que es la
+    que recibe las ``measurements`` en ese caso.
+    """
+    summary = diff.summary()
+    chunks = chunk_regions(diff.regions(), max_chars)
+    if len(chunks) == 1:
+        return [f"""Compara dos scripts de Python e identifica las diferencias y similitudes clave.
+El diff estructural se calculó localmente: lo que no aparece abajo es idéntico en ambos scripts
+(salvo formato y comentarios).
+
+Resumen estructural:
+{summary}
+
+Regiones que cambian:
+{chunks[0]}
+{_measurements_section(measurements)}
+Por favor, comienza tu respuesta con un bloque de código que resuma las principales diferencias."""]
+    return [f"""Parte {index} de {len(chunks)} de la comparación de dos scripts de Python.
+Totales del diff estructural (calculado localmente):
+{diff.summary(names=False)}
+
+Regiones que cambian en esta parte:
+{chunk}
+
+Analiza solo estas regiones: diferencias de comportamiento, algoritmo, complejidad y estilo, en viñetas breves."""
+            for index, chunk in enumerate(chunks, start=1)]
+
+def reduce_prompt(diff: StructuralDiff, partials: list, measurements: str = None) -> str:
+    """Prompt final que combina los análisis parciales de la fase map."""
+    analyses = '\n\n'.join(f"Análisis parcial {index}:\n{partial}" for index, partial in enumerate(partials, start=1))
+    return f"""Compara dos scripts de Python a partir de su resumen estructural y de los análisis parciales
+de las regiones que cambian (lo no listado es idéntico).
+
+Resumen estructural:
+{diff.summary()}
+
+{analyses}
+{_measurements_section(measurements)}
+
+Por favor, comienza tu respuesta con un bloque de código que resuma las principales diferencias y luego da el análisis detallado."""
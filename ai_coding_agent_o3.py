@@ -7,6 +7,15 @@ import re
 from PIL import Image
 from io import BytesIO
 import base64
+from functools import partial
+import pandas as pd
+from agent_tools.response_cache import ResponseCache, cached_run
+from agent_tools.streaming import cached_stream, python_blocks
+from agent_tools.structural_diff import StructuralDiff, structural_diff, comparison_prompts, reduce_prompt, KIND_LABELS
+from agent_tools.batch_compare import compare_batch, BATCH_WORKERS, NEAR_DUPLICATE
+from agent_tools.sandbox import SandboxPool, SANDBOX_TIMEOUT
+from agent_tools.complexity import benchmark, entry_points, default_arguments, claimed_complexity, is_worse, history_key
+from agent_tools.profiling import profile_scripts, profile_summary, cpu_note, PROFILE_SIZE
 
 def initialize_session_state() -> None:
     if 'openai_key' not in st.session_state:
@@ -15,13 +24,39 @@ def initialize_session_state() -> None:
         st.session_state.gemini_key = ''
     if 'e2b_key' not in st.session_state:
         st.session_state.e2b_key = ''
-    # Se inhabilita el sandbox asignándole None
+    # Se inhabilita el sandbox de E2B asignándole None; el código se ejecuta en el sandbox local
     st.session_state.sandbox = None
+    # Desactivado por defecto: el código generado se ejecuta en esta máquina
+    if 'local_sandbox' not in st.session_state:
+        st.session_state.local_sandbox = False
+    # Última complejidad medida por problema y función (history_key), para detectar regresiones
+    if 'complexity_history' not in st.session_state:
+        st.session_state.complexity_history = {}
     # Agregamos estados para los scripts a comparar
     if 'script1' not in st.session_state:
         st.session_state.script1 = ''
     if 'script2' not in st.session_state:
         st.session_state.script2 = ''
+    # Estadísticas de la cache de respuestas en esta sesión
+    if 'cache_stats' not in st.session_state:
+        st.session_state.cache_stats = {'hits': 0, 'misses': 0, 'saved': 0.0}
+    if 'bypass_cache' not in st.session_state:
+        st.session_state.bypass_cache = False
+    # Opciones del modelo: streaming de tokens y URL base alternativa (p. ej. el stand-in local)
+    if 'stream_responses' not in st.session_state:
+        st.session_state.stream_responses = True
+    if 'model_base_url' not in st.session_state:
+        st.session_state.model_base_url = ''
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    # Una única cache en disco compartida por todas las sesiones
+    return ResponseCache()
+
+@st.cache_resource
+def get_sandbox_pool() -> SandboxPool:
+    # Procesos de trabajo precalentados, compartidos por todas las sesiones
+    return SandboxPool()
 
 def setup_sidebar() -> None:
     with st.sidebar:
@@ -36,12 +71,70 @@ def setup_sidebar() -> None:
                                                 value=st.session_state.e2b_key,
                                                 type="password")
 
+        st.title("Modelo")
+        st.session_state.stream_responses = st.checkbox("Mostrar la respuesta mientras se genera",
+                                                        value=st.session_state.stream_responses)
+        st.session_state.model_base_url = st.text_input("URL base del modelo (opcional)",
+                                                        value=st.session_state.model_base_url,
+                                                        placeholder="http://127.0.0.1:8001/v1")
+        st.session_state.local_sandbox = st.checkbox(f"Ejecutar el código en el sandbox local (límite {SANDBOX_TIMEOUT} s)",
+                                                     value=st.session_state.local_sandbox,
+                                                     help="El código corre en esta máquina sin red, pero puede leer "
+                                                          "los archivos del usuario que arrancó la app.")
+
+        st.title("Cache de Respuestas")
+        st.session_state.bypass_cache = st.checkbox("Ignorar cache (consultar siempre al modelo)",
+                                                    value=st.session_state.bypass_cache)
+        stats = st.session_state.cache_stats
+        total = stats['hits'] + stats['misses']
+        col1, col2 = st.columns(2)
+        col1.metric("Tasa de aciertos", f"{stats['hits'] / total:.0%}" if total else "-")
+        col2.metric("Latencia ahorrada", f"{stats['saved']:.1f} s")
+        cache_info = get_response_cache().stats()
+        st.caption(f"{cache_info['entries']} respuestas guardadas ({cache_info['bytes'] / 1024:.0f} KB)")
+        if st.button("Vaciar cache"):
+            get_response_cache().clear()
+
+def create_comparison_agent(api_key: str, base_url: str = '') -> Agent:
+    # Recibe la configuración explícitamente: la comparación por lotes crea un agente por hilo
+    return Agent(
+        model=OpenAIChat(
+            id="o3-mini",
+            api_key=api_key,
+            base_url=base_url or None,
+            system_prompt="""You are an expert Python code analyzer. Your task is to compare two Python scripts and provide a detailed analysis of their similarities and differences.
+
+            For each comparison, you should:
+            1. Identify structural differences (functions, classes, imports)
+            2. Analyze algorithmic approaches and efficiency
+            3. Highlight code style and best practices
+            4. Suggest improvements
+            
+            IMPORTANT: Always format your response with proper markdown, using code blocks for any code snippets.
+            ALWAYS begin your response with a code block showing key differences.
+            Example:
+            ```python
+            # Script 1 differences:
+            # - Uses recursion
+            # - O(n^2) time complexity
+            
+            # Script 2 differences:
+            # - Uses iteration
+            # - O(n) time complexity
+            ```
+            
+            Then provide your detailed analysis."""
+        ),
+        markdown=True
+    )
+
 def create_agents() -> tuple[Agent, Agent, Agent, Agent]:
     # Se mantiene el agente de visión como "dummy"
     vision_agent = Agent(
         model=OpenAIChat(
             id="o3-mini", 
             api_key=st.session_state.openai_key,
+            base_url=st.session_state.model_base_url or None,
             system_prompt="Imagenes deshabilitadas. No se procesa entrada visual."
         ),
         markdown=True
@@ -51,6 +144,7 @@ def create_agents() -> tuple[Agent, Agent, Agent, Agent]:
         model=OpenAIChat(
             id="o3-mini", 
             api_key=st.session_state.openai_key,
+            base_url=st.session_state.model_base_url or None,
             system_prompt="""You are an expert Python programmer. You will receive coding problems similar to LeetCode questions, 
             which may include problem statements, sample inputs, and examples. Your task is to:
             1. Analyze the problem carefully and Optimally with best possible time and space complexities.
@@ -66,6 +160,7 @@ def create_agents() -> tuple[Agent, Agent, Agent, Agent]:
         model=OpenAIChat(
             id="o3-mini",
             api_key=st.session_state.openai_key,
+            base_url=st.session_state.model_base_url or None,
             system_prompt="""You are an expert at executing Python code in sandbox environments.
             Your task is to:
             1. Take the provided Python code
@@ -78,35 +173,7 @@ def create_agents() -> tuple[Agent, Agent, Agent, Agent]:
     )
     
     # Nuevo agente para comparar scripts
-    comparison_agent = Agent(
-        model=OpenAIChat(
-            id="o3-mini",
-            api_key=st.session_state.openai_key,
-            system_prompt="""You are an expert Python code analyzer. Your task is to compare two Python scripts and provide a detailed analysis of their similarities and differences.
-
-            For each comparison, you should:
-            1. Identify structural differences (functions, classes, imports)
-            2. Analyze algorithmic approaches and efficiency
-            3. Highlight code style and best practices
-            4. Suggest improvements
-            
-            IMPORTANT: Always format your response with proper markdown, using code blocks for any code snippets.
-            ALWAYS begin your response with a code block showing key differences.
-            Example:
-            ```python
-            # Script 1 differences:
-            # - Uses recursion
-            # - O(n^2) time complexity
-            
-            # Script 2 differences:
-            # - Uses iteration
-            # - O(n) time complexity
-            ```
-            
-            Then provide your detailed analysis."""
-        ),
-        markdown=True
-    )
+    comparison_agent = create_comparison_agent(st.session_state.openai_key, st.session_state.model_base_url)
     
     return vision_agent, coding_agent, execution_agent, comparison_agent
 
@@ -126,6 +193,147 @@ def extract_code_blocks(response_content: str) -> list:
     
     return matches
 
+def run_agent(agent: Agent, prompt: str) -> dict:
+    """
+    Ejecuta el agente a través de la cache de respuestas y muestra la respuesta
+    en markdown. Con streaming activo el texto se renderiza a medida que llegan
+    los tokens y los bloques de código se detectan en cuanto se cierran.
+    Retorna ``content``, ``cached``, ``latency`` y ``code_blocks``.
+    """
+    if not st.session_state.stream_responses:
+        with st.spinner("Generando respuesta..."):
+            result = cached_run(agent, prompt, get_response_cache(), bypass=st.session_state.bypass_cache,
+                                stats=st.session_state.cache_stats)
+        st.markdown(result['content'])
+        result['code_blocks'] = extract_code_blocks(result['content'])
+    else:
+        text_placeholder = st.empty()
+        blocks_placeholder = st.empty()
+        detected = []
+
+        def on_block(language: str, code: str) -> None:
+            if language in ('python', ''):
+                detected.append(code)
+                blocks_placeholder.caption(f"Bloques de código detectados: {len(detected)}")
+
+        result = cached_stream(agent, prompt, get_response_cache(), bypass=st.session_state.bypass_cache,
+                               stats=st.session_state.cache_stats,
+                               on_text=lambda text: text_placeholder.markdown(text + "▌"), on_block=on_block)
+        text_placeholder.markdown(result['content'])
+        blocks_placeholder.empty()
+        result['code_blocks'] = python_blocks(result['blocks'])
+        if not result['cached']:
+            st.caption(f"Primer token: {result['ttft'] or 0:.2f} s · Total: {result['latency']:.2f} s")
+    if result['cached']:
+        st.caption(f"Respuesta desde cache (ahorró {result['latency']:.1f} s)")
+    return result
+
+def show_execution(blocks: list) -> None:
+    """Ejecuta los bloques en paralelo en el sandbox local y muestra cada resultado según termina."""
+    placeholders = []
+    for index in range(len(blocks)):
+        placeholders.append(st.empty())
+        placeholders[index].info(f"Bloque {index + 1}: en ejecución...")
+
+    def on_result(index: int, result: dict) -> None:
+        with placeholders[index].container():
+            if result.get('timed_out'):
+                st.error(f"Bloque {index + 1}: superó el límite de {SANDBOX_TIMEOUT} s")
+            elif result.get('error') or result['returncode'] != 0:
+                detail = "límite de CPU" if result.get('cpu_limit') else f"código {result['returncode']}"
+                st.error(f"Bloque {index + 1}: terminó con error ({detail})")
+            else:
+                st.success(f"Bloque {index + 1}: ejecutado en {result['duration']:.2f} s")
+            if result['stdout']:
+                st.code(result['stdout'], language=None)
+            if result['stderr']:
+                st.code(result['stderr'], language=None)
+            if result.get('truncated'):
+                st.caption("Salida truncada")
+            if result.get('network') == 'socket':
+                st.caption("Sin aislamiento de red: sólo se bloqueó el módulo socket")
+            if result.get('filesystem') == 'shared' and result.get('returncode') != 126:
+                st.caption("Sin aislamiento del sistema de archivos: el código pudo leer los archivos del usuario")
+
+    get_sandbox_pool().run_many(blocks, on_result=on_result)
+
+def show_complexity(code_blocks: list, response_content: str, prompt: str, entry: str = '', arguments: str = '') -> None:
+    """
+    Mide la complejidad empírica de la solución en el sandbox y la compara con
+    la declarada y con la de regeneraciones anteriores del mismo ``prompt``.
+    """
+    source, entries = next(((code, entry_points(code)) for code in code_blocks if entry_points(code)), (None, []))
+    if source is None:
+        st.info("No se encontró una función que medir en la solución.")
+        return
+    names = dict(entries)
+    entry = entry if entry in names else entries[0][0]
+    arguments = arguments or default_arguments(names[entry])
+    st.caption(f"Midiendo `{entry}` con entradas `{arguments}`")
+    with st.spinner("Midiendo complejidad..."):
+        result = benchmark(get_sandbox_pool(), source, entry, arguments)
+    if result['error'] or not result['points']:
+        st.warning(f"No se pudo medir la complejidad: {result['error'] or 'sin mediciones'}")
+        return
+
+    points = pd.DataFrame(result['points'])
+    table = pd.DataFrame({'n': points['n'], 'tiempo (ms)': points['time'] * 1000,
+                          'mediana (ms)': points['median'] * 1000, 'memoria pico (KB)': points['peak'] / 1024})
+    time_fit, memory_fit = result['time_fit'], result['memory_fit']
+    claimed = claimed_complexity(response_content)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Tiempo empírico", time_fit['label'] or "-",
+                f"exponente {time_fit['exponent']:.2f}" if time_fit['exponent'] is not None else None, delta_color="off")
+    col2.metric("Memoria empírica", memory_fit['label'] or "-")
+    col3.metric("Declarada", claimed or "-")
+    chart_column, memory_column = st.columns(2)
+    chart_column.line_chart(table.set_index('n')[['tiempo (ms)']])
+    memory_column.line_chart(table.set_index('n')[['memoria pico (KB)']])
+    st.dataframe(table, use_container_width=True, hide_index=True)
+    if result['stop'] and result['stop']['reason'] != 'budget':
+        st.caption(f"Medición detenida en n={result['stop']['n']} ({result['stop'].get('detail', result['stop']['reason'])})")
+
+    if is_worse(time_fit['label'], claimed):
+        st.error(f"La complejidad medida ({time_fit['label']}) es peor que la declarada ({claimed}).")
+    key = history_key(prompt, entry)
+    previous = st.session_state.complexity_history.get(key)
+    if is_worse(time_fit['label'], previous):
+        st.warning(f"Regresión: `{entry}` pasó de {previous} a {time_fit['label']} en este mismo problema.")
+    if time_fit['label']:
+        st.session_state.complexity_history[key] = time_fit['label']
+
+def show_profiles(profiles: list) -> None:
+    """Perfil de ambos scripts lado a lado: tiempo, llamadas, memoria pico y funciones más costosas."""
+    for index, (column, profile) in enumerate(zip(st.columns(len(profiles)), profiles), start=1):
+        with column:
+            st.markdown(f"**Script {index}**")
+            if profile['error']:
+                st.error(profile['error'])
+            if profile['wall'] is not None:
+                st.metric("Tiempo de pared", f"{profile['wall'] * 1000:.1f} ms")
+            if profile['total_calls'] is not None:
+                st.metric("Llamadas a funciones", f"{profile['total_calls']:,}")
+            if profile['peak'] is not None:
+                st.metric("Memoria pico", f"{profile['peak'] / 1024:.1f} KB")
+            if profile['hot']:
+                hot = pd.DataFrame(profile['hot'])[['function', 'location', 'calls', 'own', 'cumulative']]
+                hot.columns = ['función', 'ubicación', 'llamadas', 'propio (s)', 'acumulado (s)']
+                st.dataframe(hot, use_container_width=True, hide_index=True)
+
+def show_structural_diff(diff: StructuralDiff) -> None:
+    """Muestra el diff estructural calculado localmente, sin esperar al modelo."""
+    if diff.error:
+        st.warning(f"No se pudo analizar la estructura ({diff.error}); se muestra el diff de texto.")
+    counts = diff.counts()
+    for column, (kind, count) in zip(st.columns(max(len(counts), 1)), counts.items()):
+        column.metric(KIND_LABELS[kind], f"+{count['added']} -{count['removed']} ~{count['changed']}",
+                      f"{count['unchanged']} iguales", delta_color="off")
+    if diff.entries:
+        st.dataframe(diff.rows(), use_container_width=True)
+        for entry in diff.entries:
+            with st.expander(f"{entry['status']} · {entry['kind']} {entry['name']}"):
+                st.code(entry['diff'], language='diff' if entry['status'] == 'changed' else 'python')
+
 def main() -> None:
     st.title("O3-Mini Coding Agent")
     
@@ -134,7 +342,7 @@ def main() -> None:
     setup_sidebar()
     
     # Tabs para diferentes funcionalidades
-    tab1, tab2 = st.tabs(["Soluciones de Código", "Comparar Scripts"])
+    tab1, tab2, tab3 = st.tabs(["Soluciones de Código", "Comparar Scripts", "Comparación por Lotes"])
     
     # Verificar que se hayan ingresado todas las claves API requeridas
     if not st.session_state.openai_key:
@@ -161,6 +369,12 @@ def main() -> None:
             height=100
         )
         
+        with st.expander("Benchmark de complejidad"):
+            measure_complexity = st.checkbox("Medir la complejidad empírica de la solución", value=True)
+            benchmark_entry = st.text_input("Función a medir (opcional)", placeholder="Solution.twoSum")
+            benchmark_arguments = st.text_input("Argumentos en función de n (opcional)",
+                                                placeholder="([random.randint(0, n) for _ in range(n)], n)")
+
         # Botón para procesar la consulta
         if st.button("Generar Solución", type="primary"):
             if uploaded_image and not user_query:
@@ -169,8 +383,9 @@ def main() -> None:
                 return
             elif user_query and not uploaded_image:
                 # Procesamiento directo de texto
-                with st.spinner("Generando solución..."):
-                    response = coding_agent.run(user_query)
+                st.divider()
+                st.subheader("💻 Solución")
+                response = run_agent(coding_agent, user_query)
             elif user_query and uploaded_image:
                 st.error("Por favor, utiliza ya sea la carga de imagen O la entrada de texto, no ambas.")
                 return
@@ -178,21 +393,22 @@ def main() -> None:
                 st.warning("Por favor, proporciona ya sea una imagen o una descripción de texto de tu problema de programación.")
                 return
             
-            # Mostrar la solución
+            # La solución ya se mostró mientras se generaba
             if 'response' in locals():
-                st.divider()
-                st.subheader("💻 Solución")
-                
-                # Mostrar la respuesta completa en markdown
-                st.markdown(response.content)
-                
-                # Extraer código de la respuesta en markdown
-                code_blocks = extract_code_blocks(response.content)
+                code_blocks = response['code_blocks']
                 
                 if code_blocks:
                     st.divider()
                     st.subheader("🚀 Resultados de Ejecución")
-                    st.markdown("La ejecución de código está deshabilitada porque la funcionalidad de sandbox está inactiva.")
+                    if st.session_state.local_sandbox:
+                        show_execution(code_blocks)
+                    else:
+                        st.markdown("La ejecución de código está deshabilitada porque la funcionalidad de sandbox está inactiva.")
+                    if measure_complexity and st.session_state.local_sandbox:
+                        st.divider()
+                        st.subheader("📈 Complejidad Empírica")
+                        show_complexity(code_blocks, response['content'], user_query, benchmark_entry.strip(),
+                                        benchmark_arguments.strip())
                 else:
                     st.info("No se encontró ningún bloque de código en la respuesta.")
     
@@ -230,41 +446,123 @@ def main() -> None:
                     st.session_state.script2 = script2
                     st.code(script2, language="python")
         
+        with st.expander("Perfilado de rendimiento"):
+            run_profiles = st.checkbox("Ejecutar y perfilar ambos scripts (cProfile y tracemalloc)", value=False)
+            profile_entry = st.text_input("Función de entrada (opcional, por defecto el script completo)",
+                                          placeholder="solve")
+            profile_arguments = st.text_input("Argumentos de la función en función de n",
+                                              placeholder="([random.randint(0, n) for _ in range(n)],)")
+            profile_size = st.number_input("n", min_value=1, value=PROFILE_SIZE)
+
         if st.button("Comparar Scripts", type="primary"):
             if not st.session_state.script1 or not st.session_state.script2:
                 st.error("Por favor, proporciona ambos scripts para la comparación.")
                 return
             
-            with st.spinner("Analizando scripts..."):
-                # Construimos un prompt que asegure que la respuesta contenga bloques de código
-                prompt = f"""
-                Compara los siguientes dos scripts de Python e identifica las diferencias y similitudes clave:
-                
-                Script 1:
-                ```python
-                {st.session_state.script1}
-                ```
-                
-                Script 2:
-                ```python
-                {st.session_state.script2}
-                ```
-                
-                Por favor, comienza tu respuesta con un bloque de código que resuma las principales diferencias.
-                """
-                
-                response = comparison_agent.run(prompt)
-            
+            # Diff estructural local: se muestra al instante y solo lo que cambia va al modelo
+            diff = structural_diff(st.session_state.script1, st.session_state.script2)
+            st.divider()
+            st.subheader("🧬 Diferencias Estructurales")
+            show_structural_diff(diff)
+            if not diff.entries:
+                st.success("Los scripts son idénticos" if diff.identical
+                           else "Los scripts solo difieren en formato o comentarios.")
+                return
+
+            measurements = None
+            if run_profiles:
+                st.divider()
+                st.subheader("⏱️ Perfil de Rendimiento")
+                if not st.session_state.local_sandbox:
+                    st.info("Activa el sandbox local en la barra lateral para perfilar los scripts.")
+                else:
+                    with st.spinner("Ejecutando ambos scripts..."):
+                        profiles = profile_scripts(get_sandbox_pool(),
+                                                   [st.session_state.script1, st.session_state.script2],
+                                                   profile_entry.strip(), profile_arguments.strip() or '()',
+                                                   int(profile_size))
+                    show_profiles(profiles)
+                    note = cpu_note(get_sandbox_pool())
+                    if note:
+                        st.caption(note)
+                    measurements = profile_summary(profiles)
+
+            prompts = comparison_prompts(diff, measurements=measurements)
+            full_size = len(st.session_state.script1) + len(st.session_state.script2)
+            st.caption(f"Prompt: {sum(len(prompt) for prompt in prompts)} caracteres "
+                       f"({sum(len(prompt) for prompt in prompts) / full_size:.0%} de ambos scripts)"
+                       + (f" en {len(prompts)} partes" if len(prompts) > 1 else ""))
+
             st.divider()
             st.subheader("🔍 Análisis de Comparación")
-            
-            # Mostrar la respuesta completa
-            st.markdown(response.content)
-            
+            if len(prompts) == 1:
+                response = run_agent(comparison_agent, prompts[0])
+            else:
+                # Map-reduce: cada parte se analiza por separado y luego se combinan
+                partials = []
+                progress = st.progress(0.0, text="Analizando regiones...")
+                for index, prompt in enumerate(prompts, start=1):
+                    partial = cached_run(comparison_agent, prompt, get_response_cache(),
+                                         bypass=st.session_state.bypass_cache, stats=st.session_state.cache_stats)
+                    partials.append(partial['content'] or '')
+                    progress.progress(index / len(prompts), text=f"Analizadas {index} de {len(prompts)} partes")
+                progress.empty()
+                response = run_agent(comparison_agent, reduce_prompt(diff, partials, measurements))
+
             # Verificar si hay bloques de código en la respuesta
-            code_blocks = extract_code_blocks(response.content)
+            code_blocks = response['code_blocks']
             if not code_blocks:
                 st.warning("No se encontraron bloques de código en la respuesta. La comparación puede no estar correctamente formateada.")
 
+    with tab3:
+        st.header("Comparación de Muchos Scripts")
+        batch_files = st.file_uploader("Sube los scripts a comparar", type=["py"], accept_multiple_files=True)
+        col1, col2, col3 = st.columns(3)
+        workers = col1.number_input("Llamadas simultáneas", min_value=1, max_value=32, value=BATCH_WORKERS)
+        threshold = col2.slider("Umbral de casi duplicados", 0.5, 1.0, NEAR_DUPLICATE, 0.01)
+        representatives = col3.radio("Comparar", ["Representantes de cada grupo", "Todos los pares"]) \
+            == "Representantes de cada grupo"
+
+        if st.button("Comparar Lote", type="primary"):
+            files = {file.name: file.read().decode("utf-8") for file in batch_files or []}
+            if len(files) < 2:
+                st.error("Por favor, sube al menos dos scripts.")
+                return
+
+            progress = st.progress(0.0, text="Calculando similitudes...")
+            reports_container = st.container()
+
+            def on_report(first: str, second: str, report: dict, done: int, total: int) -> None:
+                progress.progress(done / total, text=f"Comparados {done} de {total} pares")
+                with reports_container.expander(f"{first} ↔ {second} · similitud {report['similarity']:.0%}"):
+                    if report.get('error'):
+                        st.error(report['error'])
+                    st.code(report['summary'], language=None)
+                    st.markdown(report['content'])
+
+            # Los hilos del pool no tienen contexto de Streamlit: el agente se crea con valores ya leídos
+            make_agent = partial(create_comparison_agent, st.session_state.openai_key,
+                                 st.session_state.model_base_url)
+            result = compare_batch(files, make_agent, get_response_cache(), workers=int(workers),
+                                   representatives=representatives, threshold=threshold,
+                                   bypass=st.session_state.bypass_cache, on_report=on_report)
+            progress.empty()
+            for report in result['reports'].values():
+                for key, value in report['stats'].items():
+                    st.session_state.cache_stats[key] += value
+
+            st.subheader("📊 Matriz de Similitud")
+            st.dataframe(pd.DataFrame(result['matrix'], index=result['names'], columns=result['names']).round(2),
+                         use_container_width=True)
+            st.subheader("🗂️ Grupos de Casi Duplicados")
+            for group in result['groups']:
+                if len(group) > 1:
+                    st.write(f"**{group[0]}** ≈ " + ", ".join(group[1:]))
+            st.caption(f"{len(result['skipped'])} pares omitidos por idénticos o casi duplicados")
+            if result['truncated']:
+                st.warning("Se alcanzó el máximo de comparaciones por lote; solo se compararon los pares más parecidos.")
+            st.caption(f"{len(result['reports'])} comparaciones en {result['elapsed']:.1f} s "
+                       f"(tiempo de modelo acumulado {result['model_time']:.1f} s)")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,17 @@
+# conftest.py: fixtures compartidas por los tests (el exchange simulado hace de exchange real)
+import pytest
+
+from modules import execution_layer
+from modules.simulation import AsyncSimulatedExchange
+
+
+@pytest.fixture
+def exchange():
+    """Exchange asíncrono simulado sin latencia ni fallos."""
+    return AsyncSimulatedExchange(latency=0)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Reintentos sin esperar: el backoff se prueba por separado."""
+    monkeypatch.setattr(execution_layer, 'backoff_delay', lambda attempt: 0)
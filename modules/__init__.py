@@ -0,0 +1,4 @@
+import time
+
+# Instante en que se importa el paquete: origen del informe de arranque (metrics.startup_report)
+STARTED = time.perf_counter()
@@ -0,0 +1,170 @@
+# aggregation.py
+import numpy as np
+from .utilities import timeframe_to_ms
+from .config import TIMEFRAME, AGGREGATE_TIMEFRAMES, AGGREGATE_HISTORY, CANDLE_BUFFER_DEPTH
+from .candle_buffer import CandleBuffer, OHLCV_COLUMNS
+from .processing_layer import IncrementalIndicators
+
+
+def aggregate_rows(rows, step: int) -> np.ndarray:
+    """
+    Agrupa velas ``[timestamp, open, high, low, close, volume]`` ordenadas en velas
+    de ``step`` ms alineadas a la época (como Binance hasta 1d) de forma vectorizada.
+    """
+    rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+    if not len(rows):
+        return rows
+    buckets = rows[:, 0].astype(np.int64) // step * step
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(rows)] - 1
+    return np.column_stack([
+        buckets[starts],
+        rows[starts, 1],
+        np.maximum.reduceat(rows[:, 2], starts),
+        np.minimum.reduceat(rows[:, 3], starts),
+        rows[ends, 4],
+        np.add.reduceat(rows[:, 5], starts)
+    ])
+
+
+class TimeframeAggregator:
+    """
+    Construye velas de un timeframe superior a partir de velas base cerradas (o
+    trades) en O(1) por actualización. Las velas completas van a su propio
+    CandleBuffer y a su propio motor de indicadores; la vela en curso se
+    conserva aparte hasta que se completa.
+    """
+
+    def __init__(self, timeframe: str, base_timeframe: str, capacity: int = CANDLE_BUFFER_DEPTH):
+        self.timeframe = timeframe
+        self.step = timeframe_to_ms(timeframe)
+        self.base_step = timeframe_to_ms(base_timeframe)
+        if self.step % self.base_step:
+            raise ValueError(f"{timeframe} is not a multiple of {base_timeframe}")
+        self.candles = CandleBuffer(capacity)
+        self.engine = IncrementalIndicators(history=capacity)
+        self.current = None  # [timestamp, open, high, low, close, volume] de la vela en curso
+        self.first_bucket = 0  # Buckets anteriores incompletos en el historial: se ignoran
+
+    def bootstrap(self, rows) -> None:
+        """
+        Inicializa buffer e indicadores agregando de una vez las velas base
+        históricas. Si la primera vela base no abre su bucket, la primera vela
+        agregada está incompleta (open, high, low y volumen erróneos) y se descarta.
+        """
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+        aggregated = aggregate_rows(rows, self.step)
+        self.current = None
+        self.first_bucket = 0
+        if not len(rows):
+            return
+        if int(rows[0, 0]) % self.step:
+            self.first_bucket = int(aggregated[0, 0]) + self.step
+            aggregated = aggregated[1:]
+        if len(aggregated) and aggregated[-1, 0] + self.step > rows[-1, 0] + self.base_step:
+            self.current = aggregated[-1].tolist()
+            aggregated = aggregated[:-1]
+        self.candles.clear()
+        self.candles.extend(aggregated)
+        self.engine = IncrementalIndicators(history=self.candles.capacity)
+        self.engine.bootstrap(aggregated[:, 0], aggregated[:, 4])
+
+    def _close_current(self) -> list:
+        candle = self.current
+        self.current = None
+        self.candles.append(int(candle[0]), *candle[1:])
+        self.engine.update(int(candle[0]), candle[4])
+        return candle
+
+    def _merge(self, bucket: int, open_: float, high: float, low: float, close: float, volume: float) -> list:
+        """Incorpora una actualización al bucket; retorna la vela anterior si con ello quedó cerrada."""
+        closed = None
+        if bucket < self.first_bucket:
+            return closed
+        if self.current is not None and bucket > self.current[0]:
+            closed = self._close_current()
+        if self.current is None:
+            if self.candles.last() and bucket <= self.candles.last()['timestamp']:
+                return closed
+            self.current = [bucket, open_, high, low, close, volume]
+        else:
+            current = self.current
+            current[2] = max(current[2], high)
+            current[3] = min(current[3], low)
+            current[4] = close
+            current[5] += volume
+        return closed
+
+    def add_candle(self, timestamp: int, open_: float, high: float, low: float, close: float, volume: float) -> list:
+        """
+        Añade una vela base cerrada. Retorna la vela agregada que se completó con
+        ella (o con el inicio de un nuevo bucket), o None.
+        """
+        bucket = timestamp // self.step * self.step
+        closed = self._merge(bucket, open_, high, low, close, volume)
+        if self.current is not None and timestamp + self.base_step >= bucket + self.step:
+            closed = self._close_current()
+        return closed
+
+    def add_trade(self, timestamp: int, price: float, amount: float) -> list:
+        """Añade un trade; la vela agregada se completa cuando llega el primer trade del bucket siguiente."""
+        return self._merge(timestamp // self.step * self.step, price, price, price, price, amount)
+
+    def indicators(self) -> dict:
+        """Últimos valores de los indicadores del timeframe (velas completas)."""
+        return self.engine.latest()
+
+
+class MultiTimeframe:
+    """
+    Conjunto de agregadores de un símbolo alimentados por un único stream base.
+    Evita abrir un socket y pedir historial por cada timeframe adicional.
+    """
+
+    def __init__(self, base_timeframe: str = None, timeframes: list = None, capacity: int = CANDLE_BUFFER_DEPTH):
+        self.base_timeframe = base_timeframe or f'{int(TIMEFRAME / 60)}m'
+        self.timeframes = {timeframe: TimeframeAggregator(timeframe, self.base_timeframe, capacity)
+                           for timeframe in (timeframes or AGGREGATE_TIMEFRAMES)}
+        self.last_timestamp = None
+
+    def __getitem__(self, timeframe: str) -> TimeframeAggregator:
+        return self.timeframes[timeframe]
+
+    def bootstrap_depth(self, history: int = AGGREGATE_HISTORY) -> int:
+        """Velas base necesarias para tener ``history`` velas del timeframe mayor."""
+        base_step = timeframe_to_ms(self.base_timeframe)
+        return history * max(aggregator.step for aggregator in self.timeframes.values()) // base_step
+
+    def bootstrap(self, rows) -> None:
+        """Deriva el historial de todos los timeframes de las mismas velas base."""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+        for aggregator in self.timeframes.values():
+            aggregator.bootstrap(rows)
+        self.last_timestamp = int(rows[-1, 0]) if len(rows) else None
+
+    def bootstrap_from_series(self, series, history: int = AGGREGATE_HISTORY) -> None:
+        """Bootstrap desde una serie del OHLCVCache (la más fina disponible), sin copiar la serie completa."""
+        columns = series.window(self.bootstrap_depth(history))
+        self.bootstrap(np.column_stack([columns[column] for column in OHLCV_COLUMNS]))
+
+    def bootstrap_from_buffer(self, buffer: CandleBuffer) -> None:
+        """Bootstrap desde las velas base ya cargadas en memoria cuando no hay cache local."""
+        self.bootstrap(np.column_stack([buffer.column(column) for column in OHLCV_COLUMNS]))
+
+    def add_candle(self, timestamp: int, open_: float, high: float, low: float, close: float, volume: float) -> dict:
+        """
+        Añade una vela base cerrada a todos los timeframes. Las velas ya vistas se
+        ignoran. Retorna ``{timeframe: vela}`` de las que se completaron.
+        """
+        closed = {}
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return closed
+        self.last_timestamp = timestamp
+        for timeframe, aggregator in self.timeframes.items():
+            candle = aggregator.add_candle(timestamp, open_, high, low, close, volume)
+            if candle is not None:
+                closed[timeframe] = candle
+        return closed
+
+    def indicators(self) -> dict:
+        return {timeframe: aggregator.indicators() for timeframe, aggregator in self.timeframes.items()}
@@ -1,59 +1,71 @@
 # analysis_layer.py
+import functools
+import numpy as np
 import pandas as pd
 #from utilities import print_colored, Colors
 from .utilities import print_colored, Colors, log_error
-from .config import TAKE_PROFIT, PRICE_DEVIATION
+from .metrics import timed
+from .config import TAKE_PROFIT, PRICE_DEVIATION, RSI_BUY_THRESHOLD, EMA_BUY_FACTOR, EMA_SELL_FACTOR
+from .rules import Strategy
 
-def generate_trading_signals(df: pd.DataFrame, active_positions: list) -> dict:
+# Etiquetas de las condiciones de compra en el resultado de generate_trading_signals;
+# los campos se rellenan con los parámetros de la estrategia (ver condition_labels)
+CONDITION_LABELS = {
+    'macd_bullish': 'MACD > Signal',
+    'ema_trend': 'EMA Trend',
+    'rsi_conditions': 'RSI < {rsi_threshold:g}',
+    'bb_conditions': 'BB Condition',
+}
+
+@functools.lru_cache(maxsize=32)
+def condition_labels(strategy: Strategy) -> dict:
+    """Etiqueta de cada regla de compra con los umbrales reales de la estrategia."""
+    return {name: CONDITION_LABELS.get(name, name).format(**strategy.params) for name in strategy.buy_rules}
+
+@functools.lru_cache(maxsize=32)
+def strategy_for(rsi_threshold: float = RSI_BUY_THRESHOLD, ema_buy_factor: float = EMA_BUY_FACTOR,
+                 ema_sell_factor: float = EMA_SELL_FACTOR) -> Strategy:
+    """Estrategia por defecto compilada para unos umbrales (se reutiliza entre llamadas)."""
+    return Strategy(rsi_threshold=rsi_threshold, ema_buy_factor=ema_buy_factor, ema_sell_factor=ema_sell_factor)
+
+def signal_conditions(df: pd.DataFrame, rsi_threshold: float = RSI_BUY_THRESHOLD,
+                      ema_buy_factor: float = EMA_BUY_FACTOR, ema_sell_factor: float = EMA_SELL_FACTOR) -> dict:
+    """
+    Evalúa de forma vectorizada las condiciones de entrada y salida sobre todo
+    el DataFrame. La señal cruda vale 1 (compra), -1 (venta) o 0; la venta
+    prevalece si ambas se cumplen en la misma vela.
+    """
+    strategy = strategy_for(rsi_threshold, ema_buy_factor, ema_sell_factor)
+    return strategy.evaluate({name: df[name].to_numpy(dtype=np.float64) for name in strategy.columns})
+
+@timed('signals')
+def generate_trading_signals(df: pd.DataFrame, active_positions: list, strategy: Strategy = None) -> dict:
     """
     Evalúa indicadores técnicos para generar señales de compra (1) o venta (-1).
+    Sólo se evalúan las reglas sobre la última vela.
     """
     try:
         if df.empty or len(df) < 26:
             print_colored("Insufficient data for signals", Colors.RED)
             return {'signal': 0, 'conditions': {}}
-        signals = pd.DataFrame(index=df.index)
-        signals['price'] = df['close']
-        signals['signal'] = 0.0
-
-        # Condiciones para compra
-        macd_bullish = (df['MACD'] > df['MACD_signal'])
-        ema_trend = (df['close'] > df['EMA_9'] * 0.995)
-        rsi_conditions = (df['RSI'] < 55)
-        bb_conditions = (df['close'] < df['BB_middle'])
-
-        # Condiciones para venta
-        macd_bearish = (df['MACD'] < df['MACD_signal'])
-        ema_downtrend = (df['close'] < df['EMA_9'] * 1.005)
-
-        # Asignamos señales
-        signals.loc[macd_bullish & ema_trend & rsi_conditions & bb_conditions, 'signal'] = 1.0
-        signals.loc[macd_bearish & ema_downtrend, 'signal'] = -1.0
-
-        current = signals.iloc[-1]
-        conditions = {
-            'MACD > Signal': bool(macd_bullish.iloc[-1]),
-            'EMA Trend': bool(ema_trend.iloc[-1]),
-            'RSI < 55': bool(rsi_conditions.iloc[-1]),
-            'BB Condition': bool(bb_conditions.iloc[-1])
-        }
+        strategy = strategy or strategy_for()
+        evaluated = strategy.evaluate_latest({name: df[name].to_numpy(dtype=np.float64) for name in strategy.columns})
+        labels = condition_labels(strategy)
+        conditions = {labels[name]: bool(evaluated[name]) for name in strategy.buy_rules}
+        signal = float(evaluated['signal'])
 
         final_signal = 0
-        if not active_positions and current['signal'] == 1.0:
+        if not active_positions and signal == 1.0:
             final_signal = 1
             print_colored("Buy signal detected", Colors.GREEN)
-        elif active_positions and current['signal'] == -1.0:
+        elif active_positions and signal == -1.0:
             final_signal = -1
             print_colored("Sell signal detected", Colors.RED)
 
         return {
             'signal': final_signal,
             'conditions': conditions,
-            'price': current['price'],
-            'signals_data': {
-                'buy_signals': (signals['signal'] == 1.0).sum(),
-                'sell_signals': (signals['signal'] == -1.0).sum()
-            }
+            'price': float(df['close'].iloc[-1])
         }
     except Exception as e:
         print_colored(f"Error generating signals: {str(e)}", Colors.RED)
@@ -1,18 +1,79 @@
 # app.py
+import os
+import sys
+import time
+import pandas as pd
 import streamlit as st
-import asyncio
-import threading
-from main import main
-from modules import data_layer, processing_layer
 
-def run_bot():
-    asyncio.run(main())
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modules.bot import BotSupervisor
+from modules.shared_state import StateReader
+from modules.config import TRADING_PAIRS, DASHBOARD_REFRESH
+
+
+@st.cache_resource
+def get_supervisor(symbols: tuple, simulate: bool) -> BotSupervisor:
+    # Un supervisor por conjunto de símbolos, compartido entre reruns y sesiones
+    return BotSupervisor(list(symbols), simulate=simulate)
+
+def get_reader(path: str) -> StateReader:
+    readers = st.session_state.setdefault('state_readers', {})
+    if path not in readers:
+        readers[path] = StateReader(path)
+    return readers[path]
 
 st.title("Trading Bot Interface")
 st.write("Configura y ejecuta el bot de trading.")
 
-if st.button("Iniciar Bot"):
-    st.write("Iniciando bot...")
-    # Ejecutar el bot en un hilo aparte para que la UI no se bloquee.
-    bot_thread = threading.Thread(target=run_bot)
-    bot_thread.start()
\ No newline at end of file
+with st.sidebar:
+    symbols_text = st.text_input("Pares (separados por comas)", ','.join(TRADING_PAIRS))
+    simulate = st.checkbox("Simulación (stand-in local)", value=False)
+symbols = tuple(symbol.strip() for symbol in symbols_text.split(',') if symbol.strip())
+supervisor = get_supervisor(symbols, simulate)
+
+start_column, stop_column = st.columns(2)
+if start_column.button("Iniciar Bot"):
+    if supervisor.start():
+        st.success("Iniciando bot...")
+    else:
+        st.warning("El bot ya está en ejecución para estos pares.")
+if stop_column.button("Detener Bot"):
+    supervisor.stop()
+    st.info("Bot detenido.")
+
+
+@st.fragment(run_every=DASHBOARD_REFRESH)
+def dashboard(supervisor: BotSupervisor) -> None:
+    """Lee el último snapshot publicado por el bot; no hace IPC ni espera al proceso del bot."""
+    status = supervisor.status()
+    if status['running']:
+        st.caption(f"Bot en ejecución (pid {status['pid']}, reinicios {status['restarts']})")
+    elif status['elsewhere']:
+        st.caption(f"Bot en ejecución desde otro proceso (pid {status['pid']})")
+    else:
+        st.caption(f"Bot detenido (último código de salida: {status['last_exit']})")
+
+    snapshot = get_reader(supervisor.state_path).read()
+    if not snapshot:
+        st.write("Sin datos publicados todavía.")
+        return
+    st.caption(f"Snapshot de hace {time.time() - snapshot['published']:.1f}s")
+    for symbol, state in snapshot['symbols'].items():
+        st.subheader(symbol)
+        price_column, signal_column, positions_column = st.columns(3)
+        price_column.metric("Precio", f"{state['close']:.4f}", "provisional" if state['provisional'] else None)
+        signal_column.metric("Señal", {1: "Compra", -1: "Venta"}.get(state['signal'], "Neutral"))
+        positions_column.metric("Entradas abiertas", len(state['positions']))
+        candles = state['candles']
+        chart = pd.DataFrame({'close': candles['close']}, index=pd.to_datetime(candles['timestamp'], unit='ms'))
+        st.line_chart(chart)
+        indicators_column, conditions_column = st.columns(2)
+        indicators_column.dataframe(pd.Series(state['indicators'], name='valor'))
+        conditions_column.dataframe(pd.Series(state['conditions'], name='cumple'))
+        if state['positions']:
+            st.dataframe(pd.DataFrame(state['positions']))
+    if snapshot['latency_us']:
+        st.subheader("Latencias (µs)")
+        st.dataframe(pd.DataFrame(snapshot['latency_us']).T)
+
+dashboard(supervisor)
@@ -0,0 +1,177 @@
+# backtest.py
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from .utilities import print_colored, Colors
+from .config import COMMISSION
+from .candle_buffer import OHLCV_COLUMNS
+from .processing_layer import calculate_technical_indicators
+from .analysis_layer import signal_conditions
+from .execution_layer import dca_order_amount, round_to_precision
+
+
+def load_candles(path: str) -> pd.DataFrame:
+    """
+    Carga velas OHLCV desde un archivo CSV o Parquet local.
+    El archivo debe tener las columnas timestamp (ms), open, high, low, close y volume.
+    """
+    if str(path).endswith(('.parquet', '.pq')):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    missing = [column for column in OHLCV_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing columns in {path}: {missing}")
+    df = df[list(OHLCV_COLUMNS)].sort_values('timestamp').drop_duplicates('timestamp')
+    df.index = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+    return df
+
+INDICATOR_PARAMS = ('ema_fast', 'ema_slow', 'macd_fast', 'macd_slow', 'macd_sign', 'rsi_window', 'bb_window', 'bb_dev')
+SIGNAL_PARAMS = ('rsi_threshold', 'ema_buy_factor', 'ema_sell_factor')
+POSITION_PARAMS = ('max_dca_orders', 'price_deviation', 'base_order_size', 'order_multiplier')
+
+def compute_indicators(df: pd.DataFrame, **windows) -> pd.DataFrame:
+    """Calcula los indicadores de toda la serie con las mismas funciones que el bot en vivo."""
+    return calculate_technical_indicators(df.copy(), **windows)
+
+def compute_signals(df: pd.DataFrame, **params) -> np.ndarray:
+    """
+    Calcula indicadores y señales crudas de toda la serie de forma vectorizada.
+    Acepta las ventanas de indicadores y los umbrales de señal como parámetros.
+    """
+    if 'MACD' not in df.columns:
+        df = compute_indicators(df, **{k: v for k, v in params.items() if k in INDICATOR_PARAMS})
+    return signal_conditions(df, **{k: v for k, v in params.items() if k in SIGNAL_PARAMS})['signal']
+
+def _first_exit(close: np.ndarray, start: int, stop: int, take_level: float, stop_level: float):
+    """Primer índice en [start, stop) donde el cierre alcanza el take profit o el stop loss."""
+    if start >= stop:
+        return None
+    window = close[start:stop]
+    hits = np.zeros(len(window), dtype=bool)
+    if take_level is not None:
+        hits |= window >= take_level
+    if stop_level is not None:
+        hits |= window <= stop_level
+    hit = int(np.argmax(hits))
+    return start + hit if hits[hit] else None
+
+def run_backtest(df: pd.DataFrame, initial_capital: float = 1000.0, commission: float = COMMISSION,
+                 gate_signals: bool = True, signals: np.ndarray = None, take_profit: float = None,
+                 stop_loss: float = None, **params) -> dict:
+    """
+    Ejecuta la estrategia sobre velas históricas sin conexión al exchange.
+
+    Los indicadores y señales se evalúan vectorizados sobre toda la serie; sólo el
+    recorrido de la posición (entradas DCA y cierre) es un bucle, y únicamente
+    sobre las velas con señal. Con ``gate_signals`` se aplica el mismo filtro que
+    generate_trading_signals/decision_integration (sólo se compra sin posición
+    abierta); sin él cada señal de compra pasa a las reglas de DCA.
+    Las órdenes se llenan al cierre de la vela y pagan ``commission`` por lado.
+
+    ``take_profit``/``stop_loss`` (fracciones sobre el precio medio de entrada)
+    añaden salidas que el bot en vivo no aplica; por defecto están desactivadas.
+    ``params`` acepta ventanas de indicadores, umbrales de señal y reglas de DCA.
+    """
+    if signals is None:
+        signals = compute_signals(df, **params)
+    position_params = {k: v for k, v in params.items() if k in POSITION_PARAMS}
+    close = df['close'].to_numpy(dtype=np.float64)
+    n = len(close)
+    base_delta = np.zeros(n)
+    cash_delta = np.zeros(n)
+    fills = []
+    trades = []
+    active_positions = []
+    trade_fees = 0.0
+    checked = 0
+    exits = take_profit is not None or stop_loss is not None
+
+    def close_position(i: int, reason: str) -> None:
+        nonlocal trade_fees
+        price = close[i]
+        total_base = sum(pos['base_amount'] for pos in active_positions)
+        cost = sum(pos['quote_amount'] for pos in active_positions)
+        proceeds = total_base * price
+        fee = proceeds * commission
+        trade_fees += fee
+        base_delta[i] -= total_base
+        cash_delta[i] += proceeds - fee
+        fills.append((i, 'sell', price, total_base, proceeds, fee))
+        pnl = proceeds - cost - trade_fees
+        trades.append((active_positions[0]['index'], i, len(active_positions), cost, proceeds,
+                       trade_fees, pnl, pnl / cost * 100, reason))
+        active_positions.clear()
+        trade_fees = 0.0
+
+    def check_exits(stop: int) -> None:
+        nonlocal checked
+        if exits and active_positions:
+            average = (sum(pos['quote_amount'] for pos in active_positions)
+                       / sum(pos['base_amount'] for pos in active_positions))
+            hit = _first_exit(close, checked, stop,
+                              average * (1 + take_profit) if take_profit is not None else None,
+                              average * (1 - stop_loss) if stop_loss is not None else None)
+            if hit is not None:
+                close_position(hit, 'take_profit' if close[hit] >= average else 'stop_loss')
+        checked = max(checked, stop)
+
+    for i in np.flatnonzero(signals):
+        check_exits(i)
+        price = close[i]
+        if signals[i] == 1:
+            if gate_signals and active_positions:
+                continue
+            quote_amount, rejection = dca_order_amount(active_positions, price, **position_params)
+            if rejection:
+                continue
+            base_amount = round_to_precision(quote_amount / price)
+            fee = quote_amount * commission
+            base_delta[i] += base_amount
+            cash_delta[i] -= quote_amount + fee
+            trade_fees += fee
+            active_positions.append({'entry_price': price, 'base_amount': base_amount,
+                                     'quote_amount': quote_amount, 'index': i})
+            fills.append((i, 'buy', price, base_amount, quote_amount, fee))
+            checked = i + 1
+        elif active_positions:
+            close_position(i, 'signal')
+    check_exits(n)
+
+    equity = initial_capital + np.cumsum(cash_delta) + np.cumsum(base_delta) * close
+    equity = pd.Series(equity, index=df.index, name='equity')
+    fills = pd.DataFrame(fills, columns=['index', 'side', 'price', 'base_amount', 'quote_amount', 'fee'])
+    fills.insert(0, 'time', df.index[fills['index'].to_numpy(dtype=np.int64)])
+    trades = pd.DataFrame(trades, columns=['entry_index', 'exit_index', 'entries', 'cost', 'proceeds',
+                                           'fees', 'pnl', 'pnl_pct', 'exit_reason'])
+    drawdown = (equity / equity.cummax() - 1).min() if n else 0.0
+    summary = {
+        'candles': n,
+        'fills': len(fills),
+        'trades': len(trades),
+        'open_entries': len(active_positions),
+        'fees': float(fills['fee'].sum()),
+        'realized_pnl': float(trades['pnl'].sum()),
+        'final_equity': float(equity.iloc[-1]) if n else initial_capital,
+        'win_rate': float((trades['pnl'] > 0).mean()) if len(trades) else 0.0,
+        'max_drawdown': float(drawdown)
+    }
+    return {'equity': equity, 'fills': fills, 'trades': trades, 'summary': summary}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest de la estrategia sobre velas locales (CSV/Parquet)")
+    parser.add_argument('path')
+    parser.add_argument('--capital', type=float, default=1000.0)
+    parser.add_argument('--no-gate', action='store_true', help="Permite entradas DCA con posición abierta")
+    args = parser.parse_args()
+    df = load_candles(args.path)
+    start = time.perf_counter()
+    result = run_backtest(df, initial_capital=args.capital, gate_signals=not args.no_gate)
+    elapsed = time.perf_counter() - start
+    print_colored(f"\n=== BACKTEST {args.path} ({elapsed:.2f}s) ===", Colors.BLUE)
+    for key, value in result['summary'].items():
+        print_colored(f"{key}: {value}", Colors.GREEN)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+# bot.py
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from .utilities import print_colored, Colors, log_error, setup_logging
+from .config import TRADING_PAIRS, LOG_FILE, JOURNAL_FILE, POSITION_DB, STATE_PUBLISH_INTERVAL, BOT_MAX_RESTARTS
+from .data_layer import create_async_exchange, close_async_exchange
+from .position_store import PositionStore
+from .pipeline import run_multi_symbol, _run_simulated
+from .shared_state import BotState, StateWriter, state_path
+from . import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ALREADY_RUNNING = 3  # Código de salida cuando otro proceso ya opera el mismo conjunto de símbolos
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _try_lock(handle) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def instance_lock(symbols: list, attempts: int = 1):
+    """
+    Toma el lock exclusivo del conjunto de símbolos. Retorna el archivo abierto
+    (el lock dura lo que el proceso lo mantenga abierto) o None si ya lo tiene
+    otro proceso tras ``attempts`` intentos.
+    """
+    handle = open(state_path(symbols, '.lock'), 'a+')
+    for attempt in range(attempts):
+        if _try_lock(handle):
+            break
+        if attempt + 1 < attempts:
+            time.sleep(0.2)
+    else:
+        handle.close()
+        return None
+    handle.seek(0)
+    handle.truncate()
+    handle.write(str(os.getpid()))
+    handle.flush()
+    return handle
+
+def instance_running(symbols: list) -> bool:
+    """Indica si algún proceso tiene el lock del conjunto de símbolos."""
+    handle = instance_lock(symbols)
+    if handle is None:
+        return True
+    handle.close()
+    return False
+
+def lock_owner(symbols: list):
+    """Pid que el bot escribió en el lock del conjunto de símbolos, o None si nadie lo tiene."""
+    if not instance_running(symbols):
+        return None
+    try:
+        with open(state_path(symbols, '.lock')) as handle:
+            return int(handle.read().strip() or 0) or None
+    except (OSError, ValueError):
+        return None
+
+async def publish_state(state: BotState, writer: StateWriter, interval: float = STATE_PUBLISH_INTERVAL) -> None:
+    """Publica periódicamente el snapshot del bot en el segmento compartido."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            writer.write(json.dumps(state.snapshot(), separators=(',', ':')).encode())
+        except Exception as e:
+            print_colored(f"Error publishing bot state: {str(e)}", Colors.RED)
+            log_error(e, "State Publish Error")
+
+async def run_bot(symbols: list, simulate: bool = False, interval: float = 0.5, positions: str = POSITION_DB) -> None:
+    """
+    Ejecuta el bot multi-símbolo (contra el exchange o el stand-in local) y
+    publica su estado para el dashboard en ``state_path(symbols)``.
+    """
+    state = BotState(symbols)
+    writer = StateWriter(state_path(symbols))
+    store = PositionStore(positions) if positions else None
+    metrics.enable()
+    publisher = asyncio.create_task(publish_state(state, writer), name='state')
+    try:
+        if simulate:
+            await _run_simulated(symbols, interval, store, state=state)
+            return
+        exchange = await create_async_exchange()
+        if exchange is None:
+            raise RuntimeError("Exchange initialization failed")
+        try:
+            await run_multi_symbol(exchange, symbols, store=store, state=state)
+        finally:
+            await close_async_exchange(exchange)
+    finally:
+        publisher.cancel()
+        writer.close()
+        if store is not None:
+            store.close()
+
+
+class BotSupervisor:
+    """
+    Arranca el bot en un proceso aparte (``python -m modules.bot``) y lo
+    reinicia con backoff si termina inesperadamente, hasta ``max_restarts``.
+    Un lock por conjunto de símbolos impide que dos procesos operen lo mismo,
+    aunque los lancen sesiones o servidores distintos.
+    """
+
+    def __init__(self, symbols: list, simulate: bool = False, interval: float = 0.5,
+                 max_restarts: int = BOT_MAX_RESTARTS):
+        self.symbols = list(symbols)
+        self.simulate = simulate
+        self.interval = interval
+        self.max_restarts = max_restarts
+        self.state_path = state_path(self.symbols)
+        self.restarts = 0
+        self.last_exit = None
+        self._process = None
+        self._stopping = False
+        self._supervising = False
+        self._lock = threading.Lock()
+
+    def _command(self) -> list:
+        command = [sys.executable, '-m', 'modules.bot', '--symbols', ','.join(self.symbols)]
+        if self.simulate:
+            command += ['--simulate', '--interval', str(self.interval)]
+        return command
+
+    def _spawn(self) -> None:
+        self._process = subprocess.Popen(self._command(), cwd=_ROOT)
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _wait_for_lock(self, timeout: float) -> bool:
+        """Espera a que el proceso recién lanzado tome el lock o termine."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                return False
+            if instance_running(self.symbols):
+                return True
+            time.sleep(0.1)
+        return self._process.poll() is None
+
+    def start(self, timeout: float = 15.0) -> bool:
+        """
+        Lanza el bot y espera a que tome el lock de sus símbolos. Retorna False si
+        ya está en marcha (en este u otro proceso) o si no llegó a arrancar.
+        """
+        with self._lock:
+            if self.running or instance_running(self.symbols):
+                return False
+            self._stopping = False
+            self._supervising = True
+            self.restarts = 0
+            self._spawn()
+            started = self._wait_for_lock(timeout)
+            if not started:
+                self.last_exit = self._process.poll()
+                self._supervising = False
+                return False
+        threading.Thread(target=self._monitor, name="bot-supervisor", daemon=True).start()
+        return True
+
+    def _monitor(self) -> None:
+        try:
+            self._supervise()
+        finally:
+            self._supervising = False
+
+    def _supervise(self) -> None:
+        while True:
+            process = self._process
+            exit_code = process.wait()
+            with self._lock:
+                if self._stopping or process is not self._process:
+                    return
+                self.last_exit = exit_code
+                if exit_code in (0, ALREADY_RUNNING) or self.restarts >= self.max_restarts:
+                    return
+                self.restarts += 1
+                delay = min(2 ** self.restarts, 30)
+            print_colored(f"Bot exited with code {exit_code}; restarting in {delay}s "
+                          f"({self.restarts}/{self.max_restarts})", Colors.YELLOW)
+            time.sleep(delay)
+            with self._lock:
+                if self._stopping:
+                    return
+                self._spawn()
+
+    def _stop_owner(self, timeout: float) -> None:
+        """Detiene el bot que tiene el lock aunque no lo haya lanzado este supervisor (otra sesión o un reinicio)."""
+        pid = lock_owner(self.symbols)
+        if pid is None or pid == os.getpid():
+            return
+        try:
+            os.kill(pid, signal.SIGTERM)
+            deadline = time.monotonic() + timeout
+            while instance_running(self.symbols) and time.monotonic() < deadline:
+                time.sleep(0.1)
+            if instance_running(self.symbols):
+                os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+        except ProcessLookupError:
+            pass
+        except OSError as e:
+            print_colored(f"Could not stop bot process {pid}: {str(e)}", Colors.RED)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """
+        Detiene el bot de forma ordenada (SIGTERM) y lo mata si no termina a
+        tiempo. Si este supervisor no lanzó el bot en marcha, se señala el pid
+        que el bot dejó en su lock.
+        """
+        with self._lock:
+            self._stopping = True
+            process = self._process
+        if process is None or process.poll() is not None:
+            self._stop_owner(timeout)
+            return
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def status(self) -> dict:
+        # Sin supervisión activa, el lock tomado indica un bot lanzado desde otro proceso
+        owner = None if self._supervising else lock_owner(self.symbols)
+        return {
+            'running': self.running,
+            'pid': self._process.pid if self.running else owner,
+            'restarts': self.restarts,
+            'last_exit': self.last_exit,
+            'elsewhere': owner is not None
+        }
+
+
+def _terminate(signum, frame) -> None:
+    raise SystemExit(0)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Proceso del bot con estado compartido para el dashboard")
+    parser.add_argument('--symbols', default=','.join(TRADING_PAIRS), help="Pares separados por comas")
+    parser.add_argument('--simulate', action='store_true', help="Usa el stand-in local y el exchange simulado")
+    parser.add_argument('--interval', type=float, default=0.5, help="Segundos entre velas simuladas")
+    parser.add_argument('--positions', default=None, help="Base SQLite de posiciones (por defecto POSITION_DB)")
+    parser.add_argument('--journal', nargs='?', const=JOURNAL_FILE,
+                        help="Guarda operaciones y señales en el diario binario (por defecto JOURNAL_FILE)")
+    args = parser.parse_args()
+    metrics.startup_mark('imports')
+    symbols = args.symbols.split(',')
+    lock = instance_lock(symbols, attempts=5)
+    if lock is None:
+        print_colored(f"A bot is already running for {', '.join(symbols)}", Colors.YELLOW)
+        raise SystemExit(ALREADY_RUNNING)
+    signal.signal(signal.SIGTERM, _terminate)
+    setup_logging(LOG_FILE, args.journal)
+    positions = args.positions or (None if args.simulate else POSITION_DB)
+    try:
+        asyncio.run(run_bot(symbols, args.simulate, args.interval, positions))
+    except KeyboardInterrupt:
+        print_colored("Stopped", Colors.YELLOW)
+    finally:
+        lock.close()
+
+if __name__ == "__main__":
+    main()
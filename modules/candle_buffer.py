@@ -0,0 +1,116 @@
+# candle_buffer.py
+import numpy as np
+import pandas as pd
+from .config import CANDLE_BUFFER_DEPTH
+
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+OHLCV_COLUMNS = ('timestamp',) + PRICE_COLUMNS
+
+
+class CandleBuffer:
+    """
+    Buffer circular columnar de capacidad fija para velas OHLCV.
+    Cada vela se escribe dos veces (posición i e i + capacidad), de modo que la
+    ventana ordenada siempre es un slice contiguo: el append es O(1) y las
+    vistas y DataFrames se entregan sin copiar los datos.
+    """
+
+    def __init__(self, capacity: int = CANDLE_BUFFER_DEPTH):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._timestamps = np.zeros(2 * capacity, dtype=np.int64)
+        self._prices = np.zeros((len(PRICE_COLUMNS), 2 * capacity), dtype=np.float64)
+        self._head = 0  # Próxima posición de escritura en [0, capacity)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _write(self, position: int, timestamp: int, values) -> None:
+        self._timestamps[position] = timestamp
+        self._timestamps[position + self.capacity] = timestamp
+        self._prices[:, position] = values
+        self._prices[:, position + self.capacity] = values
+
+    def append(self, timestamp: int, open_: float, high: float, low: float, close: float, volume: float) -> None:
+        """Añade una vela; si el buffer está lleno descarta la más antigua."""
+        self._write(self._head, timestamp, (open_, high, low, close, volume))
+        self._head = (self._head + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def upsert(self, timestamp: int, open_: float, high: float, low: float, close: float, volume: float) -> None:
+        """
+        Sobrescribe la última vela si tiene el mismo timestamp (vela en curso) o
+        añade una nueva si es posterior. Las velas anteriores se ignoran.
+        """
+        if self._size:
+            last = int(self._timestamps[(self._head - 1) % self.capacity])
+            if timestamp < last:
+                return
+            if timestamp == last:
+                self._write((self._head - 1) % self.capacity, timestamp, (open_, high, low, close, volume))
+                return
+        self.append(timestamp, open_, high, low, close, volume)
+
+    def extend(self, rows) -> None:
+        """Añade un bloque de velas ``[timestamp, open, high, low, close, volume]`` de forma vectorizada."""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))[-self.capacity:]
+        count = len(rows)
+        if count == 0:
+            return
+        positions = (self._head + np.arange(count)) % self.capacity
+        for offset in (0, self.capacity):
+            self._timestamps[positions + offset] = rows[:, 0].astype(np.int64)
+            self._prices[:, positions + offset] = rows[:, 1:].T
+        self._head = (self._head + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+
+    def clear(self) -> None:
+        self._head = 0
+        self._size = 0
+
+    def _window(self) -> slice:
+        start = (self._head - self._size) % self.capacity
+        return slice(start, start + self._size)
+
+    @staticmethod
+    def _readonly(view: np.ndarray) -> np.ndarray:
+        view.flags.writeable = False
+        return view
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        """Vista de solo lectura de los timestamps (ms), de la vela más antigua a la más reciente."""
+        return self._readonly(self._timestamps[self._window()])
+
+    def column(self, name: str) -> np.ndarray:
+        """Vista ordenada de solo lectura de una columna OHLCV."""
+        if name == 'timestamp':
+            return self.timestamps
+        return self._readonly(self._prices[PRICE_COLUMNS.index(name), self._window()])
+
+    def last(self) -> dict:
+        """Última vela del buffer como diccionario."""
+        if not self._size:
+            return {}
+        position = (self._head - 1) % self.capacity
+        candle = dict(zip(PRICE_COLUMNS, self._prices[:, position].tolist()))
+        candle['timestamp'] = int(self._timestamps[position])
+        return candle
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        DataFrame con índice de fechas UTC cuyas columnas OHLCV comparten memoria
+        con el buffer. Sólo es válido hasta el siguiente append.
+        """
+        window = self._window()
+        index = pd.to_datetime(self._timestamps[window], unit='ms', utc=True)
+        df = pd.DataFrame(self._prices[:, window].T, index=index, columns=list(PRICE_COLUMNS), copy=False)
+        df.insert(0, 'timestamp', self._timestamps[window])
+        return df
+
+    def to_list(self) -> list:
+        """Copia de las velas en el antiguo formato de lista de listas."""
+        rows = np.column_stack([self._timestamps[self._window()], self._prices[:, self._window()].T])
+        return [[int(row[0])] + row[1:].tolist() for row in rows]
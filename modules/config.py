@@ -1,7 +1,7 @@
 # config.py
 import os
 from dotenv import load_dotenv
-from datetime import datetime
+import time
 
 # Cargar variables de entorno (asegúrate de tener un archivo keys.env con tus credenciales)
 load_dotenv("keys.env")
@@ -16,14 +16,58 @@ STOP_LOSS = 0.25  # 25%
 BASE_ORDER_SIZE = 10  # Monto base
 ORDER_MULTIPLIER = 2.6  # Multiplicador para DCA
 MAX_DCA_ORDERS = 4
+RSI_BUY_THRESHOLD = 55  # Compra sólo con RSI por debajo de este valor
+EMA_BUY_FACTOR = 0.995  # Compra si close > EMA_9 * factor
+EMA_SELL_FACTOR = 1.005  # Venta si close < EMA_9 * factor
 TRADING_PAIR = "ETH/USDT"
+TRADING_PAIRS = [TRADING_PAIR]  # Pares para el modo multi-símbolo
 COMMISSION = 0.001
 MIN_NOTIONAL = 10
 MAX_RETRIES = 3
 MIN_ORDER_SIZE = 0.00001
+CANDLE_BUFFER_DEPTH = 500  # Velas conservadas en memoria por símbolo
+WS_BASE_URL = "wss://stream.binance.us:9443"
+SYMBOL_QUEUE_SIZE = 100  # Velas confirmadas pendientes por símbolo; al superarlas se descarta la más antigua
+PROVISIONAL_CANDLES = os.getenv("PROVISIONAL_CANDLES", "0") == "1"  # Evalúa también la vela en curso
+PROVISIONAL_DEBOUNCE = 0.5  # Segundos mínimos entre evaluaciones de la vela en curso
+AGGREGATE_TIMEFRAMES = ['5m', '15m', '1h', '4h']  # Timeframes construidos localmente desde el stream base
+AGGREGATE_HISTORY = 200  # Velas del timeframe mayor derivadas del historial base al arrancar
+ORDER_BOOK_DEPTH = 100  # Niveles por lado del libro local
+ORDER_BOOK_MAX_AGE = 2.0  # Segundos sin actualizar tras los que se vuelve a usar el ticker
+ORDER_BOOK_BUFFER = 1000  # Eventos guardados mientras llega el snapshot
+MARKETS_CACHE_FILE = "markets_cache.json"  # Copia local de mercados y precisiones de ccxt
+MARKETS_CACHE_TTL = 6 * 3600  # Segundos tras los que la copia se refresca en segundo plano
+TIME_SYNC_TIMEOUT = 3.0  # Segundos máximos de la consulta de hora del servidor
+HTTP_POOL_SIZE = 20  # Conexiones keep-alive del cliente asíncrono
+HTTP_KEEPALIVE = 60  # Segundos que se mantiene abierta una conexión ociosa
+REQUEST_WEIGHT_LIMIT = 1200  # Peso REST permitido por ventana (Binance.US: 1200 por minuto)
+REQUEST_WEIGHT_WINDOW = 60.0  # Segundos de la ventana de peso
+REQUEST_WEIGHT_BURST = 240  # Peso máximo en ráfaga; el resto de la ventana se reparte a ritmo constante
+REQUEST_WEIGHT_RESERVE = 100  # Peso que sólo pueden usar las órdenes
+REQUEST_BACKOFF = 10.0  # Pausa tras un 429/418 sin Retry-After
+TICKER_CACHE_TTL = 1.0  # Segundos que se reutiliza un ticker entre señales concurrentes
+RETRY_BASE_DELAY = 0.25  # Backoff exponencial con jitter entre reintentos
+RETRY_MAX_DELAY = 4.0
+OHLCV_CACHE_DIR = "ohlcv_cache"  # Cache local de velas por símbolo y timeframe
+OHLCV_PAGE_LIMIT = 1000  # Velas por petición al paginar la historia
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"  # Trazas de latencia por etapa
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
+METRICS_LOG_INTERVAL = 60  # Segundos entre resúmenes de latencia en el log
+POSITION_DB = "positions.db"  # Estado de posiciones y órdenes (SQLite en modo WAL)
+STATE_SEGMENT_SIZE = 1 << 20  # Bytes del segmento compartido con el dashboard
+STATE_PUBLISH_INTERVAL = 0.5  # Segundos entre snapshots publicados por el bot
+STATE_CANDLES = 100  # Velas por símbolo incluidas en el snapshot
+DASHBOARD_REFRESH = 1.0  # Segundos entre lecturas del snapshot en la UI
+BOT_MAX_RESTARTS = 5  # Reinicios automáticos del proceso del bot antes de rendirse
 
 # Para creación de archivos de log
-LOG_FILE = f'trading_bot_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log'
+LOG_FILE = f'trading_bot_{time.strftime("%Y%m%d_%H%M%S")}.log'
+JOURNAL_FILE = f'trading_journal_{time.strftime("%Y%m%d_%H%M%S")}.bin'  # Diario binario de operaciones
+CONSOLE_LOG_LEVEL = os.getenv("CONSOLE_LOG_LEVEL", "INFO")  # DEBUG muestra los mensajes de cada vela
+LOG_SAMPLE_EVERY = 100  # Mensajes muestreados por vela: se muestra uno de cada N
+JOURNAL_FSYNC_EVERY = 50  # Registros entre fsync del diario
+JOURNAL_FSYNC_INTERVAL = 5.0  # Segundos máximos entre fsync del diario
 
 def run_module():
     # Retorna el contenido del archivo para ver qué hay en él
@@ -1,28 +1,35 @@
 # data_layer.py
-import ccxt
 import time
-import requests
 import os
+import threading
 import json
 import asyncio
 import websockets
-from datetime import datetime
-import pandas as pd
-import pytz
+import numpy as np
+from collections import deque
 from typing import Optional, Dict, Any, Generator
 #from config import API_KEY, API_SECRET, TRADING_PAIR, TIMEFRAME
-from .config import API_KEY, API_SECRET, TRADING_PAIR, TIMEFRAME
+from .config import (API_KEY, API_SECRET, TRADING_PAIR, TIMEFRAME, CANDLE_BUFFER_DEPTH, WS_BASE_URL,
+                     HTTP_POOL_SIZE, HTTP_KEEPALIVE, PROVISIONAL_CANDLES, PROVISIONAL_DEBOUNCE, TIME_SYNC_TIMEOUT)
+from .candle_buffer import CandleBuffer
+from .scheduler import attach_scheduler, request_lane
+from .markets_cache import MarketsCache
 #from utilities import print_colored, Colors, log_error
 from .utilities import print_colored, Colors, log_error
+from . import metrics
 
+# ccxt se importa al crear el exchange: su carga cuesta más que el resto del bot
+_server_clock = {'offset': -2000}  # Offset en ms usado por el nonce; conservador hasta sincronizar
 
-def get_server_time_offset() -> int:
+
+def get_server_time_offset(timeout: float = TIME_SYNC_TIMEOUT) -> int:
     """
     Obtiene la diferencia entre el tiempo del servidor de Binance y el local.
     Retorna un offset en milisegundos o un valor conservador en caso de error.
     """
+    import requests
     try:
-        response = requests.get('https://api.binance.us/api/v3/time')
+        response = requests.get('https://api.binance.us/api/v3/time', timeout=timeout)
         server_time = response.json()['serverTime']
         local_time = int(time.time() * 1000)
         return server_time - local_time
@@ -30,10 +37,43 @@ def get_server_time_offset() -> int:
         print_colored(f"Error obtaining server time: {str(e)}", Colors.YELLOW)
         return -2000
 
-def create_exchange() -> Optional[ccxt.binanceus]:
+def sync_server_time() -> int:
+    """Actualiza el offset que usan los nonces de los exchanges ya creados."""
+    offset = get_server_time_offset()
+    _server_clock['offset'] = offset
+    print_colored(f"Time offset (ms): {offset}", Colors.BLUE)
+    return offset
+
+def _exchange_config() -> dict:
+    """
+    Configuración común de ccxt para los clientes síncrono y asíncrono. El nonce
+    lee el offset en cada firma, así la sincronización de hora puede terminar
+    después de crear el exchange.
+    """
+    return {
+        'apiKey': API_KEY,
+        'secret': API_SECRET,
+        'timeout': 30000,
+        'enableRateLimit': True,
+        'options': {
+            'recvWindow': 5000,
+            'defaultType': 'spot',
+            # El offset lo aplica el nonce; evita la petición extra de hora en load_markets
+            'adjustForTimeDifference': False,
+            # La reconciliación pide las órdenes abiertas de todos los símbolos en una sola llamada
+            'warnOnFetchOpenOrdersWithoutSymbol': False
+        },
+        'nonce': lambda: int(time.time() * 1000) + _server_clock['offset'] - 500
+    }
+
+def create_exchange(markets: MarketsCache = None) -> Optional['ccxt.binanceus']:
     """
     Inicializa la conexión al exchange usando ccxt y las credenciales.
+    La hora del servidor se sincroniza en un hilo aparte y los mercados se
+    restauran del MarketsCache (refrescándolos en segundo plano si caducaron).
     """
+    import ccxt
+    markets = markets or MarketsCache()
     try:
         print_colored("\n=== INITIALIZING EXCHANGE ===", Colors.BLUE)
         if not os.path.exists("keys.env"):
@@ -42,21 +82,15 @@ def create_exchange() -> Optional[ccxt.binanceus]:
         if not API_KEY or not API_SECRET:
             print_colored("API credentials not found", Colors.RED)
             return None
-        time_offset = get_server_time_offset()
-        print_colored(f"Time offset (ms): {time_offset}", Colors.BLUE)
-        exchange = ccxt.binanceus({
-            'apiKey': API_KEY,
-            'secret': API_SECRET,
-            'timeout': 30000,
-            'enableRateLimit': True,
-            'options': {
-                'recvWindow': 5000,
-                'defaultType': 'spot',
-                'adjustForTimeDifference': True
-            },
-            'nonce': lambda: int(time.time() * 1000) + time_offset - 500
-        })
-        exchange.load_markets()
+        threading.Thread(target=sync_server_time, name='time-sync', daemon=True).start()
+        exchange = ccxt.binanceus(_exchange_config())
+        age = markets.restore(exchange)
+        if age is None:
+            exchange.load_markets()
+            markets.save(exchange)
+        elif markets.stale(age):
+            markets.refresh_in_background(exchange, lambda: ccxt.binanceus(_exchange_config()))
+        metrics.startup_mark('exchange')
         print_colored("Exchange connection successful", Colors.GREEN)
         return exchange
     except Exception as e:
@@ -64,47 +98,176 @@ def create_exchange() -> Optional[ccxt.binanceus]:
         log_error(e, "Exchange Connection Error")
         return None
 
-def get_historical_data(exchange: ccxt.Exchange, symbol: str, timeframe: str = None, limit: int = 50) -> Optional[Dict[str, Any]]:
+async def create_async_exchange(markets: MarketsCache = None):
     """
-    Solicita datos históricos (OHLCV) y los procesa.
+    Inicializa un cliente ccxt asíncrono sobre una sesión aiohttp con pool de
+    conexiones keep-alive, para que las llamadas REST no bloqueen el event loop.
+    La hora del servidor se sincroniza en paralelo con la carga del historial
+    (las llamadas firmadas la esperan) y los mercados salen del MarketsCache.
+    Debe cerrarse con close_async_exchange.
+    """
+    import aiohttp
+    import ccxt.async_support as ccxt_async
+    markets = markets or MarketsCache()
+    try:
+        print_colored("\n=== INITIALIZING ASYNC EXCHANGE ===", Colors.BLUE)
+        if not os.path.exists("keys.env"):
+            print_colored("keys.env not found", Colors.RED)
+            return None
+        if not API_KEY or not API_SECRET:
+            print_colored("API credentials not found", Colors.RED)
+            return None
+        time_sync = asyncio.create_task(asyncio.to_thread(sync_server_time))
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, keepalive_timeout=HTTP_KEEPALIVE,
+                                         ttl_dns_cache=300, enable_cleanup_closed=True)
+        config = _exchange_config()
+        config['session'] = aiohttp.ClientSession(connector=connector)
+        exchange = ccxt_async.binanceus(config)
+        exchange.time_sync = time_sync
+        exchange.markets_refresh = None
+        try:
+            age = markets.restore(exchange)
+            if age is None:
+                await exchange.load_markets()
+                await asyncio.to_thread(markets.save, exchange)
+            elif markets.stale(age):
+                exchange.markets_refresh = asyncio.create_task(markets.refresh_async(exchange))
+        except Exception:
+            await close_async_exchange(exchange)
+            raise
+        attach_scheduler(exchange)
+        metrics.startup_mark('exchange')
+        print_colored("Exchange connection successful", Colors.GREEN)
+        return exchange
+    except Exception as e:
+        print_colored(f"Exchange error: {str(e)}", Colors.RED)
+        log_error(e, "Exchange Connection Error")
+        return None
+
+async def close_async_exchange(exchange) -> None:
+    """Cierra el cliente asíncrono, sus tareas de arranque pendientes y su sesión HTTP compartida."""
+    for task in (getattr(exchange, 'time_sync', None), getattr(exchange, 'markets_refresh', None)):
+        if task is not None and not task.done():
+            task.cancel()
+    session = getattr(exchange, 'session', None)
+    await exchange.close()
+    if session is not None and not session.closed:
+        await session.close()
+
+async def call_exchange(exchange, method: str, *args, **kwargs):
+    """
+    Llama a un método del exchange sin bloquear el event loop: se espera
+    directamente si el cliente es asíncrono y se delega a un hilo si es síncrono.
+    Si el exchange tiene un RequestScheduler la llamada espera su turno en él.
+    Las llamadas firmadas esperan a que termine la sincronización de hora.
+    """
+    time_sync = getattr(exchange, 'time_sync', None)
+    if time_sync is not None and not time_sync.done() and request_lane(method) in ('order', 'account'):
+        await asyncio.shield(time_sync)
+    function = getattr(exchange, method)
+    if asyncio.iscoroutinefunction(function):
+        call = lambda: function(*args, **kwargs)
+    else:
+        call = lambda: asyncio.to_thread(function, *args, **kwargs)
+    scheduler = getattr(exchange, 'request_scheduler', None)
+    if scheduler is None:
+        return await call()
+    return await scheduler.submit(exchange, method, args, kwargs, call)
+
+def _load_historical_rows(ohlcv: list, buffer: CandleBuffer) -> Dict[str, Any]:
+    """Carga las velas recibidas en el buffer y arma el diccionario de datos históricos."""
+    rows = np.asarray(ohlcv, dtype=np.float64)
+    # Descartamos velas con apertura futura comparando timestamps en ms
+    rows = rows[rows[:, 0] <= time.time() * 1000]
+    buffer.extend(rows)
+    return _historical_snapshot(buffer)
+
+def _historical_snapshot(buffer: CandleBuffer) -> Dict[str, Any]:
+    """Diccionario de datos históricos a partir de la última vela del buffer."""
+    last = buffer.last()
+    return {
+        'timestamp': last['timestamp'],
+        'close': last['close'],
+        'high': last['high'],
+        'low': last['low'],
+        'volume': last['volume'],
+        'candles': buffer
+    }
+
+def _load_cached_window(series, buffer: CandleBuffer, limit: int) -> Optional[Dict[str, Any]]:
+    """Carga en el buffer la ventana más reciente de una serie del cache local."""
+    if not series.count:
+        print_colored("No data received", Colors.RED)
+        return None
+    series.fill_buffer(buffer, limit)
+    return _historical_snapshot(buffer)
+
+def get_historical_data(exchange: 'ccxt.Exchange', symbol: str, timeframe: str = None, limit: int = CANDLE_BUFFER_DEPTH,
+                        buffer: Optional[CandleBuffer] = None, cache=None) -> Optional[Dict[str, Any]]:
+    """
+    Solicita datos históricos (OHLCV) y los carga directamente en el buffer de velas.
+    Con un OHLCVCache sólo se descargan las velas que faltan desde la última guardada.
     """
     if timeframe is None:
         timeframe = f'{int(TIMEFRAME/60)}m'
+    if buffer is None:
+        buffer = CandleBuffer(max(limit, CANDLE_BUFFER_DEPTH))
+    if cache is not None:
+        # Fuera del try: usar el cache síncrono dentro del event loop es un error de uso, no de datos
+        cache.require_sync_context()
     try:
         print_colored("\n=== LOADING HISTORICAL DATA ===", Colors.BLUE)
+        if cache is not None:
+            cache.update(exchange, symbol, timeframe, depth=limit)
+            return _load_cached_window(cache.series(symbol, timeframe), buffer, limit)
         ohlcv = exchange.fetch_ohlcv(symbol, timeframe=timeframe, limit=limit)
         if not ohlcv:
             print_colored("No data received", Colors.RED)
             return None
-        df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume'])
-        df['datetime'] = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
-        et_tz = pytz.timezone('America/New_York')
-        df['datetime_et'] = df['datetime'].dt.tz_convert(et_tz)
-        now = datetime.now(et_tz)
-        df = df[df['datetime_et'] <= now]
-        return {
-            'timestamp': df['timestamp'].iloc[-1],
-            'close': df['close'].iloc[-1],
-            'high': df['high'].iloc[-1],
-            'low': df['low'].iloc[-1],
-            'volume': df['volume'].iloc[-1],
-            'ohlcv': df[['timestamp','open','high','low','close','volume']].values.tolist()
-        }
+        return _load_historical_rows(ohlcv, buffer)
     except Exception as e:
         print_colored(f"Error processing historical data: {str(e)}", Colors.RED)
         log_error(e, "Historical Data Error")
         return None
 
-async def binance_websocket(symbol: str, historical_data: Dict[str, Any]) -> Generator[Dict[str, Any], None, None]:
+async def get_historical_data_async(exchange, symbol: str, timeframe: str = None, limit: int = CANDLE_BUFFER_DEPTH,
+                                    buffer: Optional[CandleBuffer] = None, cache=None) -> Optional[Dict[str, Any]]:
     """
-    Conecta al WebSocket de Binance para recibir velas y las emite.
+    Versión asíncrona de get_historical_data para clientes síncronos o asíncronos.
     """
+    if timeframe is None:
+        timeframe = f'{int(TIMEFRAME/60)}m'
+    if buffer is None:
+        buffer = CandleBuffer(max(limit, CANDLE_BUFFER_DEPTH))
+    try:
+        print_colored(f"\n=== LOADING HISTORICAL DATA ({symbol}) ===", Colors.BLUE)
+        if cache is not None:
+            await cache.update_async(exchange, symbol, timeframe, depth=limit)
+            return _load_cached_window(cache.series(symbol, timeframe), buffer, limit)
+        ohlcv = await call_exchange(exchange, 'fetch_ohlcv', symbol, timeframe=timeframe, limit=limit)
+        if not ohlcv:
+            print_colored("No data received", Colors.RED)
+            return None
+        return _load_historical_rows(ohlcv, buffer)
+    except Exception as e:
+        print_colored(f"Error processing historical data: {str(e)}", Colors.RED)
+        log_error(e, "Historical Data Error")
+        return None
+
+def stream_name(symbol: str) -> str:
+    """Nombre del stream de velas de Binance para un símbolo (``ETH/USDT`` -> ``ethusdt@kline_5m``)."""
     timeframe_minutes = int(TIMEFRAME / 60)
-    url = f"wss://stream.binance.us:9443/ws/{symbol.lower()}@kline_{timeframe_minutes}m"
+    return f"{symbol.replace('/', '').lower()}@kline_{timeframe_minutes}m"
+
+async def binance_websocket(symbol: str, historical_data: Dict[str, Any],
+                            base_url: str = WS_BASE_URL) -> Generator[Dict[str, Any], None, None]:
+    """
+    Conecta al WebSocket de Binance para recibir velas y las emite.
+    """
+    url = f"{base_url}/ws/{stream_name(symbol)}"
     reconnect_delay = 5
-    # Copiamos las velas históricas
-    velas_confirmadas = historical_data['ohlcv'].copy()
-    et_tz = pytz.timezone('America/New_York')
+    # Buffer circular con las velas históricas
+    velas_confirmadas = historical_data['candles']
     last_processed_timestamp = None
     while True:
         try:
@@ -113,7 +276,7 @@ async def binance_websocket(symbol: str, historical_data: Dict[str, Any]) -> Gen
                 print_colored("WebSocket connected", Colors.GREEN)
                 data = {
                     'timestamp': historical_data['timestamp'],
-                    'ohlcv': velas_confirmadas,
+                    'candles': velas_confirmadas,
                     'close': historical_data['close'],
                     'high': historical_data['high'],
                     'low': historical_data['low'],
@@ -125,7 +288,9 @@ async def binance_websocket(symbol: str, historical_data: Dict[str, Any]) -> Gen
                 while True:
                     try:
                         msg = await ws.recv()
-                        parsed = json.loads(msg)
+                        received_ns = metrics.now_ns()
+                        with metrics.span('decode'):
+                            parsed = json.loads(msg)
                         if 'k' not in parsed:
                             continue
                         kline = parsed['k']
@@ -133,25 +298,24 @@ async def binance_websocket(symbol: str, historical_data: Dict[str, Any]) -> Gen
                             continue
                         new_timestamp = int(kline['t'])
                         if last_processed_timestamp is None or new_timestamp > last_processed_timestamp:
-                            new_candle = [
-                                new_timestamp,
-                                float(kline['o']),
-                                float(kline['h']),
-                                float(kline['l']),
-                                float(kline['c']),
-                                float(kline['v'])
-                            ]
-                            if len(velas_confirmadas) >= 50:
-                                velas_confirmadas.pop(0)
-                            velas_confirmadas.append(new_candle)
+                            with metrics.span('buffer_append'):
+                                velas_confirmadas.append(
+                                    new_timestamp,
+                                    float(kline['o']),
+                                    float(kline['h']),
+                                    float(kline['l']),
+                                    float(kline['c']),
+                                    float(kline['v'])
+                                )
                             data = {
                                 'timestamp': new_timestamp,
-                                'ohlcv': velas_confirmadas,
+                                'candles': velas_confirmadas,
                                 'close': float(kline['c']),
                                 'high': float(kline['h']),
                                 'low': float(kline['l']),
                                 'volume': float(kline['v']),
-                                'confirmadas': True
+                                'confirmadas': True,
+                                'received_ns': received_ns
                             }
                             last_processed_timestamp = new_timestamp
                             yield data
@@ -163,6 +327,169 @@ async def binance_websocket(symbol: str, historical_data: Dict[str, Any]) -> Gen
             print_colored(f"Reconnecting in {reconnect_delay} seconds...", Colors.YELLOW)
             await asyncio.sleep(reconnect_delay)
             reconnect_delay = min(reconnect_delay * 2, 60)
+class SymbolQueue:
+    """
+    Cola de velas de un símbolo que nunca bloquea al lector compartido. Las
+    velas confirmadas se encolan en orden hasta ``maxsize``; al llenarse se
+    descarta la más antigua y se cuenta en ``dropped``. De la vela en curso sólo
+    se guarda la actualización más reciente, que se entrega tras las confirmadas.
+    Ofrece ``get``/``get_nowait`` como asyncio.Queue para symbol_stream.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._confirmed = deque()
+        self._provisional = None
+        self._ready = asyncio.Event()
+
+    def put_nowait(self, item: tuple) -> None:
+        """Encola ``(kline, received_ns)`` sin esperar nunca."""
+        kline = item[0]
+        if not kline.get('x', True):
+            self._provisional = item
+        else:
+            if self._provisional is not None and int(self._provisional[0]['t']) <= int(kline['t']):
+                self._provisional = None
+            if len(self._confirmed) >= self.maxsize:
+                self._confirmed.popleft()
+                self.dropped += 1
+                print_colored(f"Queue full for {kline.get('s', 'symbol')}: dropped oldest candle "
+                              f"({self.dropped} so far)", Colors.YELLOW, sample='queue_drop')
+            self._confirmed.append(item)
+        self._ready.set()
+
+    def qsize(self) -> int:
+        return len(self._confirmed) + (self._provisional is not None)
+
+    def empty(self) -> bool:
+        return not self.qsize()
+
+    def get_nowait(self) -> tuple:
+        if self._confirmed:
+            item = self._confirmed.popleft()
+        elif self._provisional is not None:
+            item, self._provisional = self._provisional, None
+        else:
+            raise asyncio.QueueEmpty()
+        if self.empty():
+            self._ready.clear()
+        return item
+
+    async def get(self) -> tuple:
+        while self.empty():
+            await self._ready.wait()
+        return self.get_nowait()
+
+async def binance_combined_websocket(symbols: list, queues: Dict[str, SymbolQueue],
+                                     base_url: str = WS_BASE_URL, provisional: bool = PROVISIONAL_CANDLES) -> None:
+    """
+    Suscribe todos los símbolos a una única conexión de streams combinados y
+    enruta cada vela confirmada a la SymbolQueue de su símbolo. El lector nunca
+    espera a un pipeline: la presión se resuelve por símbolo (la vela en curso
+    se sustituye y, con la cola llena, se descarta la confirmada más antigua),
+    así un símbolo atascado no frena a los demás ni a los pings del socket.
+    Con ``provisional`` también se enrutan las actualizaciones de la vela en curso.
+    """
+    routes = {stream_name(symbol): queues[symbol] for symbol in symbols}
+    url = f"{base_url}/stream?streams={'/'.join(routes)}"
+    reconnect_delay = 5
+    while True:
+        try:
+            print_colored(f"Connecting to combined WebSocket ({len(routes)} streams)", Colors.BLUE)
+            async with websockets.connect(url) as ws:
+                print_colored("Combined WebSocket connected", Colors.GREEN)
+                reconnect_delay = 5
+                async for msg in ws:
+                    try:
+                        received_ns = metrics.now_ns()
+                        with metrics.span('decode'):
+                            parsed = json.loads(msg)
+                        queue = routes.get(parsed.get('stream'))
+                        kline = parsed.get('data', {}).get('k')
+                        if queue is None or not kline or not (provisional or kline.get('x', False)):
+                            continue
+                        queue.put_nowait((kline, received_ns))
+                    except Exception as e:
+                        print_colored(f"WebSocket message error: {str(e)}", Colors.RED)
+                        continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log_error(e, "Combined WebSocket Error")
+            print_colored(f"Reconnecting in {reconnect_delay} seconds...", Colors.YELLOW)
+            await asyncio.sleep(reconnect_delay)
+            reconnect_delay = min(reconnect_delay * 2, 60)
+
+def _kline_data(candles: CandleBuffer, kline: dict, received_ns: int) -> Dict[str, Any]:
+    return {
+        'timestamp': int(kline['t']),
+        'candles': candles,
+        'close': float(kline['c']),
+        'high': float(kline['h']),
+        'low': float(kline['l']),
+        'volume': float(kline['v']),
+        'confirmadas': bool(kline.get('x', True)),
+        'received_ns': received_ns
+    }
+
+async def symbol_stream(historical_data: Dict[str, Any], queue: SymbolQueue,
+                        debounce: float = PROVISIONAL_DEBOUNCE) -> Generator[Dict[str, Any], None, None]:
+    """
+    Equivalente a binance_websocket para un símbolo del modo multiplexado:
+    consume las velas de su cola, las añade a su buffer y emite los mismos datos.
+
+    Las actualizaciones de la vela en curso (``confirmadas`` falso) se aplican
+    al buffer en cuanto llegan, pero se emiten como mucho una vez cada
+    ``debounce`` segundos: las ráfagas se agrupan y se emite el estado más
+    reciente. Una vela confirmada se emite siempre y descarta la provisional pendiente.
+    """
+    velas_confirmadas = historical_data['candles']
+    last_processed_timestamp = historical_data['timestamp']
+    yield {
+        'timestamp': historical_data['timestamp'],
+        'candles': velas_confirmadas,
+        'close': historical_data['close'],
+        'high': historical_data['high'],
+        'low': historical_data['low'],
+        'volume': historical_data['volume'],
+        'confirmadas': True
+    }
+    pending = None
+    last_provisional = 0.0
+    while True:
+        if pending is None:
+            kline, received_ns = await queue.get()
+        else:
+            remaining = last_provisional + debounce - time.monotonic()
+            try:
+                kline, received_ns = (await asyncio.wait_for(queue.get(), remaining) if remaining > 0
+                                      else queue.get_nowait())
+            except (asyncio.TimeoutError, asyncio.QueueEmpty):
+                last_provisional = time.monotonic()
+                yield pending
+                pending = None
+                continue
+        metrics.record_since('queue_wait', received_ns)
+        new_timestamp = int(kline['t'])
+        if new_timestamp <= last_processed_timestamp:
+            continue
+        with metrics.span('buffer_append'):
+            velas_confirmadas.upsert(
+                new_timestamp,
+                float(kline['o']),
+                float(kline['h']),
+                float(kline['l']),
+                float(kline['c']),
+                float(kline['v'])
+            )
+        if kline.get('x', True):
+            last_processed_timestamp = new_timestamp
+            pending = None
+            yield _kline_data(velas_confirmadas, kline, received_ns)
+        else:
+            pending = _kline_data(velas_confirmadas, kline, received_ns)
+
 # Al final de data_layer.py (y de los demás módulos)
 def run_module():
     return "Data Layer ejecutado (dummy)"
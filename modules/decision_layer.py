@@ -1,6 +1,8 @@
 from .utilities import print_colored, Colors
+from .metrics import timed
 from .config import TAKE_PROFIT, PRICE_DEVIATION
 # decision_layer.py
+@timed('decision')
 def decision_integration(signal_data: dict, active_positions: list, current_price: float) -> int:
     """
     Integra los resultados de la capa de análisis y determina la acción final:
@@ -11,8 +13,33 @@ def decision_integration(signal_data: dict, active_positions: list, current_pric
         final_signal = 1
     elif active_positions and signal_data['signal'] == -1:
         final_signal = -1
-    print_colored(f"Final decision signal: {final_signal}", Colors.BLUE)
+    print_colored(f"Final decision signal: {final_signal}", Colors.BLUE, sample=None if final_signal else 'decision')
     return final_signal
+
+class CandleOrderGuard:
+    """
+    Recuerda las acciones ejecutadas en la vela actual. En modo provisional una
+    vela puede generar la misma señal en varias evaluaciones y al confirmarse;
+    sólo la primera de cada tipo llega a ejecución, aunque entre medias se haya
+    actuado con otra señal (compra, venta y compra de nuevo en la misma vela).
+    """
+
+    def __init__(self):
+        self.timestamp = None
+        self.acted = set()
+
+    def filter(self, timestamp: int, signal: int) -> int:
+        """Retorna la señal, o 0 si ya se actuó con ella en esta vela."""
+        if signal and timestamp == self.timestamp and signal in self.acted:
+            print_colored("Duplicate signal for this candle suppressed", Colors.YELLOW, sample='duplicate')
+            return 0
+        return signal
+
+    def record(self, timestamp: int, signal: int) -> None:
+        if timestamp != self.timestamp:
+            self.timestamp = timestamp
+            self.acted = set()
+        self.acted.add(signal)
 # Al final de data_layer.py (y de los demás módulos)
 def run_module():
     return "Data Layer ejecutado (dummy)"
@@ -1,90 +1,193 @@
 # execution_layer.py
 import asyncio
-from .utilities import print_colored, Colors, log_error
-from .config import TRADING_PAIR, BASE_ORDER_SIZE, ORDER_MULTIPLIER, MIN_NOTIONAL, MAX_RETRIES, MIN_ORDER_SIZE
+import random
+import time
+from .utilities import print_colored, Colors, log_error, log_trade
+from .config import (TRADING_PAIR, BASE_ORDER_SIZE, ORDER_MULTIPLIER, MIN_NOTIONAL, MAX_RETRIES, MIN_ORDER_SIZE,
+                     MAX_DCA_ORDERS, PRICE_DEVIATION, TICKER_CACHE_TTL, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+from .data_layer import call_exchange
+from . import metrics
 
 def round_to_precision(value: float, precision: int = 8) -> float:
     """Redondea un valor a la precisión indicada."""
     return round(value, precision)
 
-async def execute_order_with_retries(exchange, order_type: str, params: dict):
+def dca_order_amount(active_positions: list, current_price: float, max_dca_orders: int = MAX_DCA_ORDERS,
+                     price_deviation: float = PRICE_DEVIATION, base_order_size: float = BASE_ORDER_SIZE,
+                     order_multiplier: float = ORDER_MULTIPLIER) -> tuple:
+    """
+    Aplica las reglas de DCA para una nueva entrada.
+    Retorna (monto en moneda cotizada, None) o (None, (motivo, color)) si se rechaza.
+    """
+    if len(active_positions) >= max_dca_orders:
+        return None, ("Max DCA orders reached", Colors.YELLOW)
+    if active_positions:
+        last_entry = active_positions[-1]['entry_price']
+        price_drop = (last_entry - current_price) / last_entry
+        if price_drop < price_deviation:
+            return None, ("Price drop not enough for additional DCA", Colors.YELLOW)
+    quote_amount = base_order_size * (order_multiplier ** len(active_positions))
+    if quote_amount < MIN_NOTIONAL:
+        return None, ("Insufficient order amount", Colors.RED)
+    return quote_amount, None
+
+class TickerCache:
+    """
+    Cache de tickers con TTL corto. Las señales concurrentes de un mismo símbolo
+    comparten una única petición en curso en lugar de lanzar una cada una.
+    """
+
+    def __init__(self, ttl: float = TICKER_CACHE_TTL):
+        self.ttl = ttl
+        self._tickers = {}
+        self._pending = {}
+
+    async def get(self, exchange, symbol: str) -> dict:
+        cached = self._tickers.get(symbol)
+        if cached and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        pending = self._pending.get(symbol)
+        if pending is None:
+            pending = asyncio.ensure_future(_fetch_ticker(exchange, symbol))
+            self._pending[symbol] = pending
+            pending.add_done_callback(lambda done: self._release(symbol, done))
+        ticker = await asyncio.shield(pending)
+        self._tickers[symbol] = (time.monotonic(), ticker)
+        return ticker
+
+    def _release(self, symbol: str, done: asyncio.Future) -> None:
+        if self._pending.get(symbol) is done:
+            del self._pending[symbol]
+
+    def invalidate(self, symbol: str = None) -> None:
+        if symbol is None:
+            self._tickers.clear()
+        else:
+            self._tickers.pop(symbol, None)
+
+ticker_cache = TickerCache()
+
+@metrics.timed('ticker_fetch')
+async def _fetch_ticker(exchange, symbol: str) -> dict:
+    return await call_exchange(exchange, 'fetch_ticker', symbol)
+
+@metrics.timed('order_place')
+async def _place_order(exchange, method: str, **params) -> dict:
+    return await call_exchange(exchange, method, **params)
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Backoff exponencial con jitter completo para el reintento número ``attempt``."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+async def _limit_price(exchange, order_type: str, symbol: str, tickers: TickerCache, book=None) -> tuple:
+    """
+    Precio de referencia y precio límite de la orden. Con un libro local al día
+    se usan el mid y el mejor bid (compra) o ask (venta) sin pedir el ticker.
+    """
+    if book is not None and book.fresh():
+        reference = book.mid()
+        limit_price = book.best_bid() if order_type == 'buy' else book.best_ask()
+        return reference, limit_price
+    ticker = await tickers.get(exchange, symbol)
+    current_price = ticker['last']
+    return current_price, current_price * (0.9999 if order_type == 'buy' else 1.0001)
+
+async def execute_order_with_retries(exchange, order_type: str, params: dict, tickers: TickerCache = None,
+                                     book=None):
     """
     Ejecuta una orden (compra o venta) con reintentos.
+    Las llamadas al exchange no bloquean el event loop y los reintentos
+    esperan un backoff exponencial con jitter. Con ``book`` (OrderBook
+    sincronizado) el precio sale del libro local en lugar del ticker REST.
     """
+    tickers = tickers or ticker_cache
     attempt = 0
     last_error = None
     while attempt < MAX_RETRIES:
         attempt += 1
         try:
+            current_price, limit_price = await _limit_price(exchange, order_type, params['symbol'], tickers, book)
+            limit_price = round_to_precision(limit_price, 2)
             if order_type == 'buy':
-                ticker = exchange.fetch_ticker(params['symbol'])
-                current_price = ticker['last']
                 base_amount = params['quote_amount'] / current_price
                 base_amount = round_to_precision(max(base_amount, MIN_ORDER_SIZE))
-                limit_price = round_to_precision(current_price * 0.9999, 2)
+                if book is not None and book.fresh() and book.available('buy', limit_price * 1.001) < base_amount:
+                    print_colored(f"Thin book: less than {base_amount} available near {limit_price}", Colors.YELLOW)
                 print_colored(f"Placing limit buy order at {limit_price}", Colors.YELLOW)
-                order = exchange.create_limit_buy_order(
+                return await _place_order(
+                    exchange, 'create_limit_buy_order',
                     symbol=params['symbol'],
                     amount=base_amount,
                     price=limit_price
                 )
-                await asyncio.sleep(1)
-                return order
             else:
-                ticker = exchange.fetch_ticker(params['symbol'])
-                current_price = ticker['last']
                 amount = round_to_precision(float(params['amount']))
-                limit_price = round_to_precision(current_price * 1.0001, 2)
+                if book is not None and book.fresh() and book.available('sell', limit_price * 0.999) < amount:
+                    print_colored(f"Thin book: less than {amount} available near {limit_price}", Colors.YELLOW)
                 print_colored(f"Placing limit sell order at {limit_price}", Colors.YELLOW)
-                order = exchange.create_limit_sell_order(
+                return await _place_order(
+                    exchange, 'create_limit_sell_order',
                     symbol=params['symbol'],
                     amount=amount,
                     price=limit_price
                 )
-                await asyncio.sleep(1)
-                return order
         except Exception as e:
             last_error = e
             print_colored(f"Order attempt {attempt} failed: {str(e)}", Colors.RED)
-            await asyncio.sleep(1)
+            tickers.invalidate(params['symbol'])
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(backoff_delay(attempt))
     raise Exception(f"Order failed after {MAX_RETRIES} attempts: {last_error}")
 
-async def process_trading_signals(exchange, signal: int, data: dict, active_positions: list):
+def order_fill(order: dict) -> tuple:
+    """Precio medio y cantidad ejecutada de una orden de ccxt (con el precio límite y la cantidad como respaldo)."""
+    return float(order.get('average') or order['price']), float(order.get('filled') or order['amount'])
+
+async def process_trading_signals(exchange, signal: int, data: dict, active_positions: list, symbol: str = TRADING_PAIR,
+                                  store=None, book=None):
     """
     Según la señal final decide ejecutar una compra (incluyendo DCA) o venta.
+    Con ``store`` (PositionStore) cada entrada y cierre queda persistido y con
+    ``book`` (OrderBook) las órdenes se valoran con el libro local. Cada orden
+    ejecutada se registra con log_trade (y en el diario si está activo) con su
+    precio y cantidad ejecutados.
     """
     if signal == 0:
         return
     try:
-        base_currency, quote_currency = TRADING_PAIR.split('/')
+        base_currency, quote_currency = symbol.split('/')
         current_price = float(data['close'])
         if signal == 1:  # Señal de compra
-            if len(active_positions) >= 4:
-                print_colored("Max DCA orders reached", Colors.YELLOW)
-                return
-            if active_positions:
-                last_entry = active_positions[-1]['entry_price']
-                price_drop = (last_entry - current_price) / last_entry
-                if price_drop < PRICE_DEVIATION:
-                    print_colored("Price drop not enough for additional DCA", Colors.YELLOW)
-                    return
-            quote_amount = BASE_ORDER_SIZE * (ORDER_MULTIPLIER ** len(active_positions))
-            if quote_amount < MIN_NOTIONAL:
-                print_colored("Insufficient order amount", Colors.RED)
+            quote_amount, rejection = dca_order_amount(active_positions, current_price)
+            if rejection:
+                print_colored(*rejection)
                 return
-            base_amount = round_to_precision(quote_amount / current_price)
             print_colored("Executing BUY order", Colors.GREEN)
-            order = await execute_order_with_retries(exchange, 'buy', {'symbol': TRADING_PAIR, 'quote_amount': quote_amount})
-            active_positions.append({
-                'entry_price': current_price,
-                'base_amount': base_amount,
+            order = await execute_order_with_retries(exchange, 'buy', {'symbol': symbol, 'quote_amount': quote_amount},
+                                                 book=book)
+            metrics.record_since('tick_to_order', data.get('received_ns'))
+            fill_price, filled = order_fill(order)
+            position = {
+                'entry_price': fill_price,
+                'base_amount': filled,
                 'quote_amount': quote_amount
-            })
+            }
+            if store is not None:
+                store.record_entry(symbol, position, order)
+            active_positions.append(position)
+            log_trade('BUY', fill_price, filled)
         elif signal == -1 and active_positions:  # Señal de venta
             print_colored("Executing SELL order", Colors.GREEN)
             total_base = sum(pos['base_amount'] for pos in active_positions)
-            order = await execute_order_with_retries(exchange, 'sell', {'symbol': TRADING_PAIR, 'amount': total_base})
+            order = await execute_order_with_retries(exchange, 'sell', {'symbol': symbol, 'amount': total_base},
+                                                 book=book)
+            metrics.record_since('tick_to_order', data.get('received_ns'))
+            if store is not None:
+                store.record_exit(symbol, order)
+            entry_price = sum(pos['entry_price'] * pos['base_amount'] for pos in active_positions) / total_base
             active_positions.clear()
+            fill_price, filled = order_fill(order)
+            log_trade('SELL', fill_price, filled, (fill_price / entry_price - 1) * 100)
     except Exception as e:
         log_error(e, "Trade execution error")
         print_colored(f"Trade execution error: {str(e)}", Colors.RED)
@@ -0,0 +1,95 @@
+# journal.py
+import argparse
+import json
+import math
+import os
+import struct
+import time
+import zlib
+
+# Cabecera de cada registro: longitud del payload, tipo, timestamp (s) y CRC32 del payload
+_HEADER = struct.Struct('<IBdI')
+_TRADE = struct.Struct('<ddd')
+
+RECORD_TRADE = 1
+RECORD_SIGNAL = 2
+
+
+class TradeJournal:
+    """
+    Diario binario append-only de operaciones y señales. Cada registro lleva su
+    longitud y un CRC, de modo que un registro a medias tras una caída se detecta
+    al reproducir. Se hace fsync cada ``fsync_every`` registros o ``fsync_interval``
+    segundos, no en cada escritura.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 50, fsync_interval: float = 5.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = open(path, 'ab')
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _write(self, record_type: int, payload: bytes, timestamp: float = None) -> None:
+        header = _HEADER.pack(len(payload), record_type, timestamp or time.time(), zlib.crc32(payload))
+        self._file.write(header + payload)
+        self._pending += 1
+        if self._pending >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def write_trade(self, action: str, price: float, amount: float, profit: float = None, timestamp: float = None) -> None:
+        payload = _TRADE.pack(price, amount, math.nan if profit is None else profit) + action.encode('utf-8')
+        self._write(RECORD_TRADE, payload, timestamp)
+
+    def write_signal(self, signal_type: str, conditions: dict, timestamp: float = None) -> None:
+        payload = json.dumps([signal_type, conditions], separators=(',', ':'), default=str).encode('utf-8')
+        self._write(RECORD_SIGNAL, payload, timestamp)
+
+    def sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+
+def replay(path: str):
+    """
+    Recorre el diario y emite cada registro como diccionario. Se detiene en el
+    primer registro truncado o con CRC inválido.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        length, record_type, timestamp, crc = _HEADER.unpack_from(data, offset)
+        start = offset + _HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        offset = start + length
+        if record_type == RECORD_TRADE:
+            price, amount, profit = _TRADE.unpack_from(payload)
+            yield {'type': 'trade', 'time': timestamp, 'action': payload[_TRADE.size:].decode('utf-8'),
+                   'price': price, 'amount': amount, 'profit': None if math.isnan(profit) else profit}
+        elif record_type == RECORD_SIGNAL:
+            signal_type, conditions = json.loads(payload)
+            yield {'type': 'signal', 'time': timestamp, 'signal': signal_type, 'conditions': conditions}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Reproduce un diario binario de operaciones y señales")
+    parser.add_argument('path')
+    args = parser.parse_args()
+    start = time.perf_counter()
+    counts = {}
+    for record in replay(args.path):
+        counts[record['type']] = counts.get(record['type'], 0) + 1
+    print(f"{counts} in {time.perf_counter() - start:.3f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# markets_cache.py
+import asyncio
+import json
+import os
+import threading
+import time
+from .utilities import print_colored, Colors, log_error
+from .config import MARKETS_CACHE_FILE, MARKETS_CACHE_TTL
+
+
+class MarketsCache:
+    """
+    Copia en disco de los mercados y monedas de ccxt (precisión, límites, ids).
+    Al arrancar el exchange se restaura desde el archivo sin descargar la
+    metadata; si la copia superó ``ttl`` se usa igualmente y se refresca en
+    segundo plano.
+    """
+
+    def __init__(self, path: str = MARKETS_CACHE_FILE, ttl: float = MARKETS_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def load(self, exchange_id: str):
+        """Retorna (mercados, monedas, antigüedad en segundos) o None si no hay copia válida."""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if cached.get('exchange') != exchange_id or not cached.get('markets'):
+            return None
+        return cached['markets'], cached.get('currencies'), time.time() - cached['saved']
+
+    def save(self, exchange) -> None:
+        """Guarda los mercados cargados del exchange (escritura atómica)."""
+        temporary = f"{self.path}.tmp"
+        try:
+            with open(temporary, 'w', encoding='utf-8') as f:
+                json.dump({'exchange': exchange.id, 'saved': time.time(), 'markets': exchange.markets,
+                           'currencies': exchange.currencies}, f, separators=(',', ':'))
+            os.replace(temporary, self.path)
+        except (OSError, TypeError, ValueError) as e:
+            print_colored(f"Error saving markets cache: {str(e)}", Colors.YELLOW)
+
+    def restore(self, exchange):
+        """
+        Carga los mercados guardados en el exchange. Retorna la antigüedad de la
+        copia en segundos o None si no había copia (hay que llamar a load_markets).
+        """
+        cached = self.load(exchange.id)
+        if cached is None:
+            return None
+        markets, currencies, age = cached
+        exchange.set_markets(markets, currencies)
+        print_colored(f"Markets restored from cache ({len(markets)} markets, {age / 60:.0f} min old)", Colors.BLUE)
+        return age
+
+    def stale(self, age) -> bool:
+        return age is None or age > self.ttl
+
+    def refresh(self, exchange, client_factory) -> None:
+        """
+        Descarga los mercados con un cliente desechable creado por
+        ``client_factory`` y solo entonces los instala en ``exchange``: el
+        cliente síncrono en uso no es seguro entre hilos y load_markets lo
+        dejaría a medio actualizar mientras el bot opera con él.
+        """
+        try:
+            client = client_factory()
+            client.load_markets(reload=True)
+            exchange.set_markets(client.markets, client.currencies)
+            self.save(client)
+        except Exception as e:
+            print_colored(f"Error refreshing markets: {str(e)}", Colors.YELLOW)
+            log_error(e, "Markets Refresh Error")
+
+    async def refresh_async(self, exchange) -> None:
+        try:
+            await exchange.load_markets(reload=True)
+            await asyncio.to_thread(self.save, exchange)
+        except Exception as e:
+            print_colored(f"Error refreshing markets: {str(e)}", Colors.YELLOW)
+            log_error(e, "Markets Refresh Error")
+
+    def refresh_in_background(self, exchange, client_factory) -> threading.Thread:
+        thread = threading.Thread(target=self.refresh, args=(exchange, client_factory),
+                                  name='markets-refresh', daemon=True)
+        thread.start()
+        return thread
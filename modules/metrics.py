@@ -0,0 +1,228 @@
+# metrics.py
+import asyncio
+import functools
+import logging
+import time
+from .utilities import print_colored, Colors
+from .config import METRICS_ENABLED, METRICS_HOST, METRICS_PORT, METRICS_LOG_INTERVAL
+from . import STARTED
+
+# Sub-buckets por potencia de dos: 2**5 = 32 da ~3% de error relativo
+_SUB_BITS = 5
+_SUB_COUNT = 1 << _SUB_BITS
+
+_state = {'enabled': METRICS_ENABLED}
+_startup = {}  # fase de arranque -> perf_counter de la primera vez que se alcanzó
+
+
+class LatencyHistogram:
+    """
+    Histograma log-lineal al estilo HDR para latencias en nanosegundos.
+    Registrar es O(1) y la memoria crece con el rango de valores, no con las muestras.
+    """
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    @staticmethod
+    def _index(value: int) -> int:
+        exponent = value.bit_length() - 1
+        if exponent < _SUB_BITS:
+            return value
+        return (exponent << _SUB_BITS) | ((value >> (exponent - _SUB_BITS)) & (_SUB_COUNT - 1))
+
+    @staticmethod
+    def _upper_bound(index: int) -> int:
+        if index < _SUB_COUNT:
+            return index
+        exponent, mantissa = index >> _SUB_BITS, index & (_SUB_COUNT - 1)
+        return ((_SUB_COUNT + mantissa + 1) << (exponent - _SUB_BITS)) - 1
+
+    def record(self, value: int) -> None:
+        value = max(int(value), 0)
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, percent: float) -> int:
+        if not self.total:
+            return 0
+        target = self.total * percent / 100
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.total,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max,
+            'mean': self.sum / self.total if self.total else 0
+        }
+
+
+_histograms = {}
+
+
+def enable(enabled: bool = True) -> None:
+    """Activa o desactiva la instrumentación en tiempo de ejecución."""
+    _state['enabled'] = enabled
+
+def enabled() -> bool:
+    return _state['enabled']
+
+def record(stage: str, nanoseconds: int) -> None:
+    """Registra una duración (ns) para una etapa."""
+    if not _state['enabled']:
+        return
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        histogram = _histograms[stage] = LatencyHistogram()
+    histogram.record(nanoseconds)
+
+def record_since(stage: str, start_ns: int) -> None:
+    """Registra el tiempo transcurrido desde ``start_ns`` (time.perf_counter_ns)."""
+    if _state['enabled'] and start_ns:
+        record(stage, time.perf_counter_ns() - start_ns)
+
+def now_ns() -> int:
+    """Reloj monotónico para marcar el inicio de un tramo, o 0 si la instrumentación está apagada."""
+    return time.perf_counter_ns() if _state['enabled'] else 0
+
+
+class _Span:
+    __slots__ = ('stage', 'start')
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter_ns() - self.start)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    """Context manager que mide una etapa; sin coste apreciable si la instrumentación está apagada."""
+    return _Span(stage) if _state['enabled'] else _NO_SPAN
+
+def timed(stage: str):
+    """Decorador que mide cada llamada (síncrona o asíncrona) de una función como la etapa ``stage``."""
+    def decorator(function):
+        if asyncio.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                if not _state['enabled']:
+                    return await function(*args, **kwargs)
+                start = time.perf_counter_ns()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    record(stage, time.perf_counter_ns() - start)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return function(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter_ns() - start)
+        return wrapper
+    return decorator
+
+def count(stage: str) -> int:
+    """Muestras registradas para una etapa."""
+    histogram = _histograms.get(stage)
+    return histogram.total if histogram else 0
+
+def startup_mark(phase: str) -> bool:
+    """Marca la primera vez que el arranque alcanza ``phase``. Retorna True sólo esa primera vez."""
+    if phase in _startup:
+        return False
+    _startup[phase] = time.perf_counter()
+    return True
+
+def startup_report() -> str:
+    """Fases del arranque en orden, con el tiempo acumulado desde la importación del paquete y el de cada fase."""
+    parts = []
+    previous = STARTED
+    for phase, reached in sorted(_startup.items(), key=lambda item: item[1]):
+        parts.append(f"{phase}={reached - STARTED:.3f}s (+{reached - previous:.3f}s)")
+        previous = reached
+    return ' '.join(parts)
+
+def snapshot() -> dict:
+    """Resumen por etapa: count, p50, p99, max y media en nanosegundos."""
+    return {stage: histogram.summary() for stage, histogram in sorted(_histograms.items())}
+
+def reset() -> None:
+    _histograms.clear()
+
+def render_text() -> str:
+    """Métricas en formato de texto (compatible con Prometheus), latencias en microsegundos."""
+    lines = ['# TYPE pipeline_latency_us summary']
+    for stage, stats in snapshot().items():
+        lines.append(f'pipeline_latency_us{{stage="{stage}",quantile="0.5"}} {stats["p50"] / 1000:.3f}')
+        lines.append(f'pipeline_latency_us{{stage="{stage}",quantile="0.99"}} {stats["p99"] / 1000:.3f}')
+        lines.append(f'pipeline_latency_us_max{{stage="{stage}"}} {stats["max"] / 1000:.3f}')
+        lines.append(f'pipeline_latency_us_count{{stage="{stage}"}} {stats["count"]}')
+    return '\n'.join(lines) + '\n'
+
+def summary_line() -> str:
+    parts = [f"{stage} p50={stats['p50'] / 1000:.0f}us p99={stats['p99'] / 1000:.0f}us max={stats['max'] / 1000:.0f}us"
+             for stage, stats in snapshot().items()]
+    return ' | '.join(parts) or 'no samples'
+
+async def _handle_metrics_request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+        await reader.readuntil(b'\r\n\r\n')
+        body = render_text().encode()
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n'
+                     + f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode() + body)
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+async def serve_metrics(host: str = METRICS_HOST, port: int = METRICS_PORT) -> asyncio.AbstractServer:
+    """Expone render_text() por HTTP en ``http://host:port/metrics``."""
+    server = await asyncio.start_server(_handle_metrics_request, host, port)
+    print_colored(f"Metrics endpoint on http://{host}:{port}/metrics", Colors.BLUE)
+    return server
+
+async def log_summary_periodically(interval: float = METRICS_LOG_INTERVAL) -> None:
+    """Escribe periódicamente un resumen de latencias en el log."""
+    while True:
+        await asyncio.sleep(interval)
+        line = summary_line()
+        logging.info(f"Latency: {line}")
+        print_colored(f"Latency: {line}", Colors.BLUE)
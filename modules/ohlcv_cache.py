@@ -0,0 +1,230 @@
+# ohlcv_cache.py
+import asyncio
+import os
+import time
+import numpy as np
+import pandas as pd
+from .utilities import print_colored, Colors, log_error, timeframe_to_ms
+from .config import OHLCV_CACHE_DIR, OHLCV_PAGE_LIMIT
+from .candle_buffer import CandleBuffer, OHLCV_COLUMNS
+from .data_layer import call_exchange
+
+
+class CachedSeries:
+    """
+    Serie OHLCV de un símbolo y timeframe guardada en disco como un archivo
+    binario por columna (int64/float64). Sólo se añaden velas cerradas y las
+    lecturas usan memory-mapping, así que servir una ventana no carga el archivo.
+    Las velas anteriores (prepend) se escriben en archivos .tmp y se confirman
+    con un archivo de commit, así que un corte nunca deja columnas desalineadas.
+    """
+
+    def __init__(self, path: str, timeframe: str):
+        self.path = path
+        self.timeframe = timeframe
+        self.step = timeframe_to_ms(timeframe)
+        os.makedirs(path, exist_ok=True)
+        self._repair()
+
+    def _file(self, column: str) -> str:
+        return os.path.join(self.path, f"{column}.bin")
+
+    def _commit_file(self) -> str:
+        return os.path.join(self.path, "prepend.commit")
+
+    def _finish_prepend(self) -> None:
+        """Completa un prepend confirmado o descarta uno que quedó a medias."""
+        committed = os.path.exists(self._commit_file())
+        for column in OHLCV_COLUMNS:
+            temp = self._file(column) + '.tmp'
+            if os.path.exists(temp):
+                if committed:
+                    os.replace(temp, self._file(column))
+                else:
+                    os.remove(temp)
+        if committed:
+            os.remove(self._commit_file())
+
+    def _repair(self) -> None:
+        """Termina o descarta un prepend interrumpido y trunca las columnas a la longitud común si un append quedó a medias."""
+        self._finish_prepend()
+        sizes = [os.path.getsize(self._file(c)) // 8 if os.path.exists(self._file(c)) else 0 for c in OHLCV_COLUMNS]
+        count = min(sizes)
+        for column, size in zip(OHLCV_COLUMNS, sizes):
+            if size != count or not os.path.exists(self._file(column)):
+                with open(self._file(column), 'ab') as f:
+                    f.truncate(count * 8)
+        self.count = count
+
+    def _map(self, column: str, start: int, stop: int) -> np.ndarray:
+        dtype = np.int64 if column == 'timestamp' else np.float64
+        if stop <= start:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(column), dtype=dtype, mode='r', offset=start * 8, shape=(stop - start,))
+
+    @property
+    def first_timestamp(self):
+        return int(self._map('timestamp', 0, 1)[0]) if self.count else None
+
+    @property
+    def last_timestamp(self):
+        return int(self._map('timestamp', self.count - 1, self.count)[0]) if self.count else None
+
+    def append(self, rows) -> int:
+        """Añade velas posteriores a la última guardada. Retorna cuántas se escribieron."""
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+        if self.count:
+            rows = rows[rows[:, 0] > self.last_timestamp]
+        if not len(rows):
+            return 0
+        for i, column in enumerate(OHLCV_COLUMNS):
+            values = rows[:, i].astype(np.int64 if column == 'timestamp' else np.float64)
+            with open(self._file(column), 'ab') as f:
+                f.write(values.tobytes())
+        self.count += len(rows)
+        return len(rows)
+
+    def prepend(self, rows) -> int:
+        """
+        Añade velas anteriores a la primera guardada reescribiendo las columnas.
+        Todas las columnas nuevas se escriben primero en .tmp; el archivo de commit
+        marca el punto a partir del cual _repair completa el cambio en vez de descartarlo.
+        """
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+        if self.count:
+            rows = rows[rows[:, 0] < self.first_timestamp]
+        if not len(rows):
+            return 0
+        for i, column in enumerate(OHLCV_COLUMNS):
+            values = rows[:, i].astype(np.int64 if column == 'timestamp' else np.float64)
+            with open(self._file(column) + '.tmp', 'wb') as f:
+                f.write(values.tobytes())
+                f.write(np.asarray(self._map(column, 0, self.count)).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        with open(self._commit_file(), 'wb') as f:
+            os.fsync(f.fileno())
+        self._finish_prepend()
+        self.count += len(rows)
+        return len(rows)
+
+    def window(self, depth: int = None) -> dict:
+        """Últimas ``depth`` velas (todas si es None) como arrays memory-mapped por columna."""
+        start = 0 if depth is None else max(self.count - depth, 0)
+        return {column: self._map(column, start, self.count) for column in OHLCV_COLUMNS}
+
+    def fill_buffer(self, buffer: CandleBuffer, depth: int = None) -> None:
+        """Carga en el buffer las últimas velas de la serie (como máximo su capacidad)."""
+        columns = self.window(min(depth or buffer.capacity, buffer.capacity))
+        buffer.extend(np.column_stack([columns[c] for c in OHLCV_COLUMNS]))
+
+    def frame(self, start: int = None, end: int = None) -> pd.DataFrame:
+        """DataFrame de la serie (o del rango de timestamps indicado) para backtests."""
+        columns = self.window()
+        lo = 0 if start is None else int(np.searchsorted(columns['timestamp'], start, 'left'))
+        hi = self.count if end is None else int(np.searchsorted(columns['timestamp'], end, 'right'))
+        df = pd.DataFrame({c: columns[c][lo:hi] for c in OHLCV_COLUMNS})
+        df.index = pd.to_datetime(df['timestamp'], unit='ms', utc=True)
+        return df
+
+    def _closed(self, page: list) -> np.ndarray:
+        """Filtra la vela en curso: sólo se guardan velas cerradas."""
+        rows = np.asarray(page, dtype=np.float64).reshape(-1, len(OHLCV_COLUMNS))
+        return rows[rows[:, 0] + self.step <= time.time() * 1000]
+
+    def _missing_since(self, depth: int) -> int:
+        if self.count:
+            return self.last_timestamp + self.step
+        now = int(time.time() * 1000) // self.step * self.step
+        return now - depth * self.step
+
+    def _caught_up(self, since: int) -> bool:
+        return since + self.step > time.time() * 1000
+
+
+class OHLCVCache:
+    """
+    Cache local de velas por exchange, símbolo y timeframe. Al sincronizar sólo
+    descarga el rango que falta desde el último timestamp guardado, paginando.
+    """
+
+    def __init__(self, root: str = OHLCV_CACHE_DIR, exchange_id: str = 'binanceus', page_limit: int = OHLCV_PAGE_LIMIT):
+        self.root = root
+        self.exchange_id = exchange_id
+        self.page_limit = page_limit
+        self._series = {}
+
+    def series(self, symbol: str, timeframe: str) -> CachedSeries:
+        key = (symbol, timeframe)
+        if key not in self._series:
+            path = os.path.join(self.root, self.exchange_id, f"{symbol.replace('/', '')}_{timeframe}")
+            self._series[key] = CachedSeries(path, timeframe)
+        return self._series[key]
+
+    async def update_async(self, exchange, symbol: str, timeframe: str, depth: int = OHLCV_PAGE_LIMIT) -> int:
+        """
+        Descarga las velas cerradas que faltan desde la última guardada y, si la
+        serie tiene menos de ``depth`` velas, pagina hacia atrás hasta completarlas.
+        Retorna el número de velas añadidas.
+        """
+        series = self.series(symbol, timeframe)
+        since = series._missing_since(depth)
+        added = 0
+        while not series._caught_up(since):
+            page = await call_exchange(exchange, 'fetch_ohlcv', symbol, timeframe=timeframe,
+                                       since=since, limit=self.page_limit)
+            if not page:
+                break
+            added += series.append(series._closed(page))
+            since = int(page[-1][0]) + series.step
+            if len(page) < self.page_limit:
+                break
+        if 0 < series.count < depth:
+            added += await self.backfill_async(exchange, symbol, timeframe,
+                                               series.first_timestamp - (depth - series.count) * series.step)
+        return added
+
+    async def backfill_async(self, exchange, symbol: str, timeframe: str, since: int) -> int:
+        """Pagina hacia atrás desde ``since`` (ms) hasta la primera vela guardada."""
+        series = self.series(symbol, timeframe)
+        if not series.count:
+            return await self.update_async(exchange, symbol, timeframe,
+                                           depth=(int(time.time() * 1000) - since) // series.step + 1)
+        end = series.first_timestamp
+        pages = []
+        cursor = since
+        try:
+            while cursor < end:
+                page = await call_exchange(exchange, 'fetch_ohlcv', symbol, timeframe=timeframe,
+                                           since=cursor, limit=self.page_limit)
+                if not page:
+                    break
+                pages.append(np.asarray(page, dtype=np.float64))
+                cursor = int(page[-1][0]) + series.step
+                if len(page) < self.page_limit:
+                    break
+            return series.prepend(np.concatenate(pages)) if pages else 0
+        except Exception as e:
+            print_colored(f"Error backfilling {symbol} {timeframe}: {str(e)}", Colors.RED)
+            log_error(e, "OHLCV Cache Backfill Error")
+            return 0
+
+    @staticmethod
+    def require_sync_context() -> None:
+        """Las versiones síncronas usan asyncio.run: dentro de un event loop en marcha hay que usar las _async."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        raise RuntimeError("OHLCVCache.update/backfill cannot run inside a running event loop; "
+                           "await update_async/backfill_async instead")
+
+    def update(self, exchange, symbol: str, timeframe: str, depth: int = OHLCV_PAGE_LIMIT) -> int:
+        """Versión síncrona de update_async, para usar fuera del event loop."""
+        self.require_sync_context()
+        return asyncio.run(self.update_async(exchange, symbol, timeframe, depth))
+
+    def backfill(self, exchange, symbol: str, timeframe: str, since: int) -> int:
+        """Versión síncrona de backfill_async, para usar fuera del event loop."""
+        self.require_sync_context()
+        return asyncio.run(self.backfill_async(exchange, symbol, timeframe, since))
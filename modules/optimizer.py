@@ -0,0 +1,170 @@
+# optimizer.py
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from .utilities import print_colored, Colors
+from .config import (TAKE_PROFIT, STOP_LOSS, PRICE_DEVIATION, ORDER_MULTIPLIER, MAX_DCA_ORDERS,
+                     RSI_BUY_THRESHOLD, EMA_BUY_FACTOR, EMA_SELL_FACTOR)
+from .candle_buffer import OHLCV_COLUMNS
+from .backtest import load_candles, compute_indicators, compute_signals, run_backtest, INDICATOR_PARAMS
+
+METRICS = ('final_equity', 'realized_pnl', 'fees', 'trades', 'win_rate', 'max_drawdown', 'seconds')
+
+# Espacio por defecto alrededor de los valores de config.py
+DEFAULT_SPACE = {
+    'take_profit': [None, TAKE_PROFIT / 2, TAKE_PROFIT],
+    'stop_loss': [None, STOP_LOSS / 2, STOP_LOSS],
+    'price_deviation': [PRICE_DEVIATION / 2, PRICE_DEVIATION, PRICE_DEVIATION * 2],
+    'order_multiplier': [1.5, 2.0, ORDER_MULTIPLIER],
+    'max_dca_orders': [2, 3, MAX_DCA_ORDERS],
+    'rsi_threshold': [45, 50, RSI_BUY_THRESHOLD, 60],
+    'ema_buy_factor': [0.99, EMA_BUY_FACTOR, 1.0],
+    'ema_sell_factor': [1.0, EMA_SELL_FACTOR, 1.01],
+}
+
+# Estado de cada proceso del pool y juegos de ventanas cuyos indicadores se conservan
+_worker = {}
+INDICATOR_CACHE_SIZE = 4
+
+
+def grid(space: dict) -> list:
+    """Todas las combinaciones de un espacio ``{parámetro: [valores]}``."""
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def random_search(space: dict, samples: int, seed: int = 0) -> list:
+    """
+    Muestras aleatorias del espacio: las listas se muestrean como valores discretos
+    y las tuplas ``(mínimo, máximo)`` como rangos uniformes (enteros si ambos lo son).
+    """
+    rng = random.Random(seed)
+    combos = []
+    for _ in range(samples):
+        combo = {}
+        for name in sorted(space):
+            values = space[name]
+            if isinstance(values, tuple):
+                low, high = values
+                combo[name] = rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) \
+                    else rng.uniform(low, high)
+            else:
+                combo[name] = rng.choice(values)
+        combos.append(combo)
+    return combos
+
+def combo_key(params: dict) -> str:
+    """Clave estable de una combinación para reanudar barridos."""
+    return json.dumps(params, sort_keys=True, default=str)
+
+def _share_candles(df: pd.DataFrame):
+    """Copia las velas una única vez a memoria compartida para que los procesos no las reciban serializadas."""
+    values = df[list(OHLCV_COLUMNS)].to_numpy(dtype=np.float64)
+    segment = shared_memory.SharedMemory(create=True, size=values.nbytes)
+    np.ndarray(values.shape, dtype=np.float64, buffer=segment.buf)[:] = values
+    return segment, values.shape
+
+def _attach(name: str, shape: tuple) -> None:
+    """Inicializador del pool: mapea las velas compartidas sin copiarlas."""
+    segment = shared_memory.SharedMemory(name=name)
+    values = np.ndarray(shape, dtype=np.float64, buffer=segment.buf)
+    df = pd.DataFrame(values, columns=list(OHLCV_COLUMNS), copy=False)
+    df.index = pd.to_datetime(values[:, 0].astype(np.int64), unit='ms', utc=True)
+    _worker.update(segment=segment, df=df, indicators={})
+
+def _evaluate(params: dict) -> dict:
+    """Ejecuta un backtest en el proceso del pool, reutilizando los indicadores por juego de ventanas."""
+    start = time.perf_counter()
+    windows = {k: v for k, v in params.items() if k in INDICATOR_PARAMS}
+    window_key = combo_key(windows)
+    indicators = _worker['indicators'].get(window_key)
+    if indicators is None:
+        if len(_worker['indicators']) >= INDICATOR_CACHE_SIZE:
+            _worker['indicators'].pop(next(iter(_worker['indicators'])))
+        indicators = compute_indicators(_worker['df'], **windows)
+        _worker['indicators'][window_key] = indicators
+    signals = compute_signals(indicators, **params)
+    summary = run_backtest(indicators, signals=signals, **params)['summary']
+    result = dict(params, key=combo_key(params))
+    result.update({metric: summary.get(metric) for metric in METRICS})
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def _completed(path: str) -> set:
+    if not os.path.exists(path):
+        return set()
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['key'] for row in csv.DictReader(f)}
+
+def optimize(df: pd.DataFrame, combos: list, results_path: str, workers: int = None, chunksize: int = 4) -> int:
+    """
+    Evalúa las combinaciones en un pool de procesos y añade cada resultado al CSV
+    ``results_path`` según termina. Las combinaciones ya presentes en el archivo se
+    omiten, así que un barrido interrumpido se reanuda relanzando el mismo comando.
+    Retorna el número de combinaciones evaluadas.
+    """
+    done = _completed(results_path)
+    pending = [params for params in combos if combo_key(params) not in done]
+    if not pending:
+        print_colored("Nothing to evaluate: all combinations already in results", Colors.YELLOW)
+        return 0
+    # Ordenar por ventanas agrupa las combinaciones que comparten indicadores en cada proceso
+    pending.sort(key=lambda params: combo_key({k: v for k, v in params.items() if k in INDICATOR_PARAMS}))
+    columns = ['key'] + sorted({name for params in combos for name in params}) + list(METRICS)
+    segment, shape = _share_candles(df)
+    evaluated = 0
+    start = time.perf_counter()
+    try:
+        new_file = not os.path.exists(results_path)
+        with open(results_path, 'a', newline='', encoding='utf-8') as f, \
+                ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(segment.name, shape)) as pool:
+            writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            for result in pool.map(_evaluate, pending, chunksize=chunksize):
+                writer.writerow(result)
+                f.flush()
+                evaluated += 1
+                if evaluated % 100 == 0:
+                    rate = evaluated / (time.perf_counter() - start)
+                    print_colored(f"{evaluated}/{len(pending)} combinations ({rate:.1f}/s)", Colors.BLUE)
+    finally:
+        segment.close()
+        segment.unlink()
+    return evaluated
+
+def load_results(path: str, sort_by: str = 'final_equity', ascending: bool = False) -> pd.DataFrame:
+    """Resultados de un barrido ordenados por la métrica indicada."""
+    return pd.read_csv(path).sort_values(sort_by, ascending=ascending)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Barrido paralelo de parámetros de la estrategia")
+    parser.add_argument('path', help="Velas OHLCV en CSV o Parquet")
+    parser.add_argument('--results', default='optimizer_results.csv')
+    parser.add_argument('--space', help="JSON con el espacio de búsqueda (por defecto DEFAULT_SPACE)")
+    parser.add_argument('--samples', type=int, help="Búsqueda aleatoria con N muestras en lugar de grid")
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    space = DEFAULT_SPACE
+    if args.space:
+        # Listas: valores discretos; objetos {"min": a, "max": b}: rangos para la búsqueda aleatoria
+        with open(args.space, encoding='utf-8') as f:
+            space = {name: (values['min'], values['max']) if isinstance(values, dict) else values
+                     for name, values in json.load(f).items()}
+    combos = random_search(space, args.samples, args.seed) if args.samples else grid(space)
+    df = load_candles(args.path)
+    print_colored(f"\n=== OPTIMIZING {len(combos)} combinations over {len(df)} candles ===", Colors.BLUE)
+    optimize(df, combos, args.results, workers=args.workers)
+    best = load_results(args.results).head(10)
+    print_colored(best.drop(columns=['key']).to_string(index=False), Colors.GREEN)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+# order_book.py
+import asyncio
+import bisect
+import json
+import time
+import websockets
+from .utilities import print_colored, Colors, log_error
+from .config import WS_BASE_URL, ORDER_BOOK_DEPTH, ORDER_BOOK_MAX_AGE, ORDER_BOOK_BUFFER
+from .data_layer import call_exchange
+from . import metrics
+
+
+class _BookSide:
+    """
+    Niveles de precio de un lado del libro: un dict precio -> cantidad y una
+    lista ordenada de claves (``-precio`` en bids) mantenida con bisect, de modo
+    que el mejor nivel siempre es ``keys[0]``.
+    """
+
+    __slots__ = ('sign', 'keys', 'levels')
+
+    def __init__(self, descending: bool):
+        self.sign = -1.0 if descending else 1.0
+        self.keys = []
+        self.levels = {}
+
+    def clear(self) -> None:
+        self.keys.clear()
+        self.levels.clear()
+
+    def set(self, price: float, amount: float) -> None:
+        key = self.sign * price
+        if amount == 0:
+            if self.levels.pop(price, None) is not None:
+                del self.keys[bisect.bisect_left(self.keys, key)]
+        else:
+            if price not in self.levels:
+                bisect.insort(self.keys, key)
+            self.levels[price] = amount
+
+    def best(self):
+        return self.sign * self.keys[0] if self.keys else None
+
+    def top(self, levels: int) -> list:
+        return [(self.sign * key, self.levels[self.sign * key]) for key in self.keys[:levels]]
+
+    def available(self, limit_price: float) -> float:
+        """Cantidad acumulada en los niveles iguales o mejores que ``limit_price``."""
+        stop = bisect.bisect_right(self.keys, self.sign * limit_price)
+        return sum(self.levels[self.sign * key] for key in self.keys[:stop])
+
+    def trim(self, depth: int) -> None:
+        for key in self.keys[depth:]:
+            del self.levels[self.sign * key]
+        del self.keys[depth:]
+
+
+class OrderBook:
+    """
+    Libro L2 local de un símbolo mantenido con el protocolo de Binance: snapshot
+    REST (``lastUpdateId``) más el stream de diferencias, cuyos eventos llevan
+    el rango de ids ``U``..``u``. Los eventos recibidos antes del snapshot se
+    guardan y se aplican después; un hueco en la secuencia marca el libro como
+    no sincronizado hasta el siguiente snapshot.
+    """
+
+    def __init__(self, symbol: str, depth: int = ORDER_BOOK_DEPTH):
+        self.symbol = symbol
+        self.depth = depth
+        self.bids = _BookSide(descending=True)
+        self.asks = _BookSide(descending=False)
+        self.last_update_id = None
+        self.updated = 0.0
+        self.snapshot_pending = False
+        self._buffer = []
+
+    @property
+    def synced(self) -> bool:
+        return self.last_update_id is not None
+
+    @property
+    def needs_snapshot(self) -> bool:
+        return not self.synced and not self.snapshot_pending
+
+    def reset(self) -> None:
+        """Descarta el estado; el libro queda esperando un snapshot nuevo."""
+        self.bids.clear()
+        self.asks.clear()
+        self.last_update_id = None
+        self.snapshot_pending = False
+        self._buffer.clear()
+
+    def apply_snapshot(self, snapshot: dict) -> bool:
+        """
+        Carga un snapshot (formato ccxt ``nonce`` o Binance ``lastUpdateId``) y
+        aplica los eventos guardados. Retorna False si los eventos no enlazan con
+        el snapshot y hace falta pedir otro.
+        """
+        buffered = self._buffer
+        self._buffer = []
+        self.reset()
+        last_update_id = int(snapshot.get('lastUpdateId') or snapshot['nonce'])
+        for price, amount in snapshot['bids'][:self.depth]:
+            self.bids.set(float(price), float(amount))
+        for price, amount in snapshot['asks'][:self.depth]:
+            self.asks.set(float(price), float(amount))
+        self.last_update_id = last_update_id
+        self.updated = time.monotonic()
+        for event in buffered:
+            if not self.apply_event(event):
+                return False
+        return True
+
+    def apply_event(self, event: dict) -> bool:
+        """
+        Aplica un evento ``depthUpdate``. Sin snapshot el evento se guarda. Retorna
+        False si se detecta un hueco de secuencia (el libro se reinicia).
+        """
+        if not self.synced:
+            self._buffer.append(event)
+            del self._buffer[:-ORDER_BOOK_BUFFER]
+            return True
+        first, final = int(event['U']), int(event['u'])
+        if final <= self.last_update_id:
+            return True
+        if first > self.last_update_id + 1:
+            print_colored(f"Order book gap on {self.symbol}: expected {self.last_update_id + 1}, got {first}",
+                          Colors.YELLOW)
+            self.reset()
+            return False
+        for price, amount in event['b']:
+            self.bids.set(float(price), float(amount))
+        for price, amount in event['a']:
+            self.asks.set(float(price), float(amount))
+        self.last_update_id = final
+        self.updated = time.monotonic()
+        if len(self.bids.keys) > 2 * self.depth or len(self.asks.keys) > 2 * self.depth:
+            self.trim()
+        return True
+
+    def trim(self) -> None:
+        """Limita cada lado a ``depth`` niveles."""
+        self.bids.trim(self.depth)
+        self.asks.trim(self.depth)
+
+    def best_bid(self):
+        return self.bids.best()
+
+    def best_ask(self):
+        return self.asks.best()
+
+    def mid(self):
+        bid, ask = self.bids.best(), self.asks.best()
+        return (bid + ask) / 2 if bid is not None and ask is not None else None
+
+    def fresh(self, max_age: float = ORDER_BOOK_MAX_AGE) -> bool:
+        """Sincronizado, con ambos lados y actualizado hace menos de ``max_age`` segundos."""
+        return bool(self.synced and self.bids.keys and self.asks.keys
+                    and time.monotonic() - self.updated <= max_age)
+
+    def available(self, side: str, limit_price: float) -> float:
+        """
+        Cantidad disponible hasta ``limit_price``: en asks para una compra y en
+        bids para una venta.
+        """
+        return (self.asks if side == 'buy' else self.bids).available(limit_price)
+
+    def top(self, levels: int = 5) -> dict:
+        return {'bids': self.bids.top(levels), 'asks': self.asks.top(levels)}
+
+
+def depth_stream_name(symbol: str) -> str:
+    """Nombre del stream de diferencias de profundidad (``ETH/USDT`` -> ``ethusdt@depth@100ms``)."""
+    return f"{symbol.replace('/', '').lower()}@depth@100ms"
+
+async def _load_snapshot(exchange, book: OrderBook) -> None:
+    try:
+        snapshot = await call_exchange(exchange, 'fetch_order_book', book.symbol, limit=book.depth)
+        if book.snapshot_pending and book.apply_snapshot(snapshot):
+            print_colored(f"Order book synced: {book.symbol} @ {book.last_update_id}", Colors.GREEN)
+    except Exception as e:
+        print_colored(f"Error loading order book snapshot ({book.symbol}): {str(e)}", Colors.RED)
+        log_error(e, "Order Book Snapshot Error")
+        await asyncio.sleep(1)
+    finally:
+        book.snapshot_pending = False
+
+async def maintain_order_books(exchange, books: dict, base_url: str = WS_BASE_URL) -> None:
+    """
+    Mantiene sincronizados los libros ``{símbolo: OrderBook}`` con una única
+    conexión de streams combinados. Pide un snapshot por símbolo al conectar y
+    cada vez que se detecta un hueco, sin cerrar el socket.
+    """
+    routes = {depth_stream_name(symbol): book for symbol, book in books.items()}
+    url = f"{base_url}/stream?streams={'/'.join(routes)}"
+    reconnect_delay = 5
+    snapshots = set()
+    while True:
+        try:
+            print_colored(f"Connecting to depth WebSocket ({len(routes)} streams)", Colors.BLUE)
+            async with websockets.connect(url) as ws:
+                reconnect_delay = 5
+                for book in books.values():
+                    book.reset()
+                async for msg in ws:
+                    with metrics.span('order_book'):
+                        parsed = json.loads(msg)
+                        book = routes.get(parsed.get('stream'))
+                        if book is None:
+                            continue
+                        book.apply_event(parsed['data'])
+                    if book.needs_snapshot:
+                        book.snapshot_pending = True
+                        task = asyncio.create_task(_load_snapshot(exchange, book))
+                        snapshots.add(task)
+                        task.add_done_callback(snapshots.discard)
+        except asyncio.CancelledError:
+            for task in snapshots:
+                task.cancel()
+            raise
+        except Exception as e:
+            log_error(e, "Depth WebSocket Error")
+            print_colored(f"Reconnecting in {reconnect_delay} seconds...", Colors.YELLOW)
+            await asyncio.sleep(reconnect_delay)
+            reconnect_delay = min(reconnect_delay * 2, 60)
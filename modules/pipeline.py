@@ -0,0 +1,177 @@
+# pipeline.py
+import argparse
+import asyncio
+import logging
+from .utilities import print_colored, Colors, log_error, log_signal, setup_logging
+from . import metrics
+from .config import (TRADING_PAIRS, SYMBOL_QUEUE_SIZE, WS_BASE_URL, CANDLE_BUFFER_DEPTH, LOG_FILE,
+                     PROVISIONAL_CANDLES, JOURNAL_FILE)
+from .data_layer import get_historical_data_async, binance_combined_websocket, symbol_stream, SymbolQueue
+from .processing_layer import IncrementalIndicators, update_technical_indicators
+from .analysis_layer import generate_trading_signals
+from .decision_layer import decision_integration, CandleOrderGuard
+from .execution_layer import process_trading_signals
+from .position_store import PositionStore
+from .aggregation import MultiTimeframe
+from .order_book import OrderBook, maintain_order_books
+
+
+async def run_symbol_pipeline(exchange, symbol: str, stream, active_positions: list = None, store=None,
+                              timeframes: MultiTimeframe = None, book: OrderBook = None, state=None) -> None:
+    """
+    Recorre la cadena de capas para cada vela de un símbolo:
+    indicadores -> señales -> decisión -> ejecución.
+    Con ``timeframes`` cada vela confirmada alimenta también los timeframes
+    superiores, disponibles para la estrategia en ``data['timeframes']``.
+    Con ``book`` las órdenes se valoran con el libro local del símbolo.
+    Con ``state`` (BotState) se deja el último estado para el dashboard.
+    """
+    if active_positions is None:
+        active_positions = []
+    engine = IncrementalIndicators(history=CANDLE_BUFFER_DEPTH)
+    guard = CandleOrderGuard()
+    async for data in stream:
+        try:
+            provisional = not data.get('confirmadas', True)
+            if timeframes is not None:
+                if not provisional:
+                    last = data['candles'].last()
+                    timeframes.add_candle(last['timestamp'], last['open'], last['high'], last['low'],
+                                          last['close'], last['volume'])
+                data['timeframes'] = timeframes
+            df = update_technical_indicators(data['candles'].to_frame(), engine, provisional=provisional)
+            signal_data = generate_trading_signals(df, active_positions)
+            signal = guard.filter(data['timestamp'],
+                                  decision_integration(signal_data, active_positions, data['close']))
+            metrics.record_since('tick_to_decision', data.get('received_ns'))
+            if signal:
+                log_signal('BUY' if signal == 1 else 'SELL', signal_data['conditions'])
+            entries = len(active_positions)
+            await process_trading_signals(exchange, signal, data, active_positions, symbol=symbol, store=store,
+                                          book=book)
+            if len(active_positions) != entries:
+                guard.record(data['timestamp'], signal)
+            if state is not None:
+                state.update(symbol, data, df, signal_data, signal, active_positions)
+            if metrics.startup_mark('first_signal'):
+                report = metrics.startup_report()
+                logging.info(f"Startup: {report}")
+                print_colored(f"Startup: {report}", Colors.BLUE)
+        except Exception as e:
+            print_colored(f"Pipeline error ({symbol}): {str(e)}", Colors.RED)
+            log_error(e, f"Pipeline Error {symbol}")
+
+async def run_multi_symbol(exchange, symbols: list = None, base_url: str = WS_BASE_URL,
+                           queue_size: int = SYMBOL_QUEUE_SIZE, cache=None, store=None,
+                           provisional: bool = PROVISIONAL_CANDLES, timeframes: list = None,
+                           order_books: bool = False, state=None) -> None:
+    """
+    Ejecuta un pipeline por símbolo como tarea asyncio independiente, alimentados
+    todos por una única conexión de streams combinados con colas acotadas por símbolo.
+    Con ``store`` las posiciones abiertas se restauran del PositionStore al
+    arrancar, tras reconciliar las órdenes abiertas con el exchange.
+    Con ``provisional`` también se evalúa la vela en curso (ver symbol_stream).
+    Con ``timeframes`` (p. ej. ``['15m', '1h', '4h']``) cada símbolo agrega
+    localmente esos timeframes desde el stream base; su historial se deriva
+    de la serie base del cache si existe o del buffer cargado.
+    Con ``order_books`` se mantiene un libro L2 por símbolo (una conexión de
+    profundidad compartida) y las órdenes se valoran con él.
+    Con ``state`` cada pipeline actualiza el BotState que publica el bot.
+    """
+    symbols = symbols or TRADING_PAIRS
+    positions = {}
+    # Historial de todos los símbolos y reconciliación en paralelo (el RequestScheduler reparte el peso)
+    reconcile = asyncio.ensure_future(store.reconcile(exchange)) if store is not None else None
+    histories = await asyncio.gather(*(get_historical_data_async(exchange, symbol, cache=cache)
+                                       for symbol in symbols))
+    metrics.startup_mark('history')
+    if reconcile is not None:
+        report = await reconcile
+        positions = store.load()
+        restored = sum(len(entries) for symbol, entries in positions.items() if symbol in symbols)
+        print_colored(f"Restored {restored} open entries ({report['open']} open orders, "
+                      f"{len(report['closed'])} closed since last run)", Colors.BLUE)
+    pipelines = []
+    queues = {}
+    books = {}
+    for symbol, historical_data in zip(symbols, histories):
+        if historical_data is None:
+            print_colored(f"Skipping {symbol}: no historical data", Colors.YELLOW)
+            continue
+        aggregated = None
+        if timeframes:
+            aggregated = MultiTimeframe(timeframes=timeframes)
+            if cache is not None:
+                await cache.update_async(exchange, symbol, aggregated.base_timeframe, depth=aggregated.bootstrap_depth())
+                aggregated.bootstrap_from_series(cache.series(symbol, aggregated.base_timeframe))
+            else:
+                aggregated.bootstrap_from_buffer(historical_data['candles'])
+        if order_books:
+            books[symbol] = OrderBook(symbol)
+        queues[symbol] = SymbolQueue(maxsize=queue_size)
+        stream = symbol_stream(historical_data, queues[symbol])
+        pipelines.append(asyncio.create_task(run_symbol_pipeline(exchange, symbol, stream, positions.get(symbol), store,
+                                                                 aggregated, books.get(symbol), state),
+                                             name=symbol))
+    if not queues:
+        print_colored("No symbols to stream", Colors.RED)
+        return
+    router = asyncio.create_task(binance_combined_websocket(list(queues), queues, base_url, provisional), name='router')
+    tasks = [router, *pipelines]
+    if books:
+        tasks.append(asyncio.create_task(maintain_order_books(exchange, books, base_url), name='order_books'))
+    metrics_server = None
+    if metrics.enabled():
+        try:
+            metrics_server = await metrics.serve_metrics()
+        except OSError as e:
+            print_colored(f"Metrics endpoint unavailable: {str(e)}", Colors.YELLOW)
+        tasks.append(asyncio.create_task(metrics.log_summary_periodically(), name='metrics'))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        if metrics_server is not None:
+            metrics_server.close()
+
+async def _run_simulated(symbols: list, interval: float, store=None, ticks: int = 0, timeframes: list = None,
+                         order_books: bool = False, state=None) -> None:
+    from .simulation import KlineStandInServer, AsyncSimulatedExchange, DepthFeed
+    depth = DepthFeed()
+    async with KlineStandInServer(interval=interval, ticks=ticks, depth=depth) as server:
+        await run_multi_symbol(AsyncSimulatedExchange(depth=depth), symbols, base_url=server.base_url, store=store,
+                               provisional=bool(ticks), timeframes=timeframes, order_books=order_books,
+                               state=state)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pipeline multi-símbolo contra el stand-in local de Binance")
+    parser.add_argument('--symbols', type=int, default=50, help="Número de pares sintéticos")
+    parser.add_argument('--interval', type=float, default=0.5, help="Segundos entre velas simuladas")
+    parser.add_argument('--metrics', action='store_true', help="Activa las trazas de latencia y el endpoint /metrics")
+    parser.add_argument('--journal', nargs='?', const=JOURNAL_FILE,
+                        help="Guarda operaciones y señales en el diario binario (por defecto JOURNAL_FILE)")
+    parser.add_argument('--positions', help="Persiste las posiciones en esta base SQLite y las restaura al arrancar")
+    parser.add_argument('--ticks', type=int, default=0,
+                        help="Actualizaciones provisionales por vela; activa la evaluación de la vela en curso")
+    parser.add_argument('--timeframes', help="Timeframes agregados localmente, separados por comas (p. ej. 15m,1h,4h)")
+    parser.add_argument('--order-books', action='store_true', help="Valora las órdenes con un libro L2 local")
+    args = parser.parse_args()
+    metrics.startup_mark('imports')
+    if args.metrics:
+        metrics.enable()
+    if args.journal:
+        setup_logging(LOG_FILE, args.journal)
+    symbols = [f"SIM{i}/USDT" for i in range(args.symbols)]
+    store = PositionStore(args.positions) if args.positions else None
+    try:
+        asyncio.run(_run_simulated(symbols, args.interval, store, args.ticks,
+                                   args.timeframes.split(',') if args.timeframes else None, args.order_books))
+    except KeyboardInterrupt:
+        print_colored("Stopped", Colors.YELLOW)
+    finally:
+        if store is not None:
+            store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# position_store.py
+import asyncio
+import sqlite3
+import time
+from .utilities import print_colored, Colors, log_error
+from .config import POSITION_DB
+from .data_layer import call_exchange
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS positions (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    entry_price REAL NOT NULL,
+    base_amount REAL NOT NULL,
+    quote_amount REAL NOT NULL,
+    order_id TEXT,
+    opened_at REAL NOT NULL,
+    closed_at REAL
+);
+CREATE INDEX IF NOT EXISTS open_positions ON positions(symbol) WHERE closed_at IS NULL;
+CREATE TABLE IF NOT EXISTS orders (
+    id TEXT PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    amount REAL,
+    price REAL,
+    filled REAL,
+    status TEXT,
+    updated_at REAL NOT NULL,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS open_orders ON orders(symbol) WHERE status = 'open';
+"""
+
+
+class PositionStore:
+    """
+    Estado durable de las entradas DCA y de las órdenes en SQLite (modo WAL).
+    Cada entrada o cierre se guarda junto con su orden en una única transacción,
+    así que tras un reinicio ``load`` reconstruye ``active_positions``; antes,
+    ``reconcile`` ajusta las entradas cuya compra no se llenó entera.
+    """
+
+    def __init__(self, path: str = POSITION_DB):
+        self.path = path
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        # Bases creadas antes de guardar la hora de alta de cada orden
+        if 'created_at' not in {row[1] for row in self._conn.execute("PRAGMA table_info(orders)")}:
+            self._conn.execute("ALTER TABLE orders ADD COLUMN created_at REAL")
+
+    def _transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+        return self._conn
+
+    def _upsert_order(self, conn, symbol: str, side: str, order: dict, now: float) -> None:
+        if not order or order.get('id') is None:
+            return
+        conn.execute(
+            "INSERT INTO orders (id, symbol, side, amount, price, filled, status, updated_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+            "filled = excluded.filled, status = excluded.status, updated_at = excluded.updated_at",
+            (str(order['id']), symbol, side, order.get('amount'), order.get('price'),
+             order.get('filled'), order.get('status') or 'open', now, now))
+
+    def record_entry(self, symbol: str, position: dict, order: dict = None) -> None:
+        """Guarda una nueva entrada DCA y la orden de compra que la abrió."""
+        now = time.time()
+        with self._transaction() as conn:
+            self._upsert_order(conn, symbol, 'buy', order, now)
+            conn.execute(
+                "INSERT INTO positions (symbol, entry_price, base_amount, quote_amount, order_id, opened_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (symbol, position['entry_price'], position['base_amount'], position['quote_amount'],
+                 str(order['id']) if order and order.get('id') is not None else None, now))
+
+    def record_exit(self, symbol: str, order: dict = None) -> int:
+        """Cierra todas las entradas abiertas del símbolo junto con la orden de venta. Retorna cuántas cerró."""
+        now = time.time()
+        with self._transaction() as conn:
+            self._upsert_order(conn, symbol, 'sell', order, now)
+            return conn.execute("UPDATE positions SET closed_at = ? WHERE symbol = ? AND closed_at IS NULL",
+                                (now, symbol)).rowcount
+
+    def record_fills(self, orders: list) -> None:
+        """
+        Actualiza estado y cantidad llenada de órdenes ya registradas. Las
+        entradas de compras terminadas (no abiertas) pasan a la cantidad
+        realmente llenada: se reducen si se llenó una parte y se borran si no
+        se llenó nada.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("UPDATE orders SET filled = COALESCE(?, filled), status = ?, updated_at = ? WHERE id = ?",
+                             [(order.get('filled'), order.get('status') or 'open', now, str(order['id']))
+                              for order in orders])
+            for order in orders:
+                if (order.get('status') or 'open') == 'open' or order.get('filled') is None:
+                    continue
+                order_id, filled = str(order['id']), float(order['filled'])
+                if filled <= 0:
+                    conn.execute("DELETE FROM positions WHERE order_id = ? AND closed_at IS NULL", (order_id,))
+                else:
+                    conn.execute("UPDATE positions SET quote_amount = quote_amount * ? / base_amount, base_amount = ? "
+                                 "WHERE order_id = ? AND closed_at IS NULL AND base_amount > ?",
+                                 (filled, filled, order_id, filled))
+
+    def load(self, symbol: str = None) -> dict:
+        """Entradas abiertas por símbolo, en el orden en que se abrieron, con el formato de ``active_positions``."""
+        query = "SELECT symbol, entry_price, base_amount, quote_amount FROM positions WHERE closed_at IS NULL"
+        args = ()
+        if symbol is not None:
+            query += " AND symbol = ?"
+            args = (symbol,)
+        positions = {}
+        for row_symbol, entry_price, base_amount, quote_amount in self._conn.execute(query + " ORDER BY id", args):
+            positions.setdefault(row_symbol, []).append(
+                {'entry_price': entry_price, 'base_amount': base_amount, 'quote_amount': quote_amount})
+        return positions
+
+    def open_orders(self) -> dict:
+        """Órdenes que el store considera abiertas, por id, con su hora de alta (s)."""
+        rows = self._conn.execute("SELECT id, symbol, side, COALESCE(created_at, updated_at) FROM orders "
+                                  "WHERE status = 'open'")
+        return {order_id: {'symbol': symbol, 'side': side, 'created_at': created_at}
+                for order_id, symbol, side, created_at in rows}
+
+    async def _resolve(self, exchange, symbol: str, order_ids: list, since: float) -> dict:
+        """Estado real de órdenes que ya no están abiertas: una llamada a ``fetch_orders`` por símbolo."""
+        try:
+            orders = await call_exchange(exchange, 'fetch_orders', symbol, since=int(since * 1000) - 60000)
+        except Exception as e:
+            print_colored(f"Error resolving orders for {symbol}: {str(e)}", Colors.RED)
+            log_error(e, "Position Store Reconcile Error")
+            return {}
+        wanted = set(order_ids)
+        return {str(order['id']): order for order in orders if str(order['id']) in wanted}
+
+    async def reconcile(self, exchange) -> dict:
+        """
+        Contrasta las órdenes abiertas guardadas con las del exchange: una
+        llamada a ``fetch_open_orders`` para todos los símbolos y, para las que
+        ya no están abiertas, una a ``fetch_orders`` por símbolo desde la más
+        antigua. Se guardan su estado y cantidad llenada reales y las entradas
+        de compras canceladas o llenadas a medias se borran o reducen (ver
+        record_fills), así que ``load`` ya devuelve lo comprado de verdad. Las
+        que no aparecen siguen abiertas (``unresolved``) y se reintentan en el
+        próximo arranque; las abiertas en el exchange que el store no conoce se
+        reportan en ``unknown``.
+        """
+        try:
+            remote = await call_exchange(exchange, 'fetch_open_orders')
+        except Exception as e:
+            print_colored(f"Error reconciling open orders: {str(e)}", Colors.RED)
+            log_error(e, "Position Store Reconcile Error")
+            return {'open': 0, 'closed': [], 'unknown': [], 'unresolved': []}
+        local = self.open_orders()
+        remote = {str(order['id']): order for order in remote}
+        symbols = {order['symbol'] for order in local.values()} | set(self.load())
+        missing = {}
+        for order_id, order in local.items():
+            if order_id not in remote:
+                missing.setdefault(order['symbol'], []).append(order_id)
+        resolved = {}
+        for found in await asyncio.gather(*(self._resolve(exchange, symbol, order_ids,
+                                                          min(local[order_id]['created_at'] for order_id in order_ids))
+                                            for symbol, order_ids in missing.items())):
+            resolved.update(found)
+        unresolved = [order_id for order_ids in missing.values() for order_id in order_ids if order_id not in resolved]
+        unknown = [order_id for order_id, order in remote.items()
+                   if order_id not in local and order.get('symbol') in symbols]
+        self.record_fills([dict(remote[order_id], id=order_id) for order_id in local if order_id in remote]
+                          + [dict(order, id=order_id) for order_id, order in resolved.items()])
+        if unresolved:
+            print_colored(f"Orders not found on the exchange, kept open: {', '.join(unresolved)}", Colors.YELLOW)
+        if unknown:
+            print_colored(f"Open orders not tracked locally: {', '.join(unknown)}", Colors.YELLOW)
+        return {'open': len(local) - len(resolved), 'closed': list(resolved), 'unknown': unknown,
+                'unresolved': unresolved}
+
+    def close(self) -> None:
+        self._conn.close()
@@ -1,49 +1,278 @@
 # processing_layer.py
+import logging
+import math
+from collections import deque
+import numpy as np
 import pandas as pd
-import ta
 import pytz
 from .utilities import print_colored, Colors, log_error
+from .metrics import timed
 
-def calculate_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
+INDICATOR_COLUMNS = ('EMA_9', 'EMA_21', 'MACD', 'MACD_signal', 'RSI', 'BB_upper', 'BB_middle', 'BB_lower')
+
+@timed('indicators')
+def calculate_technical_indicators(df: pd.DataFrame, ema_fast: int = 9, ema_slow: int = 21, macd_fast: int = 12,
+                                   macd_slow: int = 26, macd_sign: int = 9, rsi_window: int = 14,
+                                   bb_window: int = 20, bb_dev: float = 2) -> pd.DataFrame:
     """
     Calcula indicadores técnicos (EMA, MACD, RSI y Bollinger Bands)
-    y los añade al DataFrame.
+    y los añade al DataFrame. Las ventanas pueden variarse para optimizar;
+    las columnas conservan sus nombres (EMA_9 es siempre la EMA rápida).
     """
+    import ta  # sólo el recálculo completo lo usa; el pipeline en vivo arranca sin cargarlo
     try:
         et_tz = pytz.timezone('America/New_York')
         if df.index.tz is None:
             df.index = pd.to_datetime(df.index, unit='ms', utc=True).tz_convert(et_tz)
-        df['EMA_9'] = ta.trend.ema_indicator(close=df['close'], window=9)
-        df['EMA_21'] = ta.trend.ema_indicator(close=df['close'], window=21)
-        macd = ta.trend.MACD(close=df['close'], window_slow=26, window_fast=12, window_sign=9)
+        df['EMA_9'] = ta.trend.ema_indicator(close=df['close'], window=ema_fast)
+        df['EMA_21'] = ta.trend.ema_indicator(close=df['close'], window=ema_slow)
+        macd = ta.trend.MACD(close=df['close'], window_slow=macd_slow, window_fast=macd_fast, window_sign=macd_sign)
         df['MACD'] = macd.macd()
         df['MACD_signal'] = macd.macd_signal()
-        df['RSI'] = ta.momentum.RSIIndicator(close=df['close'], window=14).rsi()
-        bb = ta.volatility.BollingerBands(close=df['close'], window=20, window_dev=2)
+        df['RSI'] = ta.momentum.RSIIndicator(close=df['close'], window=rsi_window).rsi()
+        bb = ta.volatility.BollingerBands(close=df['close'], window=bb_window, window_dev=bb_dev)
         df['BB_upper'] = bb.bollinger_hband()
         df['BB_middle'] = bb.bollinger_mavg()
         df['BB_lower'] = bb.bollinger_lband()
-        print_colored("Indicators calculated successfully", Colors.GREEN)
+        print_colored("Indicators calculated successfully", Colors.GREEN, level=logging.DEBUG)
         return df
     except Exception as e:
         print_colored(f"Error calculating indicators: {str(e)}", Colors.RED)
         log_error(e, "Indicator Calculation Error")
         return df
 
-def verify_macd_calculation(df: pd.DataFrame):
+class _RunningEMA:
+    """EMA recursiva (adjust=False) con el mismo enmascarado de min_periods que ``ta``."""
+
+    def __init__(self, window: int = None, alpha: float = None):
+        self.window = window
+        self.alpha = alpha if alpha is not None else 2.0 / (window + 1)
+        self.value = None
+        self.count = 0
+
+    def peek(self, x: float) -> float:
+        if self.value is None:
+            return x
+        return self.value + self.alpha * (x - self.value)
+
+    def update(self, x: float) -> float:
+        self.value = self.peek(x)
+        self.count += 1
+        return self.value
+
+    def output(self, value: float, count: int) -> float:
+        return value if count >= self.window else math.nan
+
+
+class _RollingStats:
+    """Media y desviación estándar (ddof=0) sobre una ventana fija con sumas acumuladas."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def peek(self, x: float):
+        total, total_sq, n = self.total + x, self.total_sq + x * x, len(self.values) + 1
+        if n > self.window:
+            oldest = self.values[0]
+            total, total_sq, n = total - oldest, total_sq - oldest * oldest, self.window
+        if n < self.window:
+            return math.nan, math.nan
+        mean = total / n
+        return mean, math.sqrt(max(total_sq / n - mean * mean, 0.0))
+
+    def update(self, x: float):
+        result = self.peek(x)
+        if len(self.values) == self.window:
+            oldest = self.values[0]
+            self.total -= oldest
+            self.total_sq -= oldest * oldest
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+        return result
+
+
+class IncrementalIndicators:
+    """
+    Motor de indicadores en streaming. Mantiene el estado de EMA_9/EMA_21, MACD,
+    RSI (Wilder) y Bollinger Bands y lo actualiza en O(1) por vela nueva, con la
+    misma parametrización que calculate_technical_indicators (``ta``).
+    Conserva los últimos ``history`` valores de cada indicador en un buffer
+    circular duplicado (como CandleBuffer) para entregar la ventana como vista
+    contigua, sin recalcular ni copiar valor a valor.
+    """
+
+    def __init__(self, history: int = 50):
+        self.history = history
+        self.last_timestamp = None
+        self.count = 0
+        self._ema9 = _RunningEMA(9)
+        self._ema21 = _RunningEMA(21)
+        self._ema12 = _RunningEMA(12)
+        self._ema26 = _RunningEMA(26)
+        self._signal = _RunningEMA(9)
+        self._rsi_up = _RunningEMA(14, alpha=1 / 14)
+        self._rsi_down = _RunningEMA(14, alpha=1 / 14)
+        self._bb = _RollingStats(20)
+        self._prev_close = None
+        self._values = np.full((len(INDICATOR_COLUMNS), 2 * history), np.nan)
+        self._head = 0  # Próxima posición de escritura en [0, history)
+        self._size = 0
+
+    def bootstrap(self, timestamps, closes) -> None:
+        """Inicializa el estado recorriendo una única vez la ventana histórica."""
+        for timestamp, close in zip(timestamps, closes):
+            self.update(int(timestamp), float(close))
+
+    def _compute(self, close: float, commit: bool) -> dict:
+        count = self.count + 1
+        step = 'update' if commit else 'peek'
+        ema9 = getattr(self._ema9, step)(close)
+        ema21 = getattr(self._ema21, step)(close)
+        ema12 = getattr(self._ema12, step)(close)
+        ema26 = getattr(self._ema26, step)(close)
+
+        # MACD: la señal sólo empieza a acumular cuando la línea MACD es válida
+        macd = ema12 - ema26 if count >= self._ema26.window else math.nan
+        signal = math.nan
+        if not math.isnan(macd):
+            signal = getattr(self._signal, step)(macd)
+            signal_count = self._signal.count if commit else self._signal.count + 1
+            signal = self._signal.output(signal, signal_count)
+
+        # RSI de Wilder: el primer diff es NaN y ``ta`` lo trata como 0
+        diff = 0.0 if self._prev_close is None else close - self._prev_close
+        avg_up = getattr(self._rsi_up, step)(max(diff, 0.0))
+        avg_down = getattr(self._rsi_down, step)(max(-diff, 0.0))
+        if count < self._rsi_up.window:
+            rsi = math.nan
+        elif avg_down == 0:
+            rsi = 100.0
+        else:
+            rsi = 100 - 100 / (1 + avg_up / avg_down)
+
+        bb_middle, bb_std = getattr(self._bb, step)(close)
+
+        if commit:
+            self._prev_close = close
+            self.count = count
+        return {
+            'EMA_9': self._ema9.output(ema9, count),
+            'EMA_21': self._ema21.output(ema21, count),
+            'MACD': macd,
+            'MACD_signal': signal,
+            'RSI': rsi,
+            'BB_upper': bb_middle + 2 * bb_std,
+            'BB_middle': bb_middle,
+            'BB_lower': bb_middle - 2 * bb_std,
+        }
+
+    def update(self, timestamp: int, close: float) -> dict:
+        """Incorpora una vela confirmada y devuelve los valores actuales de los indicadores."""
+        values = self._compute(close, commit=True)
+        self.last_timestamp = timestamp
+        row = [values[name] for name in INDICATOR_COLUMNS]
+        self._values[:, self._head] = row
+        self._values[:, self._head + self.history] = row
+        self._head = (self._head + 1) % self.history
+        self._size = min(self._size + 1, self.history)
+        return values
+
+    def preview(self, close: float) -> dict:
+        """Valores de los indicadores si la vela en curso cerrara a ``close``, sin modificar el estado."""
+        return self._compute(close, commit=False)
+
+    @property
+    def size(self) -> int:
+        """Número de velas conservadas en el historial de valores."""
+        return self._size
+
+    def window(self, size: int = None) -> np.ndarray:
+        """Vista (indicadores x velas) de los últimos ``size`` valores, de la más antigua a la más reciente."""
+        size = self._size if size is None else min(size, self._size)
+        end = self._head + self.history
+        return self._values[:, end - size:end]
+
+    def column(self, name: str) -> list:
+        """Valores almacenados de un indicador, del más antiguo al más reciente."""
+        return self.window()[INDICATOR_COLUMNS.index(name)].tolist()
+
+    def latest(self) -> dict:
+        """Últimos valores calculados de cada indicador."""
+        if not self._size:
+            return dict.fromkeys(INDICATOR_COLUMNS, math.nan)
+        return dict(zip(INDICATOR_COLUMNS, self._values[:, self._head + self.history - 1].tolist()))
+
+
+def _index_to_ms(index: pd.Index) -> list:
+    """Convierte el índice del DataFrame (ms o fechas con zona horaria) a timestamps en ms."""
+    if isinstance(index, pd.DatetimeIndex):
+        return ((index - pd.Timestamp(0, tz=index.tz)) // pd.Timedelta(1, 'ms')).tolist()
+    return [int(value) for value in index]
+
+@timed('indicators')
+def update_technical_indicators(df: pd.DataFrame, engine: IncrementalIndicators, provisional: bool = False) -> pd.DataFrame:
+    """
+    Versión incremental de calculate_technical_indicators: alimenta al motor sólo
+    con las velas posteriores a la última procesada (buscadas desde el final) y
+    adjunta la ventana de valores del motor como columnas, sin recalcular.
+    Con ``provisional`` la última fila es la vela en curso: se evalúa con
+    ``engine.preview`` y no se incorpora al estado del motor.
+    """
+    try:
+        # CandleBuffer.to_frame ya trae los timestamps en ms; sólo otros orígenes convierten el índice
+        timestamps = df['timestamp'].to_numpy() if 'timestamp' in df else np.asarray(_index_to_ms(df.index))
+        if getattr(df.index, 'tz', None) is None:
+            et_tz = pytz.timezone('America/New_York')
+            df.index = pd.to_datetime(df.index, unit='ms', utc=True).tz_convert(et_tz)
+        closes = df['close'].to_numpy()
+        confirmed = len(df) - 1 if provisional else len(df)
+        start = 0
+        if engine.last_timestamp is not None:
+            # Normalmente hay 0 o 1 velas nuevas: se buscan desde el final
+            start = confirmed
+            while start > 0 and timestamps[start - 1] > engine.last_timestamp:
+                start -= 1
+        for position in range(start, confirmed):
+            engine.update(int(timestamps[position]), float(closes[position]))
+        size = min(confirmed, engine.size)
+        values = np.full((len(df), len(INDICATOR_COLUMNS)), np.nan)
+        values[confirmed - size:confirmed] = engine.window(size).T
+        if provisional:
+            preview = engine.preview(float(closes[-1]))
+            values[-1] = [preview[name] for name in INDICATOR_COLUMNS]
+        indicators = pd.DataFrame(values, index=df.index, columns=list(INDICATOR_COLUMNS), copy=False)
+        return pd.concat([df.drop(columns=list(INDICATOR_COLUMNS), errors='ignore'), indicators], axis=1)
+    except Exception as e:
+        print_colored(f"Error updating indicators: {str(e)}", Colors.RED)
+        log_error(e, "Incremental Indicator Error")
+        # Sin el decorador: esta llamada ya se mide como parte de la etapa 'indicators'
+        return calculate_technical_indicators.__wrapped__(df)
+
+def verify_macd_calculation(df: pd.DataFrame, engine: IncrementalIndicators = None):
     """
     Realiza una verificación paso a paso del cálculo del MACD.
+    Si se proporciona el motor incremental se reutilizan sus valores en lugar
+    de volver a calcular las EMAs.
     """
     if len(df) < 26:
         print_colored("Not enough data for MACD calculation", Colors.RED)
         return None, None, None
+    if engine is not None and engine.size >= len(df):
+        macd_line = pd.Series(engine.column('MACD')[-len(df):], index=df.index)
+        signal_line = pd.Series(engine.column('MACD_signal')[-len(df):], index=df.index)
+        print_colored("MACD calculation verified", Colors.BLUE, level=logging.DEBUG)
+        return macd_line, signal_line, macd_line - signal_line
     close_prices = df['close']
     ema12 = close_prices.ewm(span=12, adjust=False).mean()
     ema26 = close_prices.ewm(span=26, adjust=False).mean()
     macd_line = ema12 - ema26
     signal_line = macd_line.ewm(span=9, adjust=False).mean()
     histogram = macd_line - signal_line
-    print_colored("MACD calculation verified", Colors.BLUE)
+    print_colored("MACD calculation verified", Colors.BLUE, level=logging.DEBUG)
     return macd_line, signal_line, histogram
 # Al final de data_layer.py (y de los demás módulos)
 def run_module():
@@ -0,0 +1,370 @@
+# replay.py
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import time
+from urllib.parse import urlparse, parse_qs
+import websockets
+from .utilities import print_colored, Colors, log_error, set_console_level, timeframe_to_ms
+from .config import TIMEFRAME, CANDLE_BUFFER_DEPTH, WS_BASE_URL
+from .candle_buffer import CandleBuffer
+from .data_layer import binance_websocket, stream_name, _historical_snapshot
+from .processing_layer import calculate_technical_indicators
+from .analysis_layer import generate_trading_signals
+from .decision_layer import decision_integration
+from .execution_layer import process_trading_signals
+from .pipeline import run_symbol_pipeline
+from .simulation import AsyncSimulatedExchange, KlineStandInServer, _RandomWalk
+from . import metrics
+
+RECORDING_VERSION = 1
+BENCHMARK_STAGES = ('decode', 'buffer_append', 'indicators', 'signals', 'decision', 'ticker_fetch', 'order_place',
+                    'tick_to_decision')
+
+
+# --- Grabación ---------------------------------------------------------------
+
+class _RecordingWriter:
+    """
+    Archivo gzip de líneas JSON: una cabecera con ``{stream: símbolo}`` y luego
+    ``[segundos desde el inicio, stream, evento]`` por mensaje, con el evento tal
+    como llegó por el socket.
+    """
+
+    def __init__(self, path: str, symbols: dict):
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._file.write(json.dumps({'version': RECORDING_VERSION, 'symbols': symbols}) + '\n')
+        self.count = 0
+
+    def write(self, offset: float, stream: str, event: str) -> None:
+        self._file.write(f'[{offset:.6f},{json.dumps(stream)},{event}]\n')
+        self.count += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+async def record(symbols: list, path: str, base_url: str = WS_BASE_URL, duration: float = None,
+                 max_messages: int = None) -> int:
+    """
+    Graba los mensajes kline crudos (confirmados y provisionales) de los símbolos
+    desde una conexión de streams combinados. Retorna el número de mensajes.
+    """
+    routes = {stream_name(symbol): symbol for symbol in symbols}
+    writer = _RecordingWriter(path, routes)
+    url = f"{base_url}/stream?streams={'/'.join(routes)}"
+    start = time.monotonic()
+    try:
+        async with websockets.connect(url) as ws:
+            print_colored(f"Recording {len(routes)} streams to {path}", Colors.BLUE)
+            while duration is None or time.monotonic() - start < duration:
+                timeout = None if duration is None else max(duration - (time.monotonic() - start), 0)
+                try:
+                    msg = await asyncio.wait_for(ws.recv(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                offset = time.monotonic() - start
+                parsed = json.loads(msg)
+                writer.write(offset, parsed['stream'], json.dumps(parsed['data'], separators=(',', ':')))
+                if max_messages and writer.count >= max_messages:
+                    break
+    finally:
+        writer.close()
+    print_colored(f"Recorded {writer.count} messages", Colors.GREEN)
+    return writer.count
+
+def synthesize(path: str, symbols: int, candles: int, interval: float = 0.05, ticks: int = 0, seed: int = 0) -> int:
+    """
+    Genera una grabación sintética con velas de paseo aleatorio (y ``ticks``
+    actualizaciones provisionales por vela) para benchmarks reproducibles.
+    """
+    names = [f"SIM{i}/USDT" for i in range(symbols)]
+    routes = {stream_name(symbol): symbol for symbol in names}
+    walk = _RandomWalk(seed)
+    step = TIMEFRAME * 1000
+    first = (int(time.time() * 1000) // step + 1) * step
+    writer = _RecordingWriter(path, routes)
+    try:
+        for i in range(candles):
+            batch = {stream: walk.candle(stream, first + i * step) for stream in routes}
+            for tick in range(1, ticks + 2):
+                closed = tick > ticks
+                offset = (i + tick / (ticks + 1)) * interval
+                for stream, candle in batch.items():
+                    if not closed:
+                        candle = KlineStandInServer._partial(candle, tick / (ticks + 1))
+                    event = KlineStandInServer.kline_event(stream, candle, closed)
+                    writer.write(offset, stream, json.dumps(event, separators=(',', ':')))
+    finally:
+        writer.close()
+    return writer.count
+
+def load_recording(path: str) -> tuple:
+    """Lee una grabación. Retorna (``{stream: símbolo}``, ``{stream: [(offset, evento)]}``)."""
+    streams = {}
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        if header.get('version') != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording version in {path}: {header.get('version')}")
+        for line in f:
+            offset, stream, event = json.loads(line)
+            streams.setdefault(stream, []).append((offset, json.dumps(event, separators=(',', ':'))))
+    return header['symbols'], streams
+
+
+# --- Reproducción ------------------------------------------------------------
+
+class ReplayServer:
+    """
+    Stand-in WebSocket que sirve una grabación por ``/ws/<stream>`` o
+    ``/stream?streams=...``. Con ``speed`` 0 envía tan rápido como el cliente
+    lee; con ``speed`` > 0 respeta los tiempos grabados divididos por ``speed``.
+    Al terminar deja la conexión abierta para que el cliente no reconecte.
+    """
+
+    def __init__(self, streams: dict, speed: float = 0.0, host: str = '127.0.0.1', port: int = 0):
+        self.streams = streams
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self._server = None
+
+    @property
+    def base_url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> 'ReplayServer':
+        self._server = await websockets.serve(self._handler, self.host, self.port, max_queue=None)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self) -> 'ReplayServer':
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def _handler(self, ws) -> None:
+        url = urlparse(ws.request.path)
+        combined = url.path.startswith('/stream')
+        if combined:
+            requested = parse_qs(url.query).get('streams', [''])[0].split('/')
+            messages = sorted((offset, stream, event) for stream in requested
+                              for offset, event in self.streams.get(stream, []))
+        else:
+            stream = url.path.rsplit('/', 1)[-1]
+            messages = [(offset, stream, event) for offset, event in self.streams.get(stream, [])]
+        start = time.monotonic()
+        try:
+            for offset, stream, event in messages:
+                if self.speed:
+                    delay = start + offset / self.speed - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await ws.send(f'{{"stream":"{stream}","data":{event}}}' if combined else event)
+            await ws.wait_closed()
+        except websockets.ConnectionClosed:
+            pass
+
+def _serve_replay(streams: dict, speed: float, connection) -> None:
+    async def serve():
+        async with ReplayServer(streams, speed) as server:
+            connection.send(server.port)
+            await asyncio.get_running_loop().run_in_executor(None, connection.recv)
+    asyncio.run(serve())
+
+class _ReplayProcess:
+    """ReplayServer en un proceso aparte, para que enviar no compita con el pipeline medido."""
+
+    def __init__(self, streams: dict, speed: float = 0.0):
+        self._connection, child = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_serve_replay, args=(streams, speed, child), daemon=True)
+        self._process.start()
+        self.base_url = f"ws://127.0.0.1:{self._connection.recv()}"
+
+    def stop(self) -> None:
+        self._connection.send('stop')
+        self._process.join(5)
+        if self._process.is_alive():
+            self._process.terminate()
+
+
+# --- Benchmark ---------------------------------------------------------------
+
+def _rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def _history_before(event: str, depth: int = CANDLE_BUFFER_DEPTH, seed: int = 0) -> dict:
+    """Historial sintético que termina justo antes de la primera vela grabada del stream."""
+    kline = json.loads(event)['k']
+    step = timeframe_to_ms(kline.get('i') or f'{int(TIMEFRAME / 60)}m')
+    walk = _RandomWalk(seed, float(kline['o']))
+    buffer = CandleBuffer(depth)
+    first = int(kline['t']) - depth * step
+    buffer.extend([walk.candle('history', first + i * step) for i in range(depth)])
+    return _historical_snapshot(buffer)
+
+async def _classic_chain(exchange, symbol: str, stream) -> None:
+    """La cadena original: recálculo completo de indicadores en cada vela."""
+    active_positions = []
+    async for data in stream:
+        try:
+            df = calculate_technical_indicators(data['candles'].to_frame())
+            signal_data = generate_trading_signals(df, active_positions)
+            signal = decision_integration(signal_data, active_positions, data['close'])
+            await process_trading_signals(exchange, signal, data, active_positions, symbol=symbol)
+        except Exception as e:
+            print_colored(f"Replay chain error ({symbol}): {str(e)}", Colors.RED)
+            log_error(e, f"Replay Chain Error {symbol}")
+
+async def _run_replay(symbols: dict, streams: dict, base_url: str, mode: str, idle_timeout: float) -> tuple:
+    exchange = AsyncSimulatedExchange(latency=0)
+    expected = 0
+    tasks = []
+    for stream, symbol in symbols.items():
+        historical = _history_before(streams[stream][0][1])
+        expected += 1 + sum(1 for _, event in streams[stream] if '"x":true' in event)
+        source = binance_websocket(symbol, historical, base_url)
+        chain = _classic_chain(exchange, symbol, source) if mode == 'classic' \
+            else run_symbol_pipeline(exchange, symbol, source)
+        tasks.append(asyncio.create_task(chain, name=symbol))
+    start = time.perf_counter()
+    processed, last_progress = 0, time.monotonic()
+    try:
+        while processed < expected:
+            await asyncio.sleep(0.05)
+            current = metrics.count('decision')
+            if current != processed:
+                processed, last_progress = current, time.monotonic()
+            elif time.monotonic() - last_progress > idle_timeout:
+                print_colored(f"Replay stalled at {processed}/{expected} candles", Colors.YELLOW)
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return processed, time.perf_counter() - start
+
+def benchmark(recording: str, symbol_counts=(1, 10, 100), mode: str = 'pipeline', speed: float = 0.0,
+              idle_timeout: float = 10.0) -> list:
+    """
+    Reproduce la grabación en la cadena completa para cada número de símbolos
+    y mide velas/s, tiempo por etapa (metrics) y crecimiento de memoria (RSS).
+    """
+    symbols, streams = load_recording(recording)
+    results = []
+    for count in symbol_counts:
+        selected = dict(list(symbols.items())[:count])
+        if len(selected) < count:
+            print_colored(f"Recording has only {len(selected)} streams; running with {len(selected)}", Colors.YELLOW)
+        server = _ReplayProcess({stream: streams[stream] for stream in selected}, speed)
+        metrics.reset()
+        metrics.enable()
+        rss_start = _rss_mb()
+        try:
+            processed, seconds = asyncio.run(_run_replay(selected, streams, server.base_url, mode, idle_timeout))
+        finally:
+            server.stop()
+        stages = {stage: {'p50_us': stats['p50'] / 1000, 'p99_us': stats['p99'] / 1000,
+                          'mean_us': stats['mean'] / 1000, 'count': stats['count']}
+                  for stage, stats in metrics.snapshot().items() if stage in BENCHMARK_STAGES}
+        results.append({
+            'symbols': len(selected),
+            'mode': mode,
+            'candles': processed,
+            'seconds': seconds,
+            'candles_per_sec': processed / seconds if seconds else 0.0,
+            'rss_start_mb': rss_start,
+            'rss_growth_mb': _rss_mb() - rss_start,
+            'stages': stages
+        })
+    return results
+
+def compare(results: list, baseline: list, tolerance: float = 0.2) -> list:
+    """Resultados cuyo throughput cae más de ``tolerance`` respecto a la línea base."""
+    reference = {(item['mode'], item['symbols']): item for item in baseline}
+    regressions = []
+    for item in results:
+        previous = reference.get((item['mode'], item['symbols']))
+        if previous and item['candles_per_sec'] < previous['candles_per_sec'] * (1 - tolerance):
+            regressions.append((item, previous))
+    return regressions
+
+def _print_results(results: list) -> None:
+    for item in results:
+        print_colored(f"\n{item['symbols']} symbols ({item['mode']}): {item['candles']} candles in "
+                      f"{item['seconds']:.2f}s = {item['candles_per_sec']:.0f} candles/s, "
+                      f"RSS +{item['rss_growth_mb']:.1f} MB", Colors.GREEN, level=logging.WARNING)
+        for stage, stats in item['stages'].items():
+            print_colored(f"  {stage:<14} mean={stats['mean_us']:>9.1f}us p50={stats['p50_us']:>9.1f}us "
+                          f"p99={stats['p99_us']:>9.1f}us", Colors.BLUE, level=logging.WARNING)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Grabación, reproducción y benchmark del pipeline en vivo")
+    commands = parser.add_subparsers(dest='command', required=True)
+    rec = commands.add_parser('record', help="Graba mensajes kline crudos de un WebSocket")
+    rec.add_argument('output')
+    rec.add_argument('--symbols', default='ETH/USDT', help="Pares separados por comas")
+    rec.add_argument('--base-url', default=WS_BASE_URL)
+    rec.add_argument('--duration', type=float, help="Segundos a grabar")
+    rec.add_argument('--max-messages', type=int)
+    synth = commands.add_parser('synth', help="Genera una grabación sintética")
+    synth.add_argument('output')
+    synth.add_argument('--symbols', type=int, default=100)
+    synth.add_argument('--candles', type=int, default=200)
+    synth.add_argument('--ticks', type=int, default=0, help="Actualizaciones provisionales por vela")
+    bench = commands.add_parser('bench', help="Reproduce una grabación en el pipeline y mide throughput")
+    bench.add_argument('recording', nargs='?', help="Grabación (por defecto se genera una sintética)")
+    bench.add_argument('--symbols', default='1,10,100', help="Números de símbolos a medir")
+    bench.add_argument('--candles', type=int, default=200, help="Velas por símbolo de la grabación sintética")
+    bench.add_argument('--mode', choices=('pipeline', 'classic'), default='pipeline',
+                       help="pipeline: run_symbol_pipeline incremental; classic: recálculo completo por vela")
+    bench.add_argument('--speed', type=float, default=0.0, help="0 = máxima velocidad, 1 = tiempo real")
+    bench.add_argument('--output', help="Guarda los resultados en JSON")
+    bench.add_argument('--baseline', help="JSON de una ejecución anterior con el que comparar")
+    bench.add_argument('--tolerance', type=float, default=0.2, help="Caída de velas/s tolerada frente a la base")
+    args = parser.parse_args()
+
+    if args.command == 'record':
+        asyncio.run(record(args.symbols.split(','), args.output, args.base_url, args.duration, args.max_messages))
+        return
+    if args.command == 'synth':
+        count = synthesize(args.output, args.symbols, args.candles, ticks=args.ticks)
+        print_colored(f"Wrote {count} messages to {args.output}", Colors.GREEN)
+        return
+
+    counts = [int(value) for value in args.symbols.split(',')]
+    recording = args.recording
+    if recording is None:
+        recording = 'replay_benchmark.jsonl.gz'
+        synthesize(recording, max(counts), args.candles)
+    set_console_level(logging.WARNING)
+    results = benchmark(recording, counts, args.mode, args.speed)
+    _print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for item, previous in regressions:
+            print_colored(f"REGRESSION {item['symbols']} symbols ({item['mode']}): {item['candles_per_sec']:.0f} "
+                          f"vs {previous['candles_per_sec']:.0f} candles/s", Colors.RED, level=logging.ERROR)
+        if regressions:
+            raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
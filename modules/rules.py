@@ -0,0 +1,170 @@
+# rules.py
+import ast
+import numpy as np
+from .config import RSI_BUY_THRESHOLD, EMA_BUY_FACTOR, EMA_SELL_FACTOR
+
+_COMPARE = {ast.Gt: ast.Gt, ast.GtE: ast.GtE, ast.Lt: ast.Lt, ast.LtE: ast.LtE, ast.Eq: ast.Eq, ast.NotEq: ast.NotEq}
+_ARITHMETIC = (ast.Add, ast.Sub, ast.Mult, ast.Div)
+
+# Reglas de la estrategia actual: nombre -> expresión
+BUY_RULES = {
+    'macd_bullish': 'MACD > MACD_signal',
+    'ema_trend': 'close > EMA_9 * ema_buy_factor',
+    'rsi_conditions': 'RSI < rsi_threshold',
+    'bb_conditions': 'close < BB_middle',
+}
+SELL_RULES = {
+    'macd_bearish': 'MACD < MACD_signal',
+    'ema_downtrend': 'close < EMA_9 * ema_sell_factor',
+}
+DEFAULT_PARAMS = {
+    'rsi_threshold': RSI_BUY_THRESHOLD,
+    'ema_buy_factor': EMA_BUY_FACTOR,
+    'ema_sell_factor': EMA_SELL_FACTOR,
+}
+
+
+class _ToNumpy(ast.NodeTransformer):
+    """
+    Valida la regla y la reescribe como expresión NumPy: los nombres pasan a
+    ser columnas (``c['RSI']``) o constantes de parámetros, ``and``/``or``/``not``
+    pasan a ``&``/``|``/``~`` y las comparaciones encadenadas se separan.
+    """
+
+    def __init__(self, params: dict):
+        self.params = params
+        self.columns = set()
+
+    def generic_visit(self, node):
+        raise ValueError(f"Unsupported syntax in rule: {ast.dump(node)}")
+
+    def visit_Expression(self, node):
+        return ast.Expression(self.visit(node.body))
+
+    def visit_Name(self, node):
+        if node.id in self.params:
+            return ast.Constant(float(self.params[node.id]))
+        self.columns.add(node.id)
+        return ast.Subscript(ast.Name('c', ast.Load()), ast.Constant(node.id), ast.Load())
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (int, float)) or isinstance(node.value, bool):
+            raise ValueError(f"Unsupported constant in rule: {node.value!r}")
+        return node
+
+    def visit_UnaryOp(self, node):
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(ast.Invert(), self.visit(node.operand))
+        if isinstance(node.op, ast.USub):
+            return ast.UnaryOp(ast.USub(), self.visit(node.operand))
+        return self.generic_visit(node)
+
+    def visit_BinOp(self, node):
+        if not isinstance(node.op, _ARITHMETIC):
+            return self.generic_visit(node)
+        return ast.BinOp(self.visit(node.left), node.op, self.visit(node.right))
+
+    def visit_BoolOp(self, node):
+        op = ast.BitAnd() if isinstance(node.op, ast.And) else ast.BitOr()
+        values = [self.visit(value) for value in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = ast.BinOp(result, op, value)
+        return result
+
+    def visit_Compare(self, node):
+        operands = [self.visit(node.left)] + [self.visit(value) for value in node.comparators]
+        parts = []
+        for i, op in enumerate(node.ops):
+            if type(op) not in _COMPARE:
+                return self.generic_visit(node)
+            parts.append(ast.Compare(operands[i], [op], [operands[i + 1]]))
+        result = parts[0]
+        for part in parts[1:]:
+            result = ast.BinOp(result, ast.BitAnd(), part)
+        return result
+
+
+class Rule:
+    """
+    Condición declarativa (p. ej. ``close > EMA_9 * 0.995``) compilada una vez
+    a una expresión NumPy. Se evalúa sobre columnas de cualquier forma: una
+    serie, una matriz símbolos x tiempo o sólo la última columna.
+    """
+
+    def __init__(self, expression: str, params: dict = None):
+        self.expression = expression
+        transformer = _ToNumpy(params or {})
+        tree = transformer.visit(ast.parse(expression.strip(), mode='eval'))
+        self.columns = frozenset(transformer.columns)
+        self._code = compile(ast.fix_missing_locations(tree), f"<rule {expression}>", 'eval')
+
+    def evaluate(self, columns: dict) -> np.ndarray:
+        with np.errstate(invalid='ignore'):
+            return np.asarray(eval(self._code, {'__builtins__': {}}, {'c': columns}), dtype=bool)
+
+    def __repr__(self) -> str:
+        return f"Rule({self.expression!r})"
+
+
+class Strategy:
+    """
+    Conjunto de reglas de compra y venta. La compra exige todas las reglas de
+    compra y la venta todas las de venta; la señal vale 1, -1 o 0 y la venta
+    prevalece si ambas se cumplen.
+    """
+
+    def __init__(self, buy_rules: dict = None, sell_rules: dict = None, **params):
+        params = dict(DEFAULT_PARAMS, **params)
+        self.params = params
+        self.buy_rules = {name: Rule(expression, params) for name, expression in (buy_rules or BUY_RULES).items()}
+        self.sell_rules = {name: Rule(expression, params) for name, expression in (sell_rules or SELL_RULES).items()}
+        self.columns = frozenset().union(*(rule.columns for rule in self.rules.values()))
+
+    @property
+    def rules(self) -> dict:
+        return {**self.buy_rules, **self.sell_rules}
+
+    def evaluate(self, columns: dict) -> dict:
+        """Resultado de cada regla más ``buy``, ``sell`` y ``signal`` con la forma de las columnas."""
+        results = {name: rule.evaluate(columns) for name, rule in self.rules.items()}
+        buy = np.logical_and.reduce([results[name] for name in self.buy_rules])
+        sell = np.logical_and.reduce([results[name] for name in self.sell_rules])
+        results.update(buy=buy, sell=sell, signal=np.where(sell, -1.0, np.where(buy, 1.0, 0.0)))
+        return results
+
+    def evaluate_latest(self, columns: dict) -> dict:
+        """Camino rápido para operar en vivo: evalúa sólo el último instante (``[..., -1]``) de cada columna."""
+        return self.evaluate({name: np.asarray(columns[name])[..., -1] for name in self.columns})
+
+
+def stack_columns(frames: dict, columns, length: int = None) -> tuple:
+    """
+    Apila las columnas de varios símbolos en matrices símbolos x tiempo,
+    alineadas por el final y rellenas con NaN al principio. ``frames`` es
+    ``{símbolo: DataFrame o dict de arrays}``. Retorna (símbolos, {columna: matriz}).
+    """
+    symbols = list(frames)
+    if length is None:
+        length = max((len(frames[symbol][next(iter(columns))]) for symbol in symbols), default=0)
+    matrix = {}
+    for column in columns:
+        values = np.full((len(symbols), length), np.nan)
+        for row, symbol in enumerate(symbols):
+            series = np.asarray(frames[symbol][column], dtype=np.float64)[-length:]
+            if len(series):
+                values[row, length - len(series):] = series
+        matrix[column] = values
+    return symbols, matrix
+
+def scan(strategy: Strategy, latest: dict) -> dict:
+    """
+    Evalúa la estrategia para muchos símbolos de una vez a partir de sus últimos
+    valores ``{símbolo: {columna: valor}}`` (p. ej. IncrementalIndicators.latest()
+    más ``close``). Retorna ``{símbolo: señal}``.
+    """
+    symbols = list(latest)
+    columns = {name: np.array([latest[symbol][name] for symbol in symbols], dtype=np.float64)
+               for name in strategy.columns}
+    signals = strategy.evaluate(columns)['signal']
+    return dict(zip(symbols, signals.tolist()))
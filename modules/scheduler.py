@@ -0,0 +1,222 @@
+# scheduler.py
+import asyncio
+import heapq
+import itertools
+import time
+from .utilities import print_colored, Colors
+from .config import (REQUEST_WEIGHT_LIMIT, REQUEST_WEIGHT_WINDOW, REQUEST_WEIGHT_BURST, REQUEST_WEIGHT_RESERVE,
+                     REQUEST_BACKOFF)
+from . import metrics
+
+# Carriles en orden de prioridad: las órdenes siempre pasan primero
+LANES = ('order', 'account', 'market', 'backfill')
+
+# Pesos de los endpoints REST de Binance spot (por método de ccxt)
+_WEIGHTS = {
+    'fetch_ticker': 2,
+    'fetch_tickers': 80,
+    'fetch_ohlcv': 2,
+    'fetch_trades': 25,
+    'fetch_order': 4,
+    'fetch_balance': 20,
+    'fetch_my_trades': 20,
+    'fetch_closed_orders': 20,
+    'fetch_orders': 20,
+    'load_markets': 20,
+    'fetch_markets': 20,
+    'fetch_time': 1,
+}
+_ACCOUNT_METHODS = {'fetch_order', 'fetch_orders', 'fetch_open_orders', 'fetch_closed_orders', 'fetch_balance',
+                    'fetch_my_trades'}
+_ORDER_PREFIXES = ('create_', 'cancel_', 'edit_')
+# Errores de ccxt (429 y 418) comparados por nombre para no importar ccxt al arrancar
+_RATE_LIMIT_ERRORS = {'RateLimitExceeded', 'DDoSProtection'}
+
+
+def request_lane(method: str) -> str:
+    if method.startswith(_ORDER_PREFIXES):
+        return 'order'
+    if method in _ACCOUNT_METHODS:
+        return 'account'
+    if method == 'fetch_ohlcv':
+        return 'backfill'
+    return 'market'
+
+def request_weight(method: str, args: tuple = (), kwargs: dict = None) -> int:
+    """Peso de una llamada según las tablas de Binance (libro por ``limit``, órdenes abiertas con o sin símbolo)."""
+    kwargs = kwargs or {}
+    if method == 'fetch_order_book':
+        limit = kwargs.get('limit') or (args[1] if len(args) > 1 else None) or 100
+        return 5 if limit <= 100 else 25 if limit <= 500 else 50 if limit <= 1000 else 250
+    if method == 'fetch_open_orders':
+        return 6 if kwargs.get('symbol') or (args and args[0]) else 80
+    if method.startswith(_ORDER_PREFIXES):
+        return 1
+    return _WEIGHTS.get(method, 5)
+
+
+class RequestScheduler:
+    """
+    Planificador compartido de las peticiones REST de un exchange. Un token
+    bucket modela el límite de peso por ventana del exchange: con capacidad
+    ``burst`` y recarga de ``(limit - burst) / window`` ninguna ventana supera
+    ``limit`` aunque empiece con el bucket lleno. Las peticiones
+    esperan en una cola de prioridad por carril (órdenes, cuenta, mercado,
+    historial) y sólo las órdenes pueden gastar la reserva final del bucket,
+    así un backfill masivo no retrasa una orden. Las lecturas idénticas
+    concurrentes comparten una única petición en curso.
+    """
+
+    def __init__(self, limit: int = REQUEST_WEIGHT_LIMIT, window: float = REQUEST_WEIGHT_WINDOW,
+                 burst: int = REQUEST_WEIGHT_BURST, reserve: int = REQUEST_WEIGHT_RESERVE,
+                 backoff: float = REQUEST_BACKOFF):
+        if not reserve < burst < limit:
+            raise ValueError("Request scheduler needs reserve < burst < limit")
+        self.limit = limit
+        self.burst = burst
+        self.rate = (limit - burst) / window
+        self.reserve = reserve
+        self.backoff = backoff
+        self.tokens = float(burst)
+        self.stats = {'requests': 0, 'coalesced': 0, 'queued': 0, 'rate_limited': 0}
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []  # heap de (prioridad, secuencia, peso, future)
+        self._sequence = itertools.count()
+        self._wakeup = None
+        self._inflight = {}  # clave de lectura -> {'task': petición en curso, 'waiters': llamadores esperando}
+
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    def _available(self, priority: int) -> float:
+        return self.tokens - (0 if priority == 0 else self.reserve)
+
+    def _dispatch(self) -> None:
+        """Concede turnos en orden de prioridad mientras haya peso; si no, se reprograma."""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+        now = self._refill()
+        while self._waiters:
+            priority, _, weight, future = self._waiters[0]
+            if future.done():
+                heapq.heappop(self._waiters)
+                continue
+            delay = max(self._paused_until - now, (weight - self._available(priority)) / self.rate)
+            if delay > 0:
+                self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self.tokens -= weight
+            future.set_result(None)
+
+    async def _acquire(self, priority: int, weight: int) -> None:
+        now = self._refill()
+        if (now >= self._paused_until and weight <= self._available(priority)
+                and (not self._waiters or priority < self._waiters[0][0])):
+            self.tokens -= weight
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), weight, future))
+        self.stats['queued'] += 1
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.tokens += weight
+            raise
+
+    def _observe(self, exchange) -> None:
+        """Ajusta el bucket al peso usado que informa el exchange (``X-MBX-USED-WEIGHT-1M``)."""
+        headers = getattr(exchange, 'last_response_headers', None)
+        if not headers:
+            return
+        used = headers.get('x-mbx-used-weight-1m') or headers.get('X-MBX-USED-WEIGHT-1M')
+        if used:
+            self._refill()
+            self.tokens = min(self.tokens, self.limit - float(used))
+
+    def _rate_limited(self, exchange) -> None:
+        headers = getattr(exchange, 'last_response_headers', None) or {}
+        retry_after = headers.get('Retry-After') or headers.get('retry-after')
+        delay = float(retry_after) if retry_after else self.backoff
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self.tokens = min(self.tokens, 0.0)
+        self.stats['rate_limited'] += 1
+        print_colored(f"Exchange rate limit hit, pausing requests for {delay:.1f}s", Colors.YELLOW)
+
+    async def _execute(self, exchange, method: str, weight: int, call):
+        lane = request_lane(method)
+        start = metrics.now_ns()
+        await self._acquire(LANES.index(lane), min(weight, self.burst))
+        metrics.record_since(f'queue_{lane}', start)
+        self.stats['requests'] += 1
+        try:
+            result = await call()
+        except Exception as e:
+            if _RATE_LIMIT_ERRORS.intersection(cls.__name__ for cls in type(e).__mro__):
+                self._rate_limited(exchange)
+            raise
+        self._observe(exchange)
+        return result
+
+    async def submit(self, exchange, method: str, args: tuple, kwargs: dict, call):
+        """
+        Ejecuta ``call()`` (la petición ``method`` del exchange) cuando su carril
+        tiene turno y hay peso disponible. Las lecturas con los mismos argumentos
+        que otra en curso esperan su resultado en lugar de repetirla; si todos
+        los que la esperan se cancelan, la petición compartida se cancela también
+        (sin gastar peso si aún no tenía turno).
+        """
+        weight = request_weight(method, args, kwargs)
+        if request_lane(method) == 'order':
+            return await self._execute(exchange, method, weight, call)
+        key = (method, repr(args), repr(sorted(kwargs.items())))
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.ensure_future(self._execute(exchange, method, weight, call))
+            entry = self._inflight[key] = {'task': task, 'waiters': 0}
+            task.add_done_callback(lambda done: self._release(key, done))
+        else:
+            self.stats['coalesced'] += 1
+        entry['waiters'] += 1
+        try:
+            return await asyncio.shield(entry['task'])
+        finally:
+            entry['waiters'] -= 1
+            if not entry['waiters'] and not entry['task'].done():
+                # Nadie espera ya el resultado: se libera la clave para que una lectura nueva no se una a ésta
+                if self._inflight.get(key) is entry:
+                    del self._inflight[key]
+                entry['task'].cancel()
+
+    def _release(self, key: tuple, done: asyncio.Future) -> None:
+        entry = self._inflight.get(key)
+        if entry is not None and entry['task'] is done:
+            del self._inflight[key]
+        if not done.cancelled():
+            done.exception()  # marca la excepción como recuperada si nadie la esperaba
+
+    def pending(self) -> dict:
+        """Peticiones esperando turno por carril."""
+        counts = dict.fromkeys(LANES, 0)
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                counts[LANES[priority]] += 1
+        return counts
+
+
+def attach_scheduler(exchange, scheduler: RequestScheduler = None) -> RequestScheduler:
+    """
+    Hace que call_exchange pase las peticiones del exchange por el planificador
+    y desactiva el throttling genérico de ccxt, que duplicaría la espera.
+    """
+    exchange.request_scheduler = scheduler or RequestScheduler()
+    if hasattr(exchange, 'enableRateLimit'):
+        exchange.enableRateLimit = False
+    return exchange.request_scheduler
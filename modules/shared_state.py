@@ -0,0 +1,150 @@
+# shared_state.py
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import time
+from .config import STATE_SEGMENT_SIZE, STATE_CANDLES
+from .candle_buffer import OHLCV_COLUMNS
+from . import metrics
+
+# Cabecera del segmento: contador de secuencia (impar = escritura en curso) y longitud del payload
+_HEADER = struct.Struct('<QI')
+_SEQUENCE = struct.Struct('<Q')
+
+
+def state_path(symbols: list, suffix: str = '.state') -> str:
+    """Ruta del segmento de estado de un conjunto de símbolos (en /dev/shm si existe)."""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    key = hashlib.sha1(','.join(sorted(symbols)).encode()).hexdigest()[:12]
+    return os.path.join(directory, f"trading_bot_{key}{suffix}")
+
+
+class StateWriter:
+    """
+    Publica snapshots en un archivo mapeado en memoria protegido por un seqlock:
+    el contador se incrementa a impar antes de escribir y a par al terminar, así
+    los lectores nunca bloquean al bot y descartan las copias a medio escribir.
+    """
+
+    def __init__(self, path: str, size: int = STATE_SEGMENT_SIZE):
+        self.path = path
+        self.size = size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._sequence = _SEQUENCE.unpack_from(self._map, 0)[0] & ~1
+
+    def write(self, payload: bytes) -> int:
+        if len(payload) > self.size - _HEADER.size:
+            raise ValueError(f"State snapshot of {len(payload)} bytes exceeds segment of {self.size} bytes")
+        self._sequence += 1
+        _SEQUENCE.pack_into(self._map, 0, self._sequence)
+        self._map[_HEADER.size:_HEADER.size + len(payload)] = payload
+        _HEADER.pack_into(self._map, 0, self._sequence, len(payload))
+        self._sequence += 1
+        _SEQUENCE.pack_into(self._map, 0, self._sequence)
+        return self._sequence
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+class StateReader:
+    """
+    Lee el último snapshot completo del segmento sin coordinarse con el escritor.
+    Si el contador cambió durante la copia se reintenta; si no hay cambios desde
+    la última lectura se devuelve el snapshot ya decodificado.
+    """
+
+    def __init__(self, path: str, retries: int = 100):
+        self.path = path
+        self.retries = retries
+        self.sequence = None
+        self.snapshot = None
+        self._map = None
+
+    def _open(self) -> bool:
+        if self._map is None:
+            try:
+                with open(self.path, 'rb') as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):
+                return False
+        return True
+
+    def read(self):
+        """Último snapshot publicado (dict) o None si el bot aún no publicó nada."""
+        if not self._open():
+            return None
+        for _ in range(self.retries):
+            sequence, length = _HEADER.unpack_from(self._map, 0)
+            if sequence & 1:
+                continue
+            if sequence == self.sequence:
+                return self.snapshot
+            payload = self._map[_HEADER.size:_HEADER.size + length]
+            if _SEQUENCE.unpack_from(self._map, 0)[0] != sequence:
+                continue
+            if not length:
+                return None
+            self.sequence, self.snapshot = sequence, json.loads(payload)
+            return self.snapshot
+        return self.snapshot
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def _number(value):
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+class BotState:
+    """
+    Referencias al último estado de cada símbolo que actualiza el pipeline en
+    cada vela (sin copiar nada). El snapshot compacto para el dashboard se arma
+    sólo al publicar.
+    """
+
+    def __init__(self, symbols: list, candles: int = STATE_CANDLES):
+        self.symbols = list(symbols)
+        self.candles = candles
+        self.started = time.time()
+        self._latest = {}
+
+    def update(self, symbol: str, data: dict, df, signal_data: dict, signal: int, active_positions: list) -> None:
+        self._latest[symbol] = (data, df, signal_data, signal, active_positions)
+
+    def snapshot(self) -> dict:
+        symbols = {}
+        for symbol, (data, df, signal_data, signal, active_positions) in self._latest.items():
+            symbols[symbol] = {
+                'timestamp': int(data['timestamp']),
+                'close': float(data['close']),
+                'provisional': not data.get('confirmadas', True),
+                'candles': {column: data['candles'].column(column)[-self.candles:].tolist()
+                            for column in OHLCV_COLUMNS},
+                'indicators': {column: _number(df[column].iat[-1]) for column in df.columns
+                               if column not in OHLCV_COLUMNS},
+                'conditions': signal_data.get('conditions', {}),
+                'signal': int(signal),
+                'positions': [dict(position) for position in active_positions]
+            }
+        return {
+            'pid': os.getpid(),
+            'started': self.started,
+            'published': time.time(),
+            'watching': self.symbols,
+            'symbols': symbols,
+            'latency_us': {stage: {'p50': stats['p50'] / 1000, 'p99': stats['p99'] / 1000,
+                                   'count': stats['count']}
+                           for stage, stats in metrics.snapshot().items()}
+        }
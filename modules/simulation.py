@@ -0,0 +1,316 @@
+# simulation.py
+import asyncio
+import collections
+import json
+import random
+import time
+from urllib.parse import urlparse, parse_qs
+import websockets
+from .config import TIMEFRAME
+from .utilities import timeframe_to_ms
+from .scheduler import request_weight
+
+
+class _RandomWalk:
+    """Generador de velas con paseo aleatorio por símbolo."""
+
+    def __init__(self, seed: int = 0, price: float = 3000.0, volatility: float = 0.002):
+        self._rng = random.Random(seed)
+        self._start_price = price
+        self._volatility = volatility
+        self.prices = {}
+
+    def candle(self, key: str, timestamp: int) -> list:
+        open_ = self.prices.get(key, self._start_price)
+        close = open_ * (1 + self._rng.gauss(0, self._volatility))
+        high = max(open_, close) * (1 + abs(self._rng.gauss(0, self._volatility / 2)))
+        low = min(open_, close) * (1 - abs(self._rng.gauss(0, self._volatility / 2)))
+        self.prices[key] = close
+        return [timestamp, open_, high, low, close, self._rng.uniform(1, 100)]
+
+
+class DepthFeed:
+    """
+    Libro de órdenes sintético por símbolo con ids de actualización al estilo
+    Binance: sirve snapshots (``fetch_order_book``) y eventos ``depthUpdate``.
+    Con ``gap_rate`` algunos eventos se saltan para ejercitar la resincronización.
+    """
+
+    def __init__(self, seed: int = 0, price: float = 3000.0, tick: float = 0.01, levels: int = 200,
+                 gap_rate: float = 0.0):
+        self._rng = random.Random(seed)
+        self.price = price
+        self.tick = tick
+        self.levels = levels
+        self.gap_rate = gap_rate
+        self._books = {}
+
+    @staticmethod
+    def key(symbol: str) -> str:
+        return symbol.replace('/', '').lower()
+
+    def _book(self, symbol: str) -> dict:
+        key = self.key(symbol)
+        if key not in self._books:
+            mid = round(self.price / self.tick) * self.tick
+            self._books[key] = {
+                'update_id': 1000,
+                'bids': {round(mid - (i + 1) * self.tick, 8): self._rng.uniform(0.1, 5) for i in range(self.levels)},
+                'asks': {round(mid + (i + 1) * self.tick, 8): self._rng.uniform(0.1, 5) for i in range(self.levels)}
+            }
+        return self._books[key]
+
+    def snapshot(self, symbol: str, limit: int = 100) -> dict:
+        book = self._book(symbol)
+        return {'symbol': symbol, 'nonce': book['update_id'],
+                'bids': sorted(book['bids'].items(), reverse=True)[:limit],
+                'asks': sorted(book['asks'].items())[:limit]}
+
+    def event(self, symbol: str, changes: int = 5) -> dict:
+        """Siguiente ``depthUpdate``: cambia, añade o elimina algunos niveles cerca del mejor precio."""
+        book = self._book(symbol)
+        updates = {'b': [], 'a': []}
+        for _ in range(changes):
+            side = self._rng.choice(('bids', 'asks'))
+            levels = book[side]
+            best = max(levels) if side == 'bids' else min(levels)
+            offset = self._rng.randint(0, 10) * self.tick
+            price = round(best - offset if side == 'bids' else best + offset, 8)
+            amount = 0.0 if self._rng.random() < 0.3 and len(levels) > 10 else self._rng.uniform(0.1, 5)
+            if amount:
+                levels[price] = amount
+            else:
+                levels.pop(price, None)
+            updates['b' if side == 'bids' else 'a'].append([f"{price:.8f}", f"{amount:.8f}"])
+        first = book['update_id'] + 1
+        book['update_id'] += changes
+        if self._rng.random() < self.gap_rate:
+            first += 1
+        return {'e': 'depthUpdate', 'E': int(time.time() * 1000), 's': self.key(symbol).upper(),
+                'U': first, 'u': book['update_id'], 'b': updates['b'], 'a': updates['a']}
+
+
+class SimulatedExchange:
+    """
+    Exchange en memoria con la parte de la interfaz ccxt que usa el bot:
+    velas sintéticas, ticker, libro de órdenes y órdenes límite que se llenan al instante.
+    """
+
+    def __init__(self, seed: int = 0, price: float = 3000.0, depth: DepthFeed = None):
+        self._walk = _RandomWalk(seed, price)
+        self.depth = depth or DepthFeed(seed, price)
+        self.orders = []
+
+    def fetch_ohlcv(self, symbol: str, timeframe: str = '5m', since: int = None, limit: int = 500) -> list:
+        step = timeframe_to_ms(timeframe)
+        now = int(time.time() * 1000) // step * step
+        start = since // step * step if since is not None else now - (limit - 1) * step
+        end = min(start + (limit - 1) * step, now)
+        return [self._walk.candle(symbol, timestamp) for timestamp in range(start, end + 1, step)]
+
+    def fetch_ticker(self, symbol: str) -> dict:
+        last = self._walk.prices.get(symbol) or self._walk.candle(symbol, int(time.time() * 1000))[4]
+        return {'symbol': symbol, 'last': last, 'bid': last * 0.9999, 'ask': last * 1.0001,
+                'timestamp': int(time.time() * 1000)}
+
+    def fetch_order_book(self, symbol: str, limit: int = 100, params: dict = None) -> dict:
+        return self.depth.snapshot(symbol, limit)
+
+    def _create_order(self, symbol: str, side: str, amount: float, price: float) -> dict:
+        order = {'id': str(len(self.orders) + 1), 'symbol': symbol, 'type': 'limit', 'side': side,
+                 'amount': amount, 'price': price, 'filled': amount, 'status': 'closed',
+                 'timestamp': int(time.time() * 1000)}
+        self.orders.append(order)
+        return order
+
+    def create_limit_buy_order(self, symbol: str, amount: float, price: float, params: dict = None) -> dict:
+        return self._create_order(symbol, 'buy', amount, price)
+
+    def create_limit_sell_order(self, symbol: str, amount: float, price: float, params: dict = None) -> dict:
+        return self._create_order(symbol, 'sell', amount, price)
+
+    def fetch_open_orders(self, symbol: str = None, since: int = None, limit: int = None) -> list:
+        return [order for order in self.orders
+                if order['status'] == 'open' and (symbol is None or order['symbol'] == symbol)]
+
+    def fetch_orders(self, symbol: str, since: int = None, limit: int = None) -> list:
+        orders = [order for order in self.orders
+                  if order['symbol'] == symbol and (since is None or order['timestamp'] >= since)]
+        return orders[:limit] if limit else orders
+
+
+class AsyncSimulatedExchange:
+    """
+    Versión asíncrona de SimulatedExchange que imita un cliente ``ccxt.async_support``:
+    añade latencia de red y fallos aleatorios, y cuenta las llamadas por método.
+    Con ``weight_limit`` aplica el límite de peso de Binance por ventana
+    deslizante: informa el peso usado en ``last_response_headers`` y responde
+    429 (``ccxt.RateLimitExceeded``) al superarlo.
+    """
+
+    def __init__(self, seed: int = 0, price: float = 3000.0, latency: float = 0.05, failure_rate: float = 0.0,
+                 depth: DepthFeed = None, weight_limit: int = None, weight_window: float = 60.0):
+        self.exchange = SimulatedExchange(seed, price, depth)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.weight_limit = weight_limit
+        self.weight_window = weight_window
+        self.calls = {}
+        self.rejected = 0
+        self.last_response_headers = {}
+        self._used = collections.deque()  # (instante, peso) dentro de la ventana
+        self._rng = random.Random(seed)
+
+    @property
+    def orders(self) -> list:
+        return self.exchange.orders
+
+    async def _request(self, method: str, *args, **kwargs):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.weight_limit is not None:
+            self._charge(request_weight(method, args, kwargs))
+        await asyncio.sleep(self.latency)
+        if self._rng.random() < self.failure_rate:
+            raise ConnectionError(f"Simulated {method} failure")
+        return getattr(self.exchange, method)(*args, **kwargs)
+
+    def _charge(self, weight: int) -> None:
+        now = time.monotonic()
+        while self._used and now - self._used[0][0] >= self.weight_window:
+            self._used.popleft()
+        used = sum(charged for _, charged in self._used) + weight
+        self.last_response_headers = {'x-mbx-used-weight-1m': str(used)}
+        if used > self.weight_limit:
+            import ccxt
+            self.rejected += 1
+            raise ccxt.RateLimitExceeded(f"429 Too Many Requests: weight {used} > {self.weight_limit}")
+        self._used.append((now, weight))
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str = '5m', since: int = None, limit: int = 500) -> list:
+        return await self._request('fetch_ohlcv', symbol, timeframe, since, limit)
+
+    async def fetch_ticker(self, symbol: str) -> dict:
+        return await self._request('fetch_ticker', symbol)
+
+    async def fetch_order_book(self, symbol: str, limit: int = 100, params: dict = None) -> dict:
+        return await self._request('fetch_order_book', symbol, limit)
+
+    async def create_limit_buy_order(self, symbol: str, amount: float, price: float, params: dict = None) -> dict:
+        return await self._request('create_limit_buy_order', symbol, amount, price)
+
+    async def create_limit_sell_order(self, symbol: str, amount: float, price: float, params: dict = None) -> dict:
+        return await self._request('create_limit_sell_order', symbol, amount, price)
+
+    async def fetch_open_orders(self, symbol: str = None, since: int = None, limit: int = None) -> list:
+        return await self._request('fetch_open_orders', symbol, since, limit)
+
+    async def fetch_orders(self, symbol: str, since: int = None, limit: int = None) -> list:
+        return await self._request('fetch_orders', symbol, since, limit)
+
+    async def close(self) -> None:
+        pass
+
+
+class KlineStandInServer:
+    """
+    Servidor WebSocket local que imita los streams de velas de Binance, tanto
+    ``/ws/<stream>`` como ``/stream?streams=a/b/...`` (streams combinados).
+    Emite una vela confirmada por stream cada ``interval`` segundos y, con
+    ``ticks``, esa cantidad de actualizaciones provisionales (``x`` falso) antes.
+    Los streams ``<símbolo>@depth...`` reciben eventos de ``depth`` (DepthFeed)
+    cada ``depth_interval`` segundos.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, interval: float = 0.05, seed: int = 0,
+                 ticks: int = 0, depth: DepthFeed = None, depth_interval: float = 0.1):
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.ticks = ticks
+        self.depth = depth or DepthFeed(seed)
+        self.depth_interval = depth_interval
+        self._walk = _RandomWalk(seed)
+        self._server = None
+        step = TIMEFRAME * 1000
+        self._next_timestamp = (int(time.time() * 1000) // step + 1) * step
+
+    @property
+    def base_url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> 'KlineStandInServer':
+        self._server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self) -> 'KlineStandInServer':
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    @staticmethod
+    def kline_event(stream: str, candle: list, closed: bool = True) -> dict:
+        """Mensaje ``kline`` con el formato de Binance."""
+        timestamp, open_, high, low, close, volume = candle
+        interval = stream.split('@kline_')[-1]
+        return {
+            'e': 'kline', 'E': int(time.time() * 1000), 's': stream.split('@')[0].upper(),
+            'k': {'t': timestamp, 'T': timestamp + timeframe_to_ms(interval) - 1, 'i': interval,
+                  'o': f"{open_:.8f}", 'h': f"{high:.8f}", 'l': f"{low:.8f}", 'c': f"{close:.8f}",
+                  'v': f"{volume:.8f}", 'x': closed}
+        }
+
+    @staticmethod
+    def _partial(candle: list, progress: float) -> list:
+        """Estado intermedio de una vela tras ``progress`` (0-1) de su intervalo."""
+        timestamp, open_, high, low, close, volume = candle
+        current = open_ + (close - open_) * progress
+        return [timestamp, open_, max(open_, current), min(open_, current), current, volume * progress]
+
+    async def _send(self, ws, stream: str, event: dict, combined: bool) -> None:
+        await ws.send(json.dumps({'stream': stream, 'data': event} if combined else event))
+
+    async def _kline_loop(self, ws, streams: list, combined: bool) -> None:
+        timestamp = self._next_timestamp
+        while True:
+            candles = {stream: self._walk.candle(stream, timestamp) for stream in streams}
+            for tick in range(1, self.ticks + 2):
+                closed = tick > self.ticks
+                for stream, candle in candles.items():
+                    if not closed:
+                        candle = self._partial(candle, tick / (self.ticks + 1))
+                    await self._send(ws, stream, self.kline_event(stream, candle, closed), combined)
+                await asyncio.sleep(self.interval / (self.ticks + 1))
+            timestamp += TIMEFRAME * 1000
+            self._next_timestamp = max(self._next_timestamp, timestamp)
+
+    async def _depth_loop(self, ws, streams: list, combined: bool) -> None:
+        while True:
+            for stream in streams:
+                await self._send(ws, stream, self.depth.event(stream.split('@')[0]), combined)
+            await asyncio.sleep(self.depth_interval)
+
+    async def _handler(self, ws) -> None:
+        url = urlparse(ws.request.path)
+        combined = url.path.startswith('/stream')
+        if combined:
+            streams = parse_qs(url.query).get('streams', [''])[0].split('/')
+        else:
+            streams = [url.path.rsplit('/', 1)[-1]]
+        depth_streams = [stream for stream in streams if '@depth' in stream]
+        kline_streams = [stream for stream in streams if stream not in depth_streams]
+        loops = []
+        if kline_streams:
+            loops.append(self._kline_loop(ws, kline_streams, combined))
+        if depth_streams:
+            loops.append(self._depth_loop(ws, depth_streams, combined))
+        try:
+            await asyncio.gather(*loops)
+        except websockets.ConnectionClosed:
+            pass
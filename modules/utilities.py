@@ -1,7 +1,17 @@
 # utilities.py
+import atexit
 import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 import time
+from .config import CONSOLE_LOG_LEVEL, LOG_SAMPLE_EVERY, JOURNAL_FSYNC_EVERY, JOURNAL_FSYNC_INTERVAL
+
+_TIMEFRAME_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+_CONSOLE = 'console'
+_log_queue = queue.SimpleQueue()
+_log_state = {'listener': None, 'atexit': False, 'samples': {}, 'console_level': logging.INFO}
 
 class Colors:
     GREEN = '\033[92m'
@@ -11,29 +21,144 @@ class Colors:
     BOLD = '\033[1m'
     END = '\033[0m'
 
-def print_colored(message: str, color: str) -> None:
-    """Imprime el mensaje en color en la consola."""
-    print(f"{color}{message}{Colors.END}")
-
-def setup_logging(log_file: str) -> None:
-    """Configura el logging para archivo y consola."""
-    logging.basicConfig(
-        filename=log_file,
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
+def print_colored(message: str, color: str, level: int = logging.INFO, sample: str = None) -> None:
+    """
+    Imprime el mensaje en color en la consola.
+    La llamada sólo encola el mensaje; el formateo y la escritura los hace el
+    hilo de logging. Los mensajes por debajo de CONSOLE_LOG_LEVEL se descartan y
+    los que indican ``sample`` se muestran sólo uno de cada LOG_SAMPLE_EVERY.
+    """
+    if level < _log_state['console_level']:
+        return
+    if sample is not None:
+        seen = _log_state['samples'].get(sample, 0)
+        _log_state['samples'][sample] = seen + 1
+        if seen % LOG_SAMPLE_EVERY:
+            return
+    if _log_state['listener'] is None:
+        _start_listener()
+    _log_queue.put_nowait(logging.makeLogRecord({
+        'name': _CONSOLE, 'levelno': level, 'levelname': logging.getLevelName(level),
+        'msg': message, 'color': color
+    }))
+
+def set_console_level(level) -> None:
+    """
+    Cambia en tiempo de ejecución el nivel mínimo de print_colored (p. ej.
+    ``logging.WARNING``, ``'debug'`` o ``'30'``). Un nombre desconocido deja
+    INFO y avisa en lugar de romper cada llamada posterior.
+    """
+    value = level
+    if isinstance(level, str):
+        name = level.strip().upper()
+        value = int(name) if name.isdigit() else logging.getLevelName(name)
+    if not isinstance(value, int):
+        _log_state['console_level'] = logging.INFO
+        print_colored(f"Unknown console log level {level!r}, using INFO", Colors.YELLOW, logging.WARNING)
+        return
+    _log_state['console_level'] = value
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """Convierte un timeframe de ccxt (``5m``, ``1h``...) a milisegundos."""
+    return int(timeframe[:-1]) * _TIMEFRAME_UNITS[timeframe[-1]] * 1000
+
+class _EnqueueHandler(QueueHandler):
+    """QueueHandler que no formatea en el hilo que registra: el listener lo hace."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class _ColorFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return f"{record.color}{record.getMessage()}{Colors.END}"
+
+
+class _JournalHandler(logging.Handler):
+    """Escribe en el diario binario los registros de operaciones y señales."""
+
+    def __init__(self, journal):
+        super().__init__()
+        self.journal = journal
+
+    def emit(self, record: logging.LogRecord) -> None:
+        kind, values = record.journal
+        if kind == 'trade':
+            self.journal.write_trade(*values, timestamp=record.created)
+        else:
+            self.journal.write_signal(*values, timestamp=record.created)
+
+    def close(self) -> None:
+        self.journal.close()
+        super().close()
+
+
+def _only(predicate):
+    log_filter = logging.Filter()
+    log_filter.filter = predicate
+    return log_filter
+
+def _start_listener(handlers: list = None) -> None:
+    """(Re)inicia el hilo que formatea y escribe los registros encolados."""
+    stop_logging()
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(_ColorFormatter())
+    console.addFilter(_only(lambda record: record.name == _CONSOLE))
+    listener = QueueListener(_log_queue, console, *(handlers or []), respect_handler_level=True)
+    listener.start()
+    _log_state['listener'] = listener
+    if not _log_state['atexit']:
+        atexit.register(stop_logging)
+        _log_state['atexit'] = True
+
+def stop_logging() -> None:
+    """Vacía la cola y detiene el hilo de logging."""
+    listener = _log_state['listener']
+    if listener is not None:
+        _log_state['listener'] = None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+# Nivel de consola configurado (tras definir el listener: un valor inválido avisa por consola)
+set_console_level(CONSOLE_LOG_LEVEL)
+
+def setup_logging(log_file: str, journal_file: str = None) -> None:
+    """
+    Configura el logging para archivo y consola. Los registros se encolan y un
+    hilo en segundo plano los formatea y escribe; con ``journal_file`` las
+    operaciones y señales también se guardan en el diario binario.
+    """
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    not_console = _only(lambda record: record.name != _CONSOLE)
+    file_handler = logging.FileHandler(log_file)
+    file_handler.setFormatter(formatter)
+    file_handler.addFilter(not_console)
     console = logging.StreamHandler()
     console.setLevel(logging.INFO)
-    logging.getLogger('').addHandler(console)
+    console.addFilter(not_console)
+    handlers = [file_handler, console]
+    if journal_file:
+        from .journal import TradeJournal
+        journal = _JournalHandler(TradeJournal(journal_file, JOURNAL_FSYNC_EVERY, JOURNAL_FSYNC_INTERVAL))
+        journal.addFilter(_only(lambda record: hasattr(record, 'journal')))
+        handlers.append(journal)
+    _start_listener(handlers)
+    root = logging.getLogger('')
+    root.setLevel(logging.INFO)
+    for handler in list(root.handlers):
+        if isinstance(handler, _EnqueueHandler):
+            root.removeHandler(handler)
+    root.addHandler(_EnqueueHandler(_log_queue))
 
 def log_trade(action: str, price: float, amount: float, profit: float = None) -> None:
     msg = f"{action}: {amount:.8f} @ {price:.8f}"
     if profit:
         msg += f" | Profit: {profit:.2f}%"
-    logging.info(msg)
+    logging.info(msg, extra={'journal': ('trade', (action, price, amount, profit))})
 
 def log_signal(signal_type: str, conditions: dict) -> None:
-    logging.info(f"Señal: {signal_type} | Condiciones: {conditions}")
+    logging.info(f"Señal: {signal_type} | Condiciones: {conditions}", extra={'journal': ('signal', (signal_type, conditions))})
 
 def log_error(error: Exception, context: str = "") -> None:
     logging.error(f"{context}: {str(error)}")
\ No newline at end of file
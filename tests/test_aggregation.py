@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from modules.aggregation import TimeframeAggregator
+
+MINUTE = 60_000
+HOUR = 60 * MINUTE
+
+
+def base_rows(start: int, count: int) -> np.ndarray:
+    timestamps = start + MINUTE * np.arange(count)
+    closes = 100.0 + np.arange(count)
+    return np.column_stack([timestamps, closes - 0.5, closes + 1, closes - 1, closes, np.ones(count)])
+
+
+def test_bootstrap_drops_a_partial_first_bucket():
+    aggregator = TimeframeAggregator('1h', '1m')
+    aggregator.bootstrap(base_rows(10 * HOUR + 7 * MINUTE, 53 + 2 * 60))
+    candles = aggregator.candles.to_frame()
+    assert candles['timestamp'].tolist() == [11 * HOUR, 12 * HOUR]
+    assert candles['volume'].tolist() == [60.0, 60.0]
+    assert candles['open'].iloc[0] == pytest.approx(100.0 + 53 - 0.5)
+
+
+def test_bootstrap_keeps_an_aligned_first_bucket():
+    aggregator = TimeframeAggregator('1h', '1m')
+    aggregator.bootstrap(base_rows(10 * HOUR, 2 * 60))
+    assert aggregator.candles.to_frame()['timestamp'].tolist() == [10 * HOUR, 11 * HOUR]
+
+
+def test_live_candles_of_the_dropped_bucket_are_ignored():
+    aggregator = TimeframeAggregator('1h', '1m')
+    aggregator.bootstrap(base_rows(10 * HOUR + 30 * MINUTE, 10))
+    assert len(aggregator.candles) == 0 and aggregator.current is None
+    for row in base_rows(10 * HOUR + 40 * MINUTE, 20 + 60):
+        aggregator.add_candle(int(row[0]), *row[1:])
+    candles = aggregator.candles.to_frame()
+    assert candles['timestamp'].tolist() == [11 * HOUR]
+    assert candles['volume'].tolist() == [60.0]
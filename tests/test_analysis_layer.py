@@ -0,0 +1,7 @@
+from modules.analysis_layer import condition_labels, strategy_for
+from modules.config import RSI_BUY_THRESHOLD
+
+
+def test_rsi_label_follows_the_strategy_threshold():
+    assert condition_labels(strategy_for())['rsi_conditions'] == f"RSI < {RSI_BUY_THRESHOLD:g}"
+    assert condition_labels(strategy_for(rsi_threshold=47.5))['rsi_conditions'] == "RSI < 47.5"
@@ -0,0 +1,11 @@
+from agent_tools.complexity import history_key
+
+
+def test_history_key_ignores_prompt_formatting():
+    assert history_key("  Two sum\r\n  of a list  ", 'solve') == history_key("Two sum\nof a list", 'solve')
+
+
+def test_history_key_separates_problems_and_entries():
+    keys = {history_key("Two sum", 'solve'), history_key("Merge intervals", 'solve'),
+            history_key("Two sum", 'Solution.twoSum')}
+    assert len(keys) == 3
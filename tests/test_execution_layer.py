@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+from modules.config import MAX_RETRIES, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+from modules.execution_layer import TickerCache, backoff_delay, execute_order_with_retries, process_trading_signals
+from modules.simulation import AsyncSimulatedExchange
+
+
+class FlakyExchange(AsyncSimulatedExchange):
+    """Falla las primeras ``failures`` llamadas a ``method`` y luego responde normalmente."""
+
+    def __init__(self, method: str, failures: int, **kwargs):
+        super().__init__(latency=0, **kwargs)
+        self.method = method
+        self.failures = failures
+
+    async def _request(self, method: str, *args, **kwargs):
+        if method == self.method and self.failures:
+            self.failures -= 1
+            self.calls[method] = self.calls.get(method, 0) + 1
+            raise ConnectionError(f"Simulated {method} failure")
+        return await super()._request(method, *args, **kwargs)
+
+
+def test_backoff_delay_is_jittered_and_capped():
+    for attempt in range(1, 10):
+        ceiling = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+        delays = [backoff_delay(attempt) for _ in range(200)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        assert len(set(delays)) > 1
+    assert max(backoff_delay(30) for _ in range(200)) <= RETRY_MAX_DELAY
+
+
+def test_buy_order_is_priced_below_the_ticker(exchange):
+    order = asyncio.run(execute_order_with_retries(exchange, 'buy', {'symbol': 'ETH/USDT', 'quote_amount': 100.0},
+                                                   tickers=TickerCache()))
+    last = exchange.exchange.fetch_ticker('ETH/USDT')['last']
+    assert order['side'] == 'buy'
+    assert order['price'] == pytest.approx(last * 0.9999, abs=0.01)
+    assert order['amount'] == pytest.approx(100.0 / last, rel=1e-6)
+    assert exchange.calls == {'fetch_ticker': 1, 'create_limit_buy_order': 1}
+
+
+def test_sell_order_uses_the_requested_amount(exchange):
+    order = asyncio.run(execute_order_with_retries(exchange, 'sell', {'symbol': 'ETH/USDT', 'amount': 0.5},
+                                                   tickers=TickerCache()))
+    assert order['side'] == 'sell'
+    assert order['amount'] == 0.5
+    assert order['price'] > exchange.exchange.fetch_ticker('ETH/USDT')['last']
+
+
+def test_order_is_retried_after_failures(no_backoff):
+    exchange = FlakyExchange('create_limit_buy_order', failures=MAX_RETRIES - 1)
+    order = asyncio.run(execute_order_with_retries(exchange, 'buy', {'symbol': 'ETH/USDT', 'quote_amount': 100.0},
+                                                   tickers=TickerCache()))
+    assert order['status'] == 'closed'
+    assert exchange.calls['create_limit_buy_order'] == MAX_RETRIES
+    # Cada fallo invalida el ticker, así que cada intento vuelve a pedir el precio
+    assert exchange.calls['fetch_ticker'] == MAX_RETRIES
+    assert len(exchange.orders) == 1
+
+
+def test_order_fails_after_max_retries(no_backoff):
+    exchange = AsyncSimulatedExchange(latency=0, failure_rate=1.0)
+    with pytest.raises(Exception, match=f"after {MAX_RETRIES} attempts"):
+        asyncio.run(execute_order_with_retries(exchange, 'sell', {'symbol': 'ETH/USDT', 'amount': 0.5},
+                                               tickers=TickerCache()))
+    assert exchange.calls == {'fetch_ticker': MAX_RETRIES}
+    assert exchange.orders == []
+
+
+def test_retries_wait_for_the_backoff(monkeypatch):
+    delays = []
+    monkeypatch.setattr('modules.execution_layer.backoff_delay', lambda attempt: delays.append(attempt) or 0)
+    exchange = FlakyExchange('fetch_ticker', failures=2)
+    asyncio.run(execute_order_with_retries(exchange, 'buy', {'symbol': 'ETH/USDT', 'quote_amount': 100.0},
+                                           tickers=TickerCache()))
+    assert delays == [1, 2]
+
+
+def test_concurrent_ticker_requests_share_one_fetch():
+    exchange = AsyncSimulatedExchange(latency=0.01)
+    tickers = TickerCache(ttl=60)
+
+    async def fetch_many():
+        return await asyncio.gather(*(tickers.get(exchange, 'ETH/USDT') for _ in range(20)))
+
+    results = asyncio.run(fetch_many())
+    assert exchange.calls == {'fetch_ticker': 1}
+    assert all(ticker is results[0] for ticker in results)
+    asyncio.run(tickers.get(exchange, 'ETH/USDT'))
+    assert exchange.calls == {'fetch_ticker': 1}
+
+
+def test_ticker_cache_expires_and_invalidates(exchange):
+    tickers = TickerCache(ttl=0)
+    asyncio.run(tickers.get(exchange, 'ETH/USDT'))
+    asyncio.run(tickers.get(exchange, 'ETH/USDT'))
+    assert exchange.calls['fetch_ticker'] == 2
+    tickers = TickerCache(ttl=60)
+    asyncio.run(tickers.get(exchange, 'ETH/USDT'))
+    tickers.invalidate('ETH/USDT')
+    asyncio.run(tickers.get(exchange, 'ETH/USDT'))
+    assert exchange.calls['fetch_ticker'] == 4
+
+
+def test_failed_ticker_fetch_is_shared_and_not_cached():
+    exchange = FlakyExchange('fetch_ticker', failures=1, seed=1)
+    exchange.latency = 0.01
+    tickers = TickerCache(ttl=60)
+
+    async def fetch_many():
+        return await asyncio.gather(*(tickers.get(exchange, 'ETH/USDT') for _ in range(5)), return_exceptions=True)
+
+    results = asyncio.run(fetch_many())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert exchange.calls == {'fetch_ticker': 1}
+    assert asyncio.run(tickers.get(exchange, 'ETH/USDT'))['symbol'] == 'ETH/USDT'
+    assert exchange.calls == {'fetch_ticker': 2}
+
+
+def test_trades_are_journaled_with_the_order_fill(exchange, monkeypatch):
+    trades = []
+    monkeypatch.setattr('modules.execution_layer.log_trade', lambda *args: trades.append(args))
+    positions = []
+
+    async def round_trip():
+        await process_trading_signals(exchange, 1, {'close': 2000.0}, positions, symbol='ETH/USDT')
+        await process_trading_signals(exchange, -1, {'close': 2500.0}, positions, symbol='ETH/USDT')
+
+    asyncio.run(round_trip())
+    buy, sell = exchange.orders
+    assert trades[0] == ('BUY', buy['price'], buy['filled'])
+    action, price, amount, profit = trades[1]
+    assert (action, price, amount) == ('SELL', sell['price'], sell['filled'])
+    # La ganancia sale de los precios ejecutados, no del cierre de la vela
+    assert profit == pytest.approx((sell['price'] / buy['price'] - 1) * 100)
@@ -0,0 +1,45 @@
+import json
+
+from modules.markets_cache import MarketsCache
+
+
+class FakeClient:
+    id = 'binanceus'
+
+    def __init__(self, markets=None):
+        self.markets = markets
+        self.currencies = None
+        self.loads = 0
+
+    def load_markets(self, reload=False):
+        self.loads += 1
+        self.markets = {'BTC/USDT': {'precision': {'amount': 5}}}
+        self.currencies = {'BTC': {'precision': 8}}
+
+    def set_markets(self, markets, currencies=None):
+        self.markets = markets
+        self.currencies = currencies
+
+
+def test_refresh_loads_on_a_throwaway_client(tmp_path):
+    cache = MarketsCache(str(tmp_path / 'markets.json'))
+    live = FakeClient({'BTC/USDT': {'precision': {'amount': 4}}})
+    throwaway = FakeClient()
+    cache.refresh_in_background(live, lambda: throwaway).join()
+    assert live.loads == 0 and throwaway.loads == 1
+    assert live.markets['BTC/USDT']['precision']['amount'] == 5
+    assert live.currencies == throwaway.currencies
+    saved = json.loads((tmp_path / 'markets.json').read_text())
+    assert saved['markets'] == throwaway.markets
+
+
+def test_failed_refresh_leaves_live_markets(tmp_path):
+    cache = MarketsCache(str(tmp_path / 'markets.json'))
+    live = FakeClient({'BTC/USDT': {'precision': {'amount': 4}}})
+
+    def broken():
+        raise ConnectionError('offline')
+
+    cache.refresh(live, broken)
+    assert live.markets['BTC/USDT']['precision']['amount'] == 4
+    assert not (tmp_path / 'markets.json').exists()
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+from modules.execution_layer import process_trading_signals
+from modules.position_store import PositionStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PositionStore(str(tmp_path / 'positions.db'))
+    yield store
+    store.close()
+
+
+def buy(exchange, store, positions, close=2000.0):
+    asyncio.run(process_trading_signals(exchange, 1, {'close': close}, positions, symbol='ETH/USDT', store=store))
+    order = exchange.orders[-1]
+    # Los tests deciden qué le pasó a la orden mientras el bot estaba parado
+    order.update(status='open', filled=0.0)
+    store.record_fills([order])
+    return order
+
+
+def test_entries_record_the_filled_amount(exchange, store):
+    positions = []
+    asyncio.run(process_trading_signals(exchange, 1, {'close': 2000.0}, positions, symbol='ETH/USDT', store=store))
+    order = exchange.orders[-1]
+    assert positions[0]['base_amount'] == order['filled']
+    assert store.load() == {'ETH/USDT': positions}
+
+
+def test_reconcile_adjusts_entries_to_what_was_really_bought(exchange, store):
+    positions = []
+    filled = buy(exchange, store, positions)
+    cancelled = buy(exchange, store, positions, close=1900.0)
+    partial = buy(exchange, store, positions, close=1800.0)
+    still_open = buy(exchange, store, positions, close=1700.0)
+    filled.update(status='closed', filled=filled['amount'])
+    cancelled.update(status='canceled', filled=0.0)
+    partial.update(status='expired', filled=partial['amount'] / 4)
+
+    report = asyncio.run(store.reconcile(exchange))
+
+    assert sorted(report['closed']) == sorted([filled['id'], cancelled['id'], partial['id']])
+    assert report['open'] == 1 and report['unresolved'] == [] and report['unknown'] == []
+    assert exchange.calls['fetch_orders'] == 1
+    entries = store.load()['ETH/USDT']
+    assert [entry['base_amount'] for entry in entries] == pytest.approx(
+        [filled['amount'], partial['amount'] / 4, still_open['amount']])
+    assert entries[1]['quote_amount'] == pytest.approx(positions[2]['quote_amount'] / 4)
+    assert store.open_orders().keys() == {still_open['id']}
+
+
+def test_orders_missing_from_the_exchange_stay_open(exchange, store):
+    positions = []
+    order = buy(exchange, store, positions)
+    exchange.orders.clear()
+    report = asyncio.run(store.reconcile(exchange))
+    assert report['unresolved'] == [order['id']] and report['closed'] == []
+    assert store.open_orders().keys() == {order['id']}
+    assert len(store.load()['ETH/USDT']) == 1
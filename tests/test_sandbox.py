@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from agent_tools.sandbox import SandboxPool
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = SandboxPool(size=1, timeout=20)
+    if pool.run("pass").get('filesystem') != 'isolated':
+        pool.close()
+        pytest.skip("user, network and mount namespaces are not available")
+    yield pool
+    pool.close()
+
+
+def test_repository_is_not_visible(pool):
+    result = pool.run(f"open({os.path.join(REPO, 'README.md')!r}).read()")
+    assert result['returncode'] == 1
+    assert 'FileNotFoundError' in result['stderr']
+
+
+def test_working_directory_is_writable_and_root_is_not(pool):
+    result = pool.run("open('out.txt', 'w').write('ok')\nprint(open('out.txt').read())\nopen('/usr/probe', 'w')")
+    assert result['stdout'] == 'ok\n'
+    assert 'Read-only file system' in result['stderr']
+
+
+def test_mounts_cannot_be_made_writable(pool):
+    code = ("import ctypes\n"
+            "libc = ctypes.CDLL(None, use_errno=True)\n"
+            "libc.mount.argtypes = [ctypes.c_char_p] * 3 + [ctypes.c_ulong, ctypes.c_char_p]\n"
+            "print(libc.mount(None, b'/usr', None, 0x20 | 0x1000, None), ctypes.get_errno())")
+    assert pool.run(code)['stdout'] == '-1 1\n'